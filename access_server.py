@@ -0,0 +1,57 @@
+# access_server.py
+# Point d'entrée du service de reconnaissance pour les contrôleurs de porte.
+#
+#   python access_server.py --port 8765 --workers 4
+#
+# POST /recognize   image JPEG/PNG brute (en-têtes X-Door, X-Deadline-Ms)
+#                   ou JSON {"encodings": [[128 flottants], ...], "door": ..., "deadline_ms": ...}
+#                   ou JSON {"image": "<base64>", ...}
+#   -> 200 {"decision": "granted" | "denied", "door": ..., "faces": [{"name", "distance", "box"}]}
+#   -> 400 requête invalide ou image illisible, 429 service saturé (réessayer après
+#      Retry-After), 503 processus de reconnaissance en redémarrage, 504 échéance dépassée
+# GET /health       état et compteurs
+# GET /metrics      métriques au format Prometheus
+import argparse
+import asyncio
+
+from controllers.access_service import RecognitionService, serve
+from models.models import init_db
+
+
+async def run(args):
+    service = RecognitionService(
+        workers=args.workers, tolerance=args.tolerance, scale=args.scale,
+        max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000.0,
+        max_pending=args.max_pending, default_deadline=args.deadline_ms / 1000.0
+    )
+    server = await serve(service, args.host, args.port)
+    print(f"Service de reconnaissance sur http://{args.host}:{args.port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP de reconnaissance pour les portes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="processus de détection (défaut : nb de cœurs)")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--scale", type=float, default=0.5)
+    parser.add_argument("--max-batch", type=int, default=16, help="requêtes regroupées par lot")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="attente maximale pour remplir un lot")
+    parser.add_argument("--max-pending", type=int, default=64, help="au-delà : réponse 429")
+    parser.add_argument("--deadline-ms", type=float, default=1000.0, help="échéance par défaut d'une requête")
+    args = parser.parse_args()
+
+    init_db()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 import streamlit as st
+import streamlit.components.v1 as components
 from streamlit_option_menu import option_menu
-from models.models import init_db, authenticate, create_session, get_session, delete_session
-from views.add_user_view import add_user_tab
-from views.recognition_view import recognition_tab
+from models.models import init_db, authenticate, create_session, get_session, delete_session, SESSION_TTL
 from views.account_management_view import account_management_tab
-from PIL import Image
+from controllers.metrics import start_metrics_server
 import base64
+import json
+import threading
+
+# Les vues de reconnaissance et d'enrôlement (cv2, face_recognition / dlib,
+# streamlit_webrtc) et le diagnostic (pandas) sont importés à l'ouverture de
+# leur onglet : la page de connexion s'affiche sans charger la pile vision.
 
 # --------------------
 # Config page
@@ -55,9 +60,38 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --------------------
-# Initialisation DB
+# Ressources partagées (une fois par processus, pas à chaque rerun)
 # --------------------
-init_db()
+@st.cache_resource
+def init_backend():
+    init_db()
+    start_metrics_server()
+    return True
+
+
+@st.cache_resource
+def load_logo(path="logo_dit.png"):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+
+@st.cache_resource
+def warm_up_vision():
+    """Charge dlib, ses modèles et la galerie en arrière-plan après la connexion."""
+    def warm():
+        try:
+            from controllers.embedding import warm_up
+            from models.gallery import get_gallery
+            get_gallery()
+            warm_up()
+        except Exception:
+            pass  # l'onglet concerné refera l'import et affichera l'erreur
+    thread = threading.Thread(target=warm, name="vision-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+init_backend()
 
 # --------------------
 # Session state
@@ -67,26 +101,67 @@ if "authenticated" not in st.session_state:
     st.session_state.role = None
     st.session_state.username = None
 
-# Restaurer session depuis DB
-if not st.session_state.authenticated:
-    username, role = get_session()
+# --------------------
+# Session : le jeton est gardé dans un cookie du navigateur, propre à chaque
+# poste, et jamais dans l'URL (copiée avec ?camera=..., historique, journaux
+# des proxys). get_session lit le cache mémoire ; une session expirée ou
+# révoquée déconnecte.
+# --------------------
+SESSION_COOKIE = "face_session"
+
+
+def write_session_cookie(token):
+    """Pose le cookie de session (None : l'efface) via un composant invisible."""
+    value, max_age = (token, int(SESSION_TTL)) if token else ("", 0)
+    script = f"""<script>
+        const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+        window.parent.document.cookie = {json.dumps(f"{SESSION_COOKIE}={value}")}
+            + "; path=/; max-age={max_age}; SameSite=Strict" + secure;
+    </script>"""
+    # L'iframe doit être de même origine que l'application pour écrire le cookie
+    if hasattr(st, "iframe"):
+        st.iframe(script, height=1)
+    else:
+        components.html(script, height=0)
+
+
+def clear_login():
+    st.session_state.authenticated = False
+    st.session_state.role = None
+    st.session_state.username = None
+    st.session_state.pop("session_token", None)
+
+
+# Ancien lien avec ?session=... : le jeton est retiré de l'URL sans être utilisé
+st.query_params.pop("session", None)
+
+# Cookies lus à l'ouverture de la page : après une déconnexion, le jeton
+# révoqué y figure encore jusqu'au rechargement
+cookie_token = st.context.cookies.get(SESSION_COOKIE)
+if not isinstance(cookie_token, str):
+    cookie_token = None   # hors navigateur (streamlit.testing) : pas de cookies
+token = st.session_state.get("session_token") or cookie_token
+if token:
+    username, role = get_session(token)
     if username and role:
         st.session_state.authenticated = True
         st.session_state.username = username
         st.session_state.role = role
+        st.session_state.session_token = token
+    else:
+        clear_login()
+elif st.session_state.authenticated:
+    clear_login()
 
-# Fonction pour encoder l'image en base64
-def get_base64_of_bin_file(bin_file):
-    with open(bin_file, "rb") as f:
-        return base64.b64encode(f.read()).decode()
-
-# Chemin vers ton logo local
-logo_base64 = get_base64_of_bin_file("logo_dit.png")
+logo_base64 = load_logo()
 
 # --------------------
 # Page de connexion
 # --------------------
 if not st.session_state.authenticated:
+    if cookie_token:
+        # Jeton expiré ou révoqué (déconnexion) : le navigateur l'oublie
+        write_session_cookie(None)
     st.markdown(f"""
     <div style="display: flex; justify-content: center; align-items: center; padding-bottom: 30px;">
         <img src="data:image/png;base64,{logo_base64}" 
@@ -114,7 +189,7 @@ if not st.session_state.authenticated:
                 st.session_state.authenticated = True
                 st.session_state.role = role
                 st.session_state.username = username
-                create_session(username, role)
+                st.session_state.session_token = create_session(username, role)
                 st.success(f"✅ Connecté en tant que {username} ({role})")
                 st.rerun()
             else:
@@ -124,6 +199,10 @@ if not st.session_state.authenticated:
 # Interface après connexion
 # --------------------
 else:
+    warm_up_vision()
+    if cookie_token != st.session_state.session_token:
+        write_session_cookie(st.session_state.session_token)
+
     # --- Sidebar utilisateur ---
     with st.sidebar:
         # Affichage logo + rôle
@@ -138,11 +217,13 @@ else:
         st.markdown(f"<span style='font-size:1em'>👤 {st.session_state.role}</span>", unsafe_allow_html=True)
         
         # Menu navigation
-        menu_items = ["Nouveau visage", "Reconnaissance"]
-        menu_icons = ["person-plus", "camera-video"]
+        menu_items = ["Nouveau visage", "Employés", "Reconnaissance"]
+        menu_icons = ["person-plus", "people", "camera-video"]
         if st.session_state.role == "admin":
             menu_items.append("Gestion comptes")
             menu_icons.append("gear")
+            menu_items.append("Diagnostics")
+            menu_icons.append("speedometer")
 
         choice = option_menu(
             "",
@@ -186,17 +267,17 @@ else:
         )
 
         if st.button("⏻ Logout", key="sidebar_logout"):
-            st.session_state.authenticated = False
-            st.session_state.role = None
-            st.session_state.username = None
-            delete_session()
+            delete_session(st.session_state.get("session_token"))
+            clear_login()
             st.rerun()
 
     # --- Header option dynamique ---
     option_texts = {
         "Nouveau visage": "Ajouter un nouvel employé au système",
+        "Employés": "Employés enregistrés",
         "Reconnaissance": "Contrôle d'accès via reconnaissance faciale",
-        "Gestion comptes": "Gestion des comptes utilisateurs"
+        "Gestion comptes": "Gestion des comptes utilisateurs",
+        "Diagnostics": "Performances de la reconnaissance"
     }
     st.markdown(f"""
         <div style="text-align:center; margin-bottom:2vw;">
@@ -208,8 +289,16 @@ else:
 
     # --- Contenu selon le choix ---
     if choice == "Nouveau visage":
+        from views.add_user_view import add_user_tab
         add_user_tab()
+    elif choice == "Employés":
+        from views.employees_view import employees_tab
+        employees_tab()
     elif choice == "Reconnaissance":
+        from views.recognition_view import recognition_tab
         recognition_tab()
     elif choice == "Gestion comptes":
-        account_management_tab()
\ No newline at end of file
+        account_management_tab()
+    elif choice == "Diagnostics" and st.session_state.role == "admin":
+        from views.diagnostics_view import diagnostics_tab
+        diagnostics_tab()
\ No newline at end of file
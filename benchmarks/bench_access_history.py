@@ -0,0 +1,112 @@
+# bench_access_history.py
+# Requêtes sur le journal d'accès avec un an d'historique : génère des
+# millions d'événements (insérés par add_access_events, donc agrégats compris)
+# puis mesure les requêtes de consultation : pages récentes, pagination
+# profonde par curseur (comparée à OFFSET), filtres employé / caméra, agrégats
+# journaliers et horaires, et la rétention.
+#
+#   python -m benchmarks.bench_access_history --events 2000000 --days 365
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from models import database, models
+
+
+def populate(n_events, days, users, cameras, batch=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    end = time.time()
+    timestamps = np.sort(rng.uniform(end - days * 86400, end, n_events))
+    user_ids = rng.integers(0, users + 1, n_events)   # users = inconnu
+    camera_ids = rng.integers(0, cameras, n_events)
+    distances = rng.uniform(0.2, 0.8, n_events)
+    names = [f"employe {i}" for i in range(users)] + [None]
+    started = time.perf_counter()
+    for i in range(0, n_events, batch):
+        models.add_access_events([
+            (float(timestamps[j]), f"cam{camera_ids[j]}", names[user_ids[j]],
+             "denied" if user_ids[j] == users else "granted", float(distances[j]), None)
+            for j in range(i, min(i + batch, n_events))
+        ])
+    return end, time.perf_counter() - started
+
+
+def timed(fn, repeat=5):
+    """Médiane en millisecondes et dernier résultat."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(samples)), result
+
+
+def cursor_at(page, limit, **filters):
+    """Curseur qui ouvre la page `page` (parcours préalable, hors mesure)."""
+    cursor = None
+    for _ in range(page - 1):
+        _, cursor = models.query_access_events(cursor=cursor, limit=limit, **filters)
+    return cursor
+
+
+def deep_offset(pages, limit):
+    with database.connection(models.DB_FILE) as conn:
+        return conn.execute(
+            "SELECT id, timestamp, camera, user_name, decision, distance FROM access_events "
+            "ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+            (limit, (pages - 1) * limit)
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requêtes sur un an de journal d'accès")
+    parser.add_argument("--events", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--cameras", type=int, default=8)
+    parser.add_argument("--page", type=int, default=100, help="lignes par page")
+    parser.add_argument("--deep", type=int, default=5000, help="numéro de page pour la pagination profonde")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        models.DB_FILE = os.path.join(tmp, "history.db")
+        models.init_db()
+        end, elapsed = populate(args.events, args.days, args.users, args.cameras)
+        print(f"insertion : {args.events} événements en {elapsed:.1f} s ({args.events / elapsed:.0f}/s, agrégats compris)")
+
+        today = models.day_bucket(end + 86400)
+        year_ago = models.day_bucket(end - args.days * 86400)
+        week_ago = models.hour_bucket(end - 7 * 86400)
+        month = (end - 60 * 86400, end - 30 * 86400)
+        deep = cursor_at(args.deep, args.page)
+        deep_user = cursor_at(20, args.page, user_name="employe 7")
+        cases = [
+            ("dernière page", lambda: models.query_access_events(limit=args.page)[0]),
+            (f"page {args.deep} (curseur)", lambda: models.query_access_events(cursor=deep, limit=args.page)[0]),
+            (f"page {args.deep} (OFFSET)", lambda: deep_offset(args.deep, args.page)),
+            ("employé, dernière page", lambda: models.query_access_events(user_name="employe 7", limit=args.page)[0]),
+            ("employé, page 20", lambda: models.query_access_events(
+                user_name="employe 7", cursor=deep_user, limit=args.page)[0]),
+            ("caméra sur un mois", lambda: models.query_access_events(
+                camera="cam3", start=month[0], end=month[1], limit=args.page)[0]),
+            ("inconnus refusés", lambda: models.query_access_events(user_name="", decision="denied", limit=args.page)[0]),
+            ("entrées/jour/employé sur un an", lambda: models.get_daily_entries(year_ago, today)),
+            ("entrées/jour d'un employé", lambda: models.get_daily_entries(year_ago, today, user_name="employe 7")),
+            ("agrégats horaires d'une semaine", lambda: models.get_access_rollups("hour", start=week_ago)),
+        ]
+        print(f"{'requête':<34} {'ms (médiane)':>13} {'lignes':>8}")
+        for label, fn in cases:
+            ms, rows = timed(fn)
+            print(f"{label:<34} {ms:>13.2f} {len(rows):>8}")
+
+        t0 = time.perf_counter()
+        deleted, cleared = models.compact_access_events(retention_days=args.days / 2, thumbnail_days=30, now=end)
+        print(f"rétention ({args.days / 2:.0f} j) : {deleted} événements supprimés en {time.perf_counter() - t0:.1f} s")
+        database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# bench_db_concurrency.py
+# Débit de la couche models sous concurrence : N threads enchaînent un mélange
+# d'appels authenticate / get_all_users / add_user. Compare l'ancien schéma
+# (une connexion sqlite3 par appel, journal rollback) aux connexions par
+# thread en mode WAL de models/database.py.
+#
+#   python -m benchmarks.bench_db_concurrency --threads 1 4 16 --seconds 5
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from models import database, models
+
+
+# --------------------
+# Ancienne implémentation (connexion par appel), reproduite pour comparaison
+# --------------------
+def legacy_authenticate(username, password):
+    with sqlite3.connect(models.DB_FILE, timeout=30) as conn:
+        c = conn.cursor()
+        c.execute("SELECT password, role FROM accounts WHERE username = ?", (username,))
+        row = c.fetchone()
+        return bool(row and row[0] == models.hash_password(password))
+
+
+def legacy_get_all_users():
+    with sqlite3.connect(models.DB_FILE, timeout=30) as conn:
+        c = conn.cursor()
+        c.execute("SELECT name, encoding, photo, encoding_format FROM users")
+        return [(row[0], models.decode_embedding(row[1], row[3]), row[2]) for row in c.fetchall()]
+
+
+def legacy_add_user(name, encoding):
+    with sqlite3.connect(models.DB_FILE, timeout=30) as conn:
+        c = conn.cursor()
+        c.execute(
+            "INSERT INTO users (name, encoding, photo, encoding_format) VALUES (?, ?, ?, ?)",
+            (name, models.encode_embedding(encoding), None, models.ENCODING_FORMAT_F32)
+        )
+        conn.commit()
+
+
+IMPLEMENTATIONS = {
+    "legacy": (legacy_authenticate, legacy_get_all_users, legacy_add_user),
+    "pooled": (models.authenticate, models.get_all_users, lambda name, enc: models.add_user(name, enc)),
+}
+
+
+def prepare_db(path, users, journal_mode):
+    models.DB_FILE = path
+    models.init_db()
+    database.close_connections()
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.close()
+    rng = np.random.default_rng(0)
+    models.add_users_bulk((f"employe {i}", rng.normal(0, 0.09, 128), None) for i in range(users))
+    database.close_connections()
+
+
+def run(mode, n_threads, seconds, write_ratio, read_all_ratio):
+    authenticate, get_all_users, add_user = IMPLEMENTATIONS[mode]
+    counts = [0] * n_threads
+    errors = [0] * n_threads
+    stop = threading.Event()
+
+    def worker(i):
+        rng = random.Random(i)
+        encoding = np.zeros(128, dtype=np.float32)
+        while not stop.is_set():
+            r = rng.random()
+            try:
+                if r < write_ratio:
+                    add_user(f"bench {i}", encoding)
+                elif r < write_ratio + read_all_ratio:
+                    get_all_users()
+                else:
+                    authenticate("admin", "admin101855")
+                counts[i] += 1
+            except sqlite3.OperationalError:
+                errors[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de la couche models avec N threads concurrents")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--users", type=int, default=200, help="employés dans la base de test")
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--read-all-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'mode':>8} {'threads':>8} {'appels/s':>10} {'erreurs':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, journal in (("legacy", "DELETE"), ("pooled", "WAL")):
+            path = os.path.join(tmp, f"{mode}.db")
+            prepare_db(path, args.users, journal)
+            for n in args.threads:
+                rate, errors = run(mode, n, args.seconds, args.write_ratio, args.read_all_ratio)
+                print(f"{mode:>8} {n:>8} {rate:>10.0f} {errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# bench_embedding.py
+# Débit d'encodage en visages par seconde : face_encodings image par image
+# contre encode_batch sur des lots d'images. Les visages sont des boîtes fixes
+# sur des images générées (le réseau dlib s'exécute quel que soit le contenu),
+# ou les vrais visages détectés si un dossier de photos est fourni.
+#
+#   python -m benchmarks.bench_embedding --frames 64 --faces 3 --batch 1 8 32
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import face_recognition
+
+from controllers.embedding import encode_batch
+
+
+def synthetic_items(n_frames, faces_per_frame, size=(240, 320), seed=0):
+    rng = np.random.default_rng(seed)
+    h, w = size
+    box = min(h, w // faces_per_frame) - 10
+    items = []
+    for _ in range(n_frames):
+        image = rng.integers(0, 255, size=(h, w, 3), dtype=np.uint8)
+        locations = [(5, 5 + i * (box + 5) + box, 5 + box, 5 + i * (box + 5)) for i in range(faces_per_frame)]
+        items.append((image, locations))
+    return items
+
+
+def photo_items(directory):
+    items = []
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        if path.lower().endswith((".jpg", ".jpeg", ".png")):
+            image = face_recognition.load_image_file(path)
+            items.append((image, face_recognition.face_locations(image)))
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit d'encodage en visages/s, image par image ou par lots")
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--faces", type=int, default=2, help="visages par image synthétique")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--photos", help="dossier de photos réelles à la place des images générées")
+    args = parser.parse_args()
+
+    items = photo_items(args.photos) if args.photos else synthetic_items(args.frames, args.faces)
+    n_faces = sum(len(locations) for _, locations in items)
+    if not n_faces:
+        print("Aucun visage à encoder.")
+        return
+
+    start = time.perf_counter()
+    for image, locations in items:
+        face_recognition.face_encodings(image, locations)
+    elapsed = time.perf_counter() - start
+    print(f"{'face_encodings':>18} : {n_faces / elapsed:8.1f} visages/s")
+
+    for batch in args.batch:
+        start = time.perf_counter()
+        for i in range(0, len(items), batch):
+            encode_batch(items[i:i + batch])
+        elapsed = time.perf_counter() - start
+        print(f"{'encode_batch/' + str(batch):>18} : {n_faces / elapsed:8.1f} visages/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# bench_index.py
+# Compare le backend IVF approximatif à la recherche exacte :
+# rappel@1 (même identité que le parcours exact) et latence par requête.
+#
+#   python -m benchmarks.bench_index --sizes 10000 100000 --nprobe 1 4 8 16
+import argparse
+import time
+
+import numpy as np
+
+from models.face_index import ExactIndex, IVFIndex
+
+
+def synthetic_gallery(n, dim=128, seed=0):
+    """Encodages synthétiques proches des encodages dlib (composantes ~ N(0, 0.09))."""
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, 0.09, size=(n, dim)).astype(np.float32)
+
+
+def synthetic_queries(gallery, n_queries, noise=0.03, seed=1):
+    """Nouvelles prises de vue d'employés existants : encodage + bruit."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(len(gallery), size=n_queries)
+    return gallery[picks] + rng.normal(0.0, noise, size=(n_queries, gallery.shape[1])).astype(np.float32)
+
+
+def time_search(index, queries, batch):
+    start = time.perf_counter()
+    ids = []
+    for i in range(0, len(queries), batch):
+        ids.append(index.search(queries[i:i + batch], k=1)[0][:, 0])
+    elapsed = time.perf_counter() - start
+    return np.concatenate(ids), 1000.0 * elapsed / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rappel@1 et latence de l'index IVF face à la recherche exacte")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=1, help="visages par appel à search()")
+    args = parser.parse_args()
+
+    print(f"{'N':>8} {'backend':>12} {'build (s)':>10} {'ms/requête':>11} {'rappel@1':>9}")
+    for n in args.sizes:
+        gallery = synthetic_gallery(n)
+        ids = np.arange(1, n + 1)
+        queries = synthetic_queries(gallery, args.queries)
+
+        exact = ExactIndex()
+        start = time.perf_counter()
+        exact.build(ids, gallery)
+        build = time.perf_counter() - start
+        truth, ms = time_search(exact, queries, args.batch)
+        print(f"{n:>8} {'exact':>12} {build:>10.2f} {ms:>11.3f} {1.0:>9.3f}")
+
+        ivf = IVFIndex()
+        start = time.perf_counter()
+        ivf.build(ids, gallery)
+        build = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            found, ms = time_search(ivf, queries, args.batch)
+            recall = float(np.mean(found == truth))
+            print(f"{n:>8} {'ivf/' + str(nprobe):>12} {build:>10.2f} {ms:>11.3f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
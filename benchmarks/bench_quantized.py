@@ -0,0 +1,146 @@
+# bench_quantized.py
+# Galerie quantifiée (float16 / int8 + second passage float32) face à la
+# recherche exacte float32 et à l'ancien parcours face_recognition.face_distance
+# sur une liste d'encodages float64 : mémoire résidente de la structure de
+# recherche, latence par requête et accord des décisions (même employé ou même
+# rejet à `tolerance`).
+#
+# La galerie est écrite puis projetée en mémoire comme l'instantané de
+# snapshot.py : les backends quantifiés n'y lisent que les lignes candidates.
+#
+#   python -m benchmarks.bench_quantized --sizes 10000 100000 1000000
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from models.face_index import ExactIndex, QuantizedIndex
+
+try:
+    from face_recognition import face_distance
+except ImportError:
+    def face_distance(face_encodings, face_to_compare):
+        # Même calcul que face_recognition.face_distance
+        if len(face_encodings) == 0:
+            return np.empty((0))
+        return np.linalg.norm(face_encodings - face_to_compare, axis=1)
+
+
+def synthetic_gallery(n, spread, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, spread, size=(n, 128)).astype(np.float32)
+
+
+def synthetic_queries(gallery, n_queries, noise, unknown_ratio, spread, seed=1):
+    """Employés connus (encodage + bruit) et une part d'inconnus."""
+    rng = np.random.default_rng(seed)
+    queries = gallery[rng.integers(len(gallery), size=n_queries)]
+    queries = queries + rng.normal(0.0, noise, size=queries.shape).astype(np.float32)
+    unknown = rng.random(n_queries) < unknown_ratio
+    queries[unknown] = rng.normal(0.0, spread, size=(int(unknown.sum()), 128))
+    return queries
+
+
+def decisions(ids, dists, tolerance):
+    return np.where(dists <= tolerance, ids, -1)
+
+
+def search_index(index, queries, batch):
+    ids, dists = [], []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        found, d = index.search(queries[i:i + batch], k=1)
+        ids.append(found[:, 0])
+        dists.append(d[:, 0])
+    ms = 1000.0 * (time.perf_counter() - start) / len(queries)
+    return np.concatenate(ids), np.concatenate(dists), ms
+
+
+def search_legacy(known, ids, queries):
+    best_ids, best_dists = [], []
+    start = time.perf_counter()
+    for query in queries:
+        d = face_distance(known, query)
+        best = int(np.argmin(d))
+        best_ids.append(ids[best])
+        best_dists.append(d[best])
+    ms = 1000.0 * (time.perf_counter() - start) / len(queries)
+    return np.array(best_ids), np.array(best_dists), ms
+
+
+def resident_bytes(index):
+    """Tableaux que la recherche parcourt à chaque requête."""
+    if isinstance(index, QuantizedIndex):
+        return sum(a.nbytes for a in (index._ids, index._codes, index._code_sq, index._src))
+    bucket = index._bucket
+    return bucket.ids.nbytes + bucket.vectors.nbytes + bucket.sq_norms.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Galerie quantifiée : mémoire, latence et accord")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1, help="visages par appel à search()")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[16])
+    parser.add_argument("--tolerance", type=float, default=0.6)
+    parser.add_argument("--spread", type=float, default=0.06, help="écart-type des encodages synthétiques")
+    parser.add_argument("--noise", type=float, default=0.035, help="bruit d'une nouvelle prise de vue")
+    parser.add_argument("--unknown", type=float, default=0.2, help="part de visages inconnus")
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="taille max pour l'ancien parcours face_distance (float64, lent)")
+    args = parser.parse_args()
+
+    print(f"{'N':>8} {'chemin':>14} {'mémoire (Mo)':>13} {'ms/requête':>11} {'accord':>8} {'réf.':>12}")
+    for n in args.sizes:
+        gallery = synthetic_gallery(n, args.spread)
+        ids = np.arange(1, n + 1)
+        queries = synthetic_queries(gallery, args.queries, args.noise, args.unknown, args.spread)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "encodings.npy")
+            np.save(path, gallery)
+            del gallery
+            mapped = np.load(path, mmap_mode="r")
+
+            reference, ref_name = None, None
+            if n <= args.legacy_max:
+                tracemalloc.start()
+                known = [np.asarray(row, dtype=np.float64) for row in mapped]
+                legacy_bytes = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                found, dists, ms = search_legacy(known, ids, queries)
+                del known
+                reference, ref_name = decisions(found, dists, args.tolerance), "face_distance"
+                print(f"{n:>8} {'face_distance':>14} {legacy_bytes / 1e6:>13.1f} {ms:>11.3f} {1.0:>8.3f} {'-':>12}")
+
+            exact = ExactIndex()
+            exact.build(ids, np.array(mapped))
+            found, dists, ms = search_index(exact, queries, args.batch)
+            exact_decisions = decisions(found, dists, args.tolerance)
+            if reference is None:
+                reference, ref_name = exact_decisions, "exact"
+                agreement = 1.0
+            else:
+                agreement = float(np.mean(exact_decisions == reference))
+            print(f"{n:>8} {'exact float32':>14} {resident_bytes(exact) / 1e6:>13.1f} {ms:>11.3f} "
+                  f"{agreement:>8.3f} {ref_name:>12}")
+            del exact
+
+            for dtype in ("float16", "int8"):
+                for candidates in args.candidates:
+                    index = QuantizedIndex(dtype=dtype, candidates=candidates)
+                    index.build(ids, mapped)
+                    found, dists, ms = search_index(index, queries, args.batch)
+                    agreement = float(np.mean(decisions(found, dists, args.tolerance) == reference))
+                    label = f"{dtype}/top{candidates}"
+                    print(f"{n:>8} {label:>14} {resident_bytes(index) / 1e6:>13.1f} {ms:>11.3f} "
+                          f"{agreement:>8.3f} {ref_name:>12}")
+                    del index
+            del mapped
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# bench_service.py
+# Client de charge pour access_server.py : N portes simultanées envoient des
+# encodages synthétiques (ou une image) en continu pendant quelques secondes.
+# Affiche le débit, la latence p50 / p95 / p99 et la répartition des statuts
+# (200, 429 saturé, 504 échéance dépassée).
+#
+#   python access_server.py &
+#   python -m benchmarks.bench_service --clients 1 16 64 --seconds 5
+#   python -m benchmarks.bench_service --image visage.jpg --clients 8
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+import numpy as np
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    body = await reader.readexactly(length)
+    return status, body
+
+
+async def door_client(door, args, payload, headers, stop_at, latencies, statuses):
+    """Une porte : une connexion keep-alive, une requête à la fois."""
+    reader = writer = None
+    while time.monotonic() < stop_at:
+        start = time.perf_counter()
+        if writer is None:
+            reader, writer = await asyncio.open_connection(args.host, args.port)
+        request = ["POST /recognize HTTP/1.1", f"Host: {args.host}", f"Content-Length: {len(payload)}",
+                   f"X-Door: porte{door}"]
+        request += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(request) + "\r\n\r\n").encode() + payload)
+        await writer.drain()
+        status, _ = await read_response(reader)
+        statuses[status] += 1
+        if status == 200:
+            latencies.append(time.perf_counter() - start)
+        elif status == 429:
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def run(args, clients):
+    if args.image:
+        with open(args.image, "rb") as f:
+            payload = f.read()
+        headers = {"Content-Type": "image/jpeg", "X-Deadline-Ms": args.deadline_ms}
+    else:
+        rng = np.random.default_rng(0)
+        encodings = rng.normal(0.0, 0.09, size=(args.faces, 128)).round(5).tolist()
+        payload = json.dumps({"encodings": encodings, "deadline_ms": args.deadline_ms}).encode()
+        headers = {"Content-Type": "application/json"}
+
+    latencies, statuses = [], Counter()
+    stop_at = time.monotonic() + args.seconds
+    await asyncio.gather(*(door_client(i, args, payload, headers, stop_at, latencies, statuses)
+                           for i in range(clients)))
+    return latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Charge simultanée de N portes sur access_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--faces", type=int, default=1, help="encodages par requête")
+    parser.add_argument("--image", help="image envoyée à la place des encodages")
+    parser.add_argument("--deadline-ms", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'portes':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuts")
+    for clients in args.clients:
+        latencies, statuses = asyncio.run(run(args, clients))
+        ok = statuses.get(200, 0)
+        if latencies:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        else:
+            p50 = p95 = p99 = float("nan")
+        print(f"{clients:>7} {ok / args.seconds:>8.0f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}  {dict(statuses)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# bench_startup.py
+# Démarrage à froid de l'application Streamlit, chaque mesure dans un
+# processus Python neuf :
+#   - temps d'import des modules chargés par app.py avant la page de connexion
+#     (ancien jeu d'imports, vues vision comprises, et nouveau jeu) ;
+#   - premier affichage : première exécution complète du script (page de
+#     connexion) avec streamlit.testing, puis un rerun dans le même processus.
+#     L'application tourne sur une base temporaire (FACE_DB) : init_db ne
+#     touche pas à users.db.
+#
+#   python -m benchmarks.bench_startup --repeat 5
+#   git show <commit>:app.py > app_avant.py && python -m benchmarks.bench_startup --apps app_avant.py app.py
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SETS = {
+    "avant": ["streamlit", "streamlit_option_menu", "models.models", "views.add_user_view",
+              "views.recognition_view", "views.account_management_view", "views.diagnostics_view",
+              "controllers.metrics", "PIL.Image"],
+    "après": ["streamlit", "streamlit_option_menu", "models.models",
+              "views.account_management_view", "controllers.metrics"],
+}
+
+IMPORT_SCRIPT = """
+import sys, time
+t0 = time.perf_counter()
+for name in sys.argv[1:]:
+    __import__(name)
+print(time.perf_counter() - t0)
+"""
+
+PAINT_SCRIPT = """
+import sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+app.run()
+first = time.perf_counter() - t0
+if app.exception:
+    raise SystemExit(str(app.exception[0].value))
+t0 = time.perf_counter()
+app.run()
+print(first, time.perf_counter() - t0)
+"""
+
+
+def run_python(script, *args, env=None):
+    result = subprocess.run(
+        [sys.executable, "-c", script, *args], cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "PYTHONPATH": ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""), **(env or {})}
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "échec")
+    return [float(v) for v in result.stdout.split()]
+
+
+def report(label, samples):
+    samples = np.asarray(samples) * 1000
+    print(f"{label:<40} {np.median(samples):>10.0f} {samples.min():>10.0f} {samples.max():>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps d'import et de premier affichage de app.py")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--apps", nargs="+", default=["app.py"],
+                        help="scripts à comparer (ex. ancienne version extraite avec git show)")
+    args = parser.parse_args()
+
+    print(f"{'mesure (ms)':<40} {'médiane':>10} {'min':>10} {'max':>10}")
+    for label, modules in IMPORT_SETS.items():
+        try:
+            report(f"imports {label}", [run_python(IMPORT_SCRIPT, *modules)[0] for _ in range(args.repeat)])
+        except RuntimeError as e:
+            print(f"imports {label} : ignoré ({e})")
+
+    for app in args.apps:
+        try:
+            runs = []
+            for _ in range(args.repeat):
+                # Base neuve à chaque mesure : init_db crée le schéma comme au premier lancement
+                with tempfile.TemporaryDirectory() as tmp:
+                    runs.append(run_python(PAINT_SCRIPT, app, env={"FACE_DB": os.path.join(tmp, "users.db")}))
+        except RuntimeError as e:
+            print(f"{app} : ignoré ({e})")
+            continue
+        report(f"{app} premier affichage", [first for first, _ in runs])
+        report(f"{app} rerun", [rerun for _, rerun in runs])
+
+
+if __name__ == "__main__":
+    main()
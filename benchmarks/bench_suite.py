@@ -0,0 +1,322 @@
+# bench_suite.py
+# Suite de benchmarks reproductible, sans caméra :
+#   - gallery_load : chargement de la galerie (SQLite ou instantané projeté -> index)
+#   - match        : latence de Gallery.match selon la taille de la galerie
+#   - detection    : débit de detect_faces selon la résolution et `scale`
+#   - embedding    : débit d'encode_faces (visages/s) selon la résolution
+#   - end_to_end   : latence par image de recognize_faces et de FaceTracker
+# Les galeries sont synthétiques (mêmes encodages que bench_index), les images
+# générées ou lues depuis une vidéo / un dossier de photos enregistrés.
+# Résultats en JSON ; --baseline signale les régressions par rapport à un
+# fichier de référence (code de sortie 1).
+#
+#   python -m benchmarks.bench_suite --output resultats.json
+#   python -m benchmarks.bench_suite --only gallery_load match --baseline reference.json
+import argparse
+import glob
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_index import synthetic_gallery, synthetic_queries
+from models import database, models
+from models import snapshot
+from models.gallery import Gallery
+
+BENCHMARKS = ("gallery_load", "match", "detection", "embedding", "end_to_end")
+RESOLUTIONS = {"480p": (480, 640), "720p": (720, 1280), "1080p": (1080, 1920)}
+
+
+# --------------------
+# Outils de mesure
+# --------------------
+def median_time(fn, repeat, warmup=1):
+    """Durée médiane (s) de `repeat` appels à fn() après `warmup` appels ignorés."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations))
+
+
+def result(benchmark, params, value, unit, higher_is_better=False):
+    return {
+        "benchmark": benchmark,
+        "params": params,
+        "value": value,
+        "unit": unit,
+        "higher_is_better": higher_is_better,
+    }
+
+
+def result_key(entry):
+    return entry["benchmark"] + "[" + ",".join(f"{k}={v}" for k, v in sorted(entry["params"].items())) + "]"
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "face_index": os.environ.get("FACE_INDEX", "exact"),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def use_database(path, users):
+    """Base de test contenant `users` employés synthétiques ; retourne leurs encodages."""
+    database.close_connections()
+    models.DB_FILE = path
+    models.init_db()
+    gallery = synthetic_gallery(users)
+    batch = 5000
+    for i in range(0, users, batch):
+        models.add_users_bulk((f"employe {j}", gallery[j], None) for j in range(i, min(users, i + batch)))
+    return gallery
+
+
+# --------------------
+# Images de test
+# --------------------
+def synthetic_frames(n, size, seed=0):
+    """Images BGR générées : bruit lissé, pour que la détection parcoure toute l'image."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(n):
+        frame = rng.integers(0, 255, size=(size[0] // 8, size[1] // 8, 3), dtype=np.uint8)
+        frames.append(cv2.resize(frame, (size[1], size[0]), interpolation=cv2.INTER_LINEAR))
+    return frames
+
+
+def recorded_frames(source, n, size):
+    """Images BGR lues depuis une vidéo ou un dossier de photos, redimensionnées à `size`."""
+    frames = []
+    if os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, "*"))):
+            if path.lower().endswith((".jpg", ".jpeg", ".png")):
+                image = cv2.imread(path)
+                if image is not None:
+                    frames.append(image)
+            if len(frames) >= n:
+                break
+    else:
+        capture = cv2.VideoCapture(source)
+        while len(frames) < n:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+    if not frames:
+        raise SystemExit(f"Aucune image lisible dans {source}")
+    return [cv2.resize(frame, (size[1], size[0]), interpolation=cv2.INTER_AREA) for frame in frames]
+
+
+def load_frames(args, resolution):
+    size = RESOLUTIONS[resolution]
+    if args.frames_from:
+        return recorded_frames(args.frames_from, args.frames, size)
+    return synthetic_frames(args.frames, size)
+
+
+# --------------------
+# Benchmarks
+# --------------------
+def bench_gallery(args, tmp):
+    """Chargement de la galerie puis latence de correspondance, par taille de galerie."""
+    entries = []
+    for users in args.sizes:
+        encodings = use_database(os.path.join(tmp, f"gallery_{users}.db"), users)
+        gallery = Gallery(use_snapshot=False)
+        if "gallery_load" in args.only:
+            seconds = median_time(gallery.reload, args.repeat)
+            entries.append(result("gallery_load", {"users": users, "source": "sqlite"}, seconds, "s"))
+            snap = gallery.snapshot()
+            snapshot.write_snapshot(snap.version, snap.ids, snap.names, snap.encodings, models.get_database_id())
+            mapped = Gallery()
+            seconds = median_time(mapped.reload, args.repeat)
+            entries.append(result("gallery_load", {"users": users, "source": "snapshot"}, seconds, "s"))
+            models.remove_user_listener(mapped._on_user_event)
+        if "match" in args.only:
+            gallery.reload()
+            queries = synthetic_queries(encodings, 256)
+            for faces in (1, 8):
+                batches = [queries[i:i + faces] for i in range(0, len(queries), faces)]
+                cycle = itertools.cycle(batches)
+                seconds = median_time(lambda: gallery.match(next(cycle), args.tolerance),
+                                      max(args.repeat, 50), warmup=5)
+                entries.append(result("match", {"users": users, "faces": faces}, 1000 * seconds, "ms"))
+        models.remove_user_listener(gallery._on_user_event)
+        print(f"  galerie {users:>7} employés : ok", file=sys.stderr)
+    return entries
+
+
+def bench_detection(args):
+    from controllers.controller import detect_faces
+
+    entries = []
+    for resolution in args.resolutions:
+        frames = load_frames(args, resolution)
+        for scale in args.scales:
+            detect_faces(frames[0], scale)
+            start = time.perf_counter()
+            for frame in frames:
+                detect_faces(frame, scale)
+            fps = len(frames) / (time.perf_counter() - start)
+            entries.append(result("detection", {"resolution": resolution, "scale": scale}, fps, "images/s", True))
+            print(f"  détection {resolution} x{scale} : {fps:.1f} images/s", file=sys.stderr)
+    return entries
+
+
+def bench_embedding(args):
+    from controllers.controller import encode_faces
+
+    entries = []
+    for resolution in args.resolutions:
+        frames = load_frames(args, resolution)
+        h, w = RESOLUTIONS[resolution]
+        for faces in (1, 4):
+            # Boîtes fixes de ~150 px : le réseau dlib s'exécute quel que soit le contenu
+            box = min(150, h - 10, (w - 10) // faces - 10)
+            locations = [(5, 5 + i * (box + 10) + box, 5 + box, 5 + i * (box + 10)) for i in range(faces)]
+            rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+            encode_faces(rgb_frames[0], locations)
+            start = time.perf_counter()
+            for rgb in rgb_frames:
+                encode_faces(rgb, locations)
+            rate = faces * len(rgb_frames) / (time.perf_counter() - start)
+            entries.append(result("embedding", {"resolution": resolution, "faces": faces}, rate, "visages/s", True))
+            print(f"  encodage {resolution} {faces} visage(s) : {rate:.1f} visages/s", file=sys.stderr)
+    return entries
+
+
+def bench_end_to_end(args, tmp):
+    from controllers.controller import recognize_faces
+    from controllers.tracking import FaceTracker
+
+    use_database(os.path.join(tmp, "end_to_end.db"), args.e2e_users)
+    entries = []
+    for resolution in args.resolutions:
+        frames = load_frames(args, resolution)
+        for scale in args.scales:
+            pipelines = {
+                "recognize_faces": lambda frame: recognize_faces(frame, args.tolerance, scale),
+                "tracker": FaceTracker(args.tolerance, scale).process,
+            }
+            for pipeline, process in pipelines.items():
+                latencies = []
+                for frame in frames:
+                    start = time.perf_counter()
+                    process(frame)
+                    latencies.append(time.perf_counter() - start)
+                params = {"pipeline": pipeline, "resolution": resolution, "scale": scale}
+                p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+                entries.append(result("end_to_end", dict(params, stat="p50"), float(p50), "ms"))
+                entries.append(result("end_to_end", dict(params, stat="p95"), float(p95), "ms"))
+                print(f"  bout en bout {pipeline} {resolution} x{scale} : p50 {p50:.1f} ms", file=sys.stderr)
+    return entries
+
+
+# --------------------
+# Comparaison avec une référence
+# --------------------
+def compare(current, baseline, threshold):
+    """Liste des (clé, référence, actuel, écart relatif, régression ?) pour les mesures communes."""
+    reference = {result_key(entry): entry for entry in baseline["results"]}
+    rows = []
+    for entry in current["results"]:
+        key = result_key(entry)
+        ref = reference.get(key)
+        if ref is None or not ref["value"]:
+            continue
+        change = (entry["value"] - ref["value"]) / ref["value"]
+        worse = -change if entry["higher_is_better"] else change
+        rows.append((key, ref["value"], entry["value"], change, worse > threshold))
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"\n{'mesure':<60} {'référence':>11} {'actuel':>11} {'écart':>8}")
+    for key, ref, value, change, regression in rows:
+        flag = "  RÉGRESSION" if regression else ""
+        print(f"{key:<60} {ref:>11.4g} {value:>11.4g} {change:>+7.1%}{flag}")
+    regressions = sum(1 for row in rows if row[4])
+    print(f"\n{regressions} régression(s) au-delà de {threshold:.0%} sur {len(rows)} mesure(s) comparée(s).")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de la chaîne de reconnaissance, résultats en JSON")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000],
+                        help="tailles de galerie pour gallery_load et match")
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=["480p", "720p"])
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.25, 0.5])
+    parser.add_argument("--frames", type=int, default=20, help="images par configuration")
+    parser.add_argument("--frames-from", help="vidéo ou dossier de photos à la place des images générées")
+    parser.add_argument("--e2e-users", type=int, default=1000, help="taille de la galerie en bout en bout")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="fichier JSON des résultats (sinon sortie standard)")
+    parser.add_argument("--baseline", help="résultats de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="dégradation relative tolérée avant de signaler une régression")
+    args = parser.parse_args()
+
+    report = {"environment": environment(), "results": [], "skipped": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        if {"gallery_load", "match"} & set(args.only):
+            report["results"] += bench_gallery(args, tmp)
+        for name, bench in (("detection", bench_detection), ("embedding", bench_embedding),
+                            ("end_to_end", lambda a: bench_end_to_end(a, tmp))):
+            if name not in args.only:
+                continue
+            try:
+                report["results"] += bench(args)
+            except ImportError as e:
+                # face_recognition / dlib absents : on garde les autres mesures
+                report["skipped"][name] = str(e)
+                print(f"  {name} ignoré : {e}", file=sys.stderr)
+        # Vide le journal d'accès avant la suppression des bases temporaires
+        if "end_to_end" in args.only and "end_to_end" not in report["skipped"]:
+            from controllers.access_logger import get_access_logger
+            get_access_logger().flush()
+        database.close_connections()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        if print_comparison(rows, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# bulk_enroll.py
+# Enrôlement en masse depuis la ligne de commande.
+#
+#   python bulk_enroll.py photos/          # un dossier par employé ou un fichier par employé
+#   python bulk_enroll.py departement.zip --report rejets.csv
+#   python bulk_enroll.py "Awa Diop.zip" --layout folders   # archive d'une seule personne
+#
+# Relancer la même commande reprend l'import là où il s'était arrêté
+# (manifeste <source>.manifest.jsonl par défaut).
+import argparse
+import sys
+import time
+
+from controllers.bulk_import import LAYOUTS, bulk_import
+from models.models import init_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import en masse des photos d'employés")
+    parser.add_argument("source", help="dossier de photos ou archive ZIP")
+    parser.add_argument("--manifest", help="manifeste de reprise (défaut : <source>.manifest.jsonl)")
+    parser.add_argument("--report", help="rapport CSV des photos sans visage ou avec plusieurs visages "
+                                         "(défaut : <source>.report.csv)")
+    parser.add_argument("--workers", type=int, default=None, help="processus (défaut : nb de cœurs)")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="employés écrits par transaction (photos rejetées non comptées)")
+    parser.add_argument("--max-size", type=int, default=1024, help="côté maximal des photos avant détection")
+    parser.add_argument("--keep-photos", action="store_true", help="enregistre aussi la photo d'origine")
+    parser.add_argument("--layout", choices=LAYOUTS, default="auto",
+                        help="nom de l'employé : dossier parent (folders), nom du fichier (files) "
+                             "ou détection (auto, défaut)")
+    args = parser.parse_args()
+
+    source = args.source.rstrip("/\\")
+    manifest = args.manifest or f"{source}.manifest.jsonl"
+    report = args.report or f"{source}.report.csv"
+
+    init_db()
+    start = time.time()
+
+    def progress(done, total):
+        sys.stdout.write(f"\r{done}/{total} photos traitées")
+        sys.stdout.flush()
+
+    counts = bulk_import(
+        args.source, manifest, report_path=report, workers=args.workers,
+        batch_size=args.batch_size, max_size=args.max_size,
+        keep_photos=args.keep_photos, layout=args.layout, progress=progress
+    )
+    elapsed = time.time() - start
+    print()
+    print(f"✅ {counts['imported']} photos importées ({counts['users']} employés) en {elapsed:.1f} s")
+    print(f"⚠️ {counts['no_face']} sans visage, {counts['multiple_faces']} avec plusieurs visages, "
+          f"{counts['error']} illisibles (voir {report})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# camera_server.py
+# Point d'entrée sans interface : reconnaissance sur plusieurs caméras.
+#
+#   python camera_server.py --camera porte1=0 --camera porte2=rtsp://10.0.0.12/stream
+#
+# Commandes sur l'entrée standard pendant l'exécution :
+#   add <id> <source>   ajoute une caméra
+#   remove <id>         retire une caméra
+#   stats               affiche les statistiques par caméra
+#   quit                arrête le serveur
+import argparse
+import sys
+import threading
+import time
+
+from controllers.metrics import start_metrics_server
+from controllers.multicam import MultiCameraServer
+from models.models import init_db
+
+
+def parse_camera(value):
+    camera_id, sep, source = value.partition("=")
+    if not sep or not camera_id or not source:
+        raise argparse.ArgumentTypeError("format attendu : id=source")
+    return camera_id, source
+
+
+def print_stats(server):
+    for camera_id, stats in server.stats().items():
+        latency = stats["avg_latency_ms"]
+        print(
+            f"[{camera_id}] capture {stats['capture_fps']:.1f} fps | "
+            f"traitement {stats['processed_fps']:.1f} fps | "
+            f"latence {'-' if latency is None else f'{latency:.0f} ms'} | "
+            f"visages {stats['faces']}",
+            flush=True
+        )
+    print(f"Débit : {server.faces_per_second():.1f} visages/s", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur de reconnaissance multi-caméras")
+    parser.add_argument("--camera", type=parse_camera, action="append", default=[],
+                        help="caméra id=source (index, URL RTSP ou fichier vidéo), répétable")
+    parser.add_argument("--workers", type=int, default=None, help="processus de détection (défaut : nb de cœurs)")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--scale", type=float, default=0.5)
+    parser.add_argument("--loop", action="store_true", help="reboucle les fichiers vidéo (tests)")
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="expose /metrics (format Prometheus) sur ce port local")
+    args = parser.parse_args()
+
+    init_db()
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    last_names = {}
+
+    def on_result(camera_id, results, alert):
+        names = sorted(name for _, name in results)
+        if names != last_names.get(camera_id):
+            last_names[camera_id] = names
+            status = "ALERTE" if alert else "ok"
+            print(f"[{camera_id}] {status} : {', '.join(names) or 'aucun visage'}", flush=True)
+
+    server = MultiCameraServer(workers=args.workers, tolerance=args.tolerance, scale=args.scale, on_result=on_result)
+    for camera_id, source in args.camera:
+        server.add_camera(camera_id, source, loop=args.loop)
+    server.start()
+
+    stop = threading.Event()
+
+    def stats_loop():
+        while not stop.wait(args.stats_interval):
+            print_stats(server)
+
+    threading.Thread(target=stats_loop, daemon=True).start()
+
+    try:
+        for line in sys.stdin:
+            parts = line.split()
+            if not parts:
+                continue
+            command = parts[0]
+            try:
+                if command == "add" and len(parts) == 3:
+                    server.add_camera(parts[1], parts[2], loop=args.loop)
+                elif command == "remove" and len(parts) == 2:
+                    server.remove_camera(parts[1])
+                elif command == "stats":
+                    print_stats(server)
+                elif command == "quit":
+                    break
+                else:
+                    print("Commandes : add <id> <source> | remove <id> | stats | quit", flush=True)
+            except ValueError as e:
+                print(f"Erreur : {e}", flush=True)
+        else:
+            # Entrée standard fermée (lancement en service) : on tourne jusqu'à Ctrl+C
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
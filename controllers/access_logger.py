@@ -0,0 +1,162 @@
+# access_logger.py
+# Journalisation des décisions d'accès en écriture différée : la boucle de
+# reconnaissance ne fait qu'ajouter l'événement à un tampon en mémoire, un
+# thread l'écrit en base par lots (sur minuterie ou quand le tampon est plein).
+# Le même thread applique périodiquement la rétention du journal brut.
+import atexit
+import threading
+import time
+
+import cv2
+
+from models.models import add_access_events, compact_access_events
+
+GRANTED = "granted"
+DENIED = "denied"
+COMPACTION_INTERVAL = 24 * 3600
+
+# Dernier passage journalisé : par nom pour les employés, par caméra pour les inconnus
+recent_faces = {}
+recent_unknown = {}
+
+
+class AccessEventLogger:
+    def __init__(self, flush_interval=2.0, max_batch=200, max_buffer=10000, thumbnail_size=96,
+                 compaction_interval=COMPACTION_INTERVAL):
+        self.flush_interval = flush_interval
+        self.compaction_interval = compaction_interval
+        self.max_batch = max_batch
+        self.max_buffer = max_buffer
+        self.thumbnail_size = thumbnail_size
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.compacted = 0
+        self._next_compaction = time.monotonic() + 60.0   # pas pendant le démarrage
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="access-logger", daemon=True)
+        self._thread.start()
+
+    def log(self, name, granted, camera="webcam", distance=None, face=None, timestamp=None):
+        """Ajoute un événement sans jamais attendre SQLite.
+
+        `face` est un recadrage BGR du visage (optionnel) : la vignette JPEG est
+        produite dans le thread d'écriture, pas dans la boucle vidéo.
+        """
+        event = (
+            timestamp if timestamp is not None else time.time(),
+            camera,
+            name,
+            GRANTED if granted else DENIED,
+            None if distance is None or distance == float("inf") else float(distance),
+            None if face is None else face.copy(),
+        )
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer:
+                # Base indisponible trop longtemps : on sacrifie les plus anciens
+                self._buffer.pop(0)
+                self.dropped += 1
+            self._buffer.append(event)
+            self.logged += 1
+            if len(self._buffer) >= self.max_batch:
+                self._cond.notify()
+
+    def _thumbnail(self, face):
+        if face is None or not face.size:
+            return None
+        h, w = face.shape[:2]
+        ratio = self.thumbnail_size / float(max(h, w))
+        if ratio < 1:
+            face = cv2.resize(face, (max(1, int(w * ratio)), max(1, int(h * ratio))), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", face, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        return jpeg.tobytes() if ok else None
+
+    def flush(self):
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        rows = [event[:5] + (self._thumbnail(event[5]),) for event in batch]
+        try:
+            add_access_events(rows)
+            self.written += len(rows)
+        except Exception:
+            # On remet les événements en tête du tampon pour le prochain essai
+            self.failed_flushes += 1
+            with self._cond:
+                self._buffer = batch + self._buffer
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stop and len(self._buffer) < self.max_batch:
+                    self._cond.wait(self.flush_interval)
+                stop = self._stop
+            self.flush()
+            if stop:
+                return
+            if self.compaction_interval and time.monotonic() >= self._next_compaction:
+                self._next_compaction = time.monotonic() + self.compaction_interval
+                self.compact()
+
+    def compact(self):
+        try:
+            deleted, _ = compact_access_events()
+            self.compacted += deleted
+        except Exception:
+            pass  # réessayé à la prochaine échéance ; le journal continue
+
+    def close(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join(5.0)
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def get_access_logger():
+    """Journal unique pour tout le processus, vidé à l'arrêt."""
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = AccessEventLogger()
+                atexit.register(_logger.close)
+    return _logger
+
+
+def record_access(name, distance=None, camera="webcam", frame=None, box=None,
+                  alert_cooldown=5, current_time=None, frame_valid=None):
+    """Journalise la décision au plus une fois par identité tous les `alert_cooldown` secondes.
+
+    Les inconnus sont regroupés par caméra. `frame_valid()` (optionnel) est
+    appelé après la copie du visage : False si l'image a été réécrite entre-temps
+    (anneau partagé), la vignette est alors abandonnée.
+    Retourne True si l'événement a été journalisé.
+    """
+    current_time = current_time if current_time is not None else time.time()
+    if name == "Inconnu":
+        recent, key = recent_unknown, camera
+    else:
+        recent, key = recent_faces, name
+    if key in recent and current_time - recent[key] < alert_cooldown:
+        return False
+    recent[key] = current_time
+
+    face = None
+    if frame is not None and box is not None:
+        top, right, bottom, left = box
+        face = frame[max(0, top):max(0, bottom), max(0, left):max(0, right)].copy()
+        if frame_valid is not None and not frame_valid():
+            face = None   # copie possiblement mélangée avec l'image suivante
+    get_access_logger().log(
+        None if name == "Inconnu" else name, name != "Inconnu",
+        camera=camera, distance=distance, face=face, timestamp=current_time
+    )
+    return True
@@ -0,0 +1,418 @@
+# access_service.py
+# Service de reconnaissance asyncio pour les contrôleurs de porte et bornes :
+# un client envoie une image (JPEG/PNG) ou des encodages déjà calculés et
+# reçoit la décision autorisé / refusé.
+#   - les requêtes simultanées sont regroupées en micro-lots (max_batch
+#     requêtes ou max_wait secondes) : une détection + encodage par lot dans
+#     le pool de processus, une seule recherche dans la galerie
+#   - chaque requête a une échéance ; passée l'échéance elle n'est plus traitée
+#   - au-delà de max_pending requêtes en attente, rejet immédiat (HTTP 429)
+#   - un pool de processus cassé est remplacé (HTTP 503 pour le lot perdu)
+# Le serveur HTTP/1.1 minimal (keep-alive, Content-Length) repose uniquement
+# sur asyncio : pas de dépendance supplémentaire.
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from controllers.access_logger import GRANTED, DENIED, record_access
+from controllers.match_cache import MatchCache
+from controllers.metrics import metrics
+from controllers.worker_pool import init_worker, new_pool
+from models.models import ENCODING_DIM
+
+UNKNOWN = "Inconnu"
+MAX_BODY = 8 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """Trop de requêtes en attente : le client doit réessayer plus tard (429)."""
+
+
+class DeadlineExceeded(Exception):
+    """L'échéance de la requête est passée avant la réponse (504)."""
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def decode_detect_encode(images, scale=0.5):
+    """Exécuté dans un processus du pool : décodage, détection puis encodage par lot.
+
+    Retourne [(boîtes en coordonnées d'origine, encodages (N, 128))], une entrée
+    par image ; une image illisible donne None (à distinguer d'une image sans visage).
+    """
+    from controllers.embedding import detect_and_encode_batch
+
+    rgb_small, positions, outputs = [], [], [None] * len(images)
+    for i, data in enumerate(images):
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            continue
+        small = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        rgb_small.append(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        positions.append(i)
+    if rgb_small:
+        locations, encodings = detect_and_encode_batch(rgb_small)
+        for i, locs, encs in zip(positions, locations, encodings):
+            boxes = [tuple(int(v / scale) for v in loc) for loc in locs]
+            outputs[i] = (boxes, encs)
+    return outputs
+
+
+class _Request:
+    __slots__ = ("door", "image", "encodings", "deadline", "future", "received", "finished")
+
+    def __init__(self, door, image, encodings, deadline, future):
+        self.door = door
+        self.image = image
+        self.encodings = encodings
+        self.deadline = deadline
+        self.future = future
+        self.received = time.monotonic()
+        self.finished = False
+
+
+class RecognitionService:
+    """Regroupe les requêtes de reconnaissance en micro-lots traités hors de la boucle asyncio."""
+
+    def __init__(self, workers=None, tolerance=0.5, scale=0.5, max_batch=16, max_wait=0.005,
+                 max_pending=64, default_deadline=1.0, gallery=None, alert_cooldown=5):
+        from models.gallery import get_gallery
+        self.tolerance = tolerance
+        self.scale = scale
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.default_deadline = default_deadline
+        self.alert_cooldown = alert_cooldown
+        self.gallery = gallery if gallery is not None else get_gallery()
+        self.match_cache = MatchCache()
+        self.workers = workers or os.cpu_count()
+        self.pool = None
+        self.pending = 0
+        self.rejected = 0
+        self.expired = 0
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        self.pool = new_pool(self.workers)
+        # Démarre les processus et charge les modèles dlib avant la première requête
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, init_worker) for _ in range(self.workers)))
+        self._queue = asyncio.Queue()
+        # Deux lots peuvent être en vol : l'un encode pendant que l'autre se remplit
+        self._tasks = [asyncio.create_task(self._batch_loop()) for _ in range(2)]
+        return self
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    # --------------------
+    # API
+    # --------------------
+    async def recognize(self, image=None, encodings=None, door="porte", deadline=None):
+        """Décision pour une image (bytes JPEG/PNG) ou des encodages (N, 128).
+
+        Lève Overloaded si la file est pleine, DeadlineExceeded si la réponse
+        n'est pas prête avant `deadline` secondes.
+        """
+        if (image is None) == (encodings is None):
+            raise BadRequest("fournir soit une image, soit des encodages")
+        if encodings is not None:
+            try:
+                encodings = np.asarray(encodings, dtype=np.float32)
+            except (TypeError, ValueError):
+                raise BadRequest("encodages invalides")
+            if encodings.ndim != 2 or encodings.shape[1] != ENCODING_DIM:
+                raise BadRequest(f"encodages attendus de forme (N, {ENCODING_DIM})")
+            if not np.isfinite(encodings).all():
+                raise BadRequest("encodages non finis (NaN ou infini)")
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            metrics.inc("service_rejected")
+            raise Overloaded()
+
+        timeout = deadline if deadline is not None else self.default_deadline
+        future = asyncio.get_running_loop().create_future()
+        self.pending += 1
+        metrics.set_gauge("service_pending", self.pending)
+        await self._queue.put(_Request(door, image, encodings, time.monotonic() + timeout, future))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            self.expired += 1
+            metrics.inc("service_deadline_exceeded")
+            raise DeadlineExceeded()
+
+    def stats(self):
+        return {"pending": self.pending, "rejected": self.rejected, "expired": self.expired,
+                "cache_hits": self.match_cache.hits, "cache_misses": self.match_cache.misses}
+
+    # --------------------
+    # Micro-lots
+    # --------------------
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        limit = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = limit - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _finish(self, request, result=None, error=None):
+        # Une seule fois par requête : le compteur pending n'est décrémenté qu'une fois
+        if request.finished:
+            return
+        request.finished = True
+        self.pending -= 1
+        metrics.set_gauge("service_pending", self.pending)
+        if request.future.done():
+            return
+        if error is not None:
+            request.future.set_exception(error)
+        else:
+            request.future.set_result(result)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            now = time.monotonic()
+            live = []
+            for request in batch:
+                if now >= request.deadline:
+                    # Le client a déjà reçu son 504 : inutile de calculer
+                    self._finish(request, error=DeadlineExceeded())
+                else:
+                    live.append(request)
+            if not live:
+                continue
+            try:
+                await self._process(loop, live)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._restart_pool()
+                else:
+                    logger.exception("échec du traitement d'un lot de %d requêtes", len(live))
+                # Les requêtes déjà terminées par _process sont ignorées par _finish
+                for request in live:
+                    self._finish(request, error=e)
+
+    def _restart_pool(self):
+        """Remplace un pool cassé (processus tué, plus de mémoire...) par un pool neuf."""
+        logger.error("pool de reconnaissance cassé : redémarrage des processus")
+        metrics.inc("pool_restarts")
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = new_pool(self.workers)
+
+    async def _process(self, loop, batch):
+        start = time.perf_counter()
+        with_image = [r for r in batch if r.image is not None]
+        detected = {}
+        if with_image:
+            # Une tranche d'images par processus, en parallèle
+            n_chunks = min(self.workers, len(with_image))
+            chunks = [with_image[i::n_chunks] for i in range(n_chunks)]
+            outputs = await asyncio.gather(*(
+                loop.run_in_executor(self.pool, decode_detect_encode, [r.image for r in chunk], self.scale)
+                for chunk in chunks
+            ))
+            for chunk, output in zip(chunks, outputs):
+                for request, result in zip(chunk, output):
+                    detected[id(request)] = result
+        metrics.observe("service_detect_encode", time.perf_counter() - start)
+
+        ready, per_request = [], []
+        for request in batch:
+            if request.image is None:
+                per_request.append(([None] * len(request.encodings), request.encodings))
+            elif detected[id(request)] is None:
+                # Image non décodable : erreur du client, pas un refus d'accès
+                self._finish(request, error=BadRequest("image illisible"))
+                continue
+            else:
+                per_request.append(detected[id(request)])
+            ready.append(request)
+        batch = ready
+        all_encodings = [encs for _, encs in per_request if len(encs)]
+        all_encodings = np.concatenate(all_encodings) if all_encodings else np.empty((0, ENCODING_DIM), np.float32)
+
+        # Une seule recherche pour tout le lot, hors de la boucle d'événements
+        with metrics.timer("service_matching"):
+            matches = await loop.run_in_executor(None, self._match, all_encodings)
+
+        offset = 0
+        now = time.time()
+        for request, (boxes, encs) in zip(batch, per_request):
+            faces = []
+            for box, (name, distance) in zip(boxes, matches[offset:offset + len(encs)]):
+                label = name if name is not None else UNKNOWN
+                record_access(label, distance, request.door, None, None, self.alert_cooldown, now)
+                faces.append({"name": name, "distance": None if distance == float("inf") else round(distance, 4),
+                              "box": None if box is None else list(box)})
+            offset += len(encs)
+            granted = any(face["name"] is not None for face in faces)
+            metrics.observe("service_latency", time.monotonic() - request.received)
+            self._finish(request, {"decision": GRANTED if granted else DENIED, "door": request.door, "faces": faces})
+        metrics.inc("service_requests", len(batch))
+        metrics.observe("service_batch_size", len(batch))
+
+    def _match(self, encodings):
+        return self.match_cache.match(encodings, self.tolerance, self.gallery.version,
+                                      lambda queries: self.gallery.match(queries, self.tolerance))
+
+
+# --------------------
+# Serveur HTTP minimal
+# --------------------
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+               503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+def _response(status, body, content_type="application/json", extra_headers=()):
+    if not isinstance(body, bytes):
+        body = json.dumps(body, ensure_ascii=False).encode()
+    headers = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+               f"Content-Type: {content_type}",
+               f"Content-Length: {len(body)}"]
+    headers += [f"{name}: {value}" for name, value in extra_headers]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+
+
+def _parse_recognize(headers, query, body):
+    """(image, encodings, door, deadline) à partir d'une requête POST /recognize."""
+    door = headers.get("x-door") or query.get("door", ["porte"])[0]
+    deadline_ms = headers.get("x-deadline-ms") or query.get("deadline_ms", [None])[0]
+    content_type = headers.get("content-type", "")
+    image = encodings = None
+    if content_type.startswith("application/json"):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise BadRequest("JSON invalide")
+        if not isinstance(payload, dict):
+            raise BadRequest("objet JSON attendu")
+        door = payload.get("door", door)
+        deadline_ms = payload.get("deadline_ms", deadline_ms)
+        if "encodings" in payload:
+            encodings = payload["encodings"]
+            if not isinstance(encodings, list):
+                raise BadRequest("encodages invalides")
+        elif "image" in payload:
+            if not isinstance(payload["image"], str):
+                raise BadRequest("image base64 attendue")
+            try:
+                image = base64.b64decode(payload["image"])
+            except ValueError:
+                raise BadRequest("image base64 invalide")
+    else:
+        image = body
+    if not isinstance(door, str):
+        raise BadRequest("porte invalide")
+    if image is not None and not image:
+        raise BadRequest("image vide")
+    if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (str, int, float, type(None))):
+        raise BadRequest("échéance invalide")
+    try:
+        deadline = None if deadline_ms is None else float(deadline_ms) / 1000.0
+    except ValueError:
+        raise BadRequest("échéance invalide")
+    if deadline is not None and not np.isfinite(deadline):
+        raise BadRequest("échéance invalide")
+    return image, encodings, door, deadline
+
+
+async def _route(service, method, target, headers, body):
+    url = urlsplit(target)
+    if url.path == "/health":
+        return _response(200, {"status": "ok", **service.stats()})
+    if url.path == "/metrics":
+        return _response(200, metrics.to_prometheus().encode(), "text/plain; version=0.0.4; charset=utf-8")
+    if url.path != "/recognize":
+        return _response(404, {"error": "inconnu"})
+    if method != "POST":
+        return _response(405, {"error": "POST attendu"})
+    try:
+        image, encodings, door, deadline = _parse_recognize(headers, parse_qs(url.query), body)
+        result = await service.recognize(image=image, encodings=encodings, door=door, deadline=deadline)
+        return _response(200, result)
+    except BadRequest as e:
+        return _response(400, {"error": str(e)})
+    except Overloaded:
+        return _response(429, {"error": "service saturé"}, extra_headers=[("Retry-After", "1")])
+    except DeadlineExceeded:
+        return _response(504, {"error": "échéance dépassée"})
+    except BrokenProcessPool:
+        # Le pool est déjà remplacé par _batch_loop : le client peut réessayer
+        return _response(503, {"error": "service en redémarrage"}, extra_headers=[("Retry-After", "1")])
+    except Exception:
+        logger.exception("erreur pendant le traitement de %s %s", method, url.path)
+        return _response(500, {"error": "erreur interne"})
+
+
+async def _handle_connection(service, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            except ValueError:
+                writer.write(_response(400, {"error": "requête invalide"}))
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                length = int(headers.get("content-length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                writer.write(_response(400, {"error": "Content-Length invalide"}))
+                break
+            if length > MAX_BODY:
+                writer.write(_response(413, {"error": "corps trop volumineux"}))
+                break
+            body = await reader.readexactly(length) if length else b""
+            writer.write(await _route(service, method.upper(), target, headers, body))
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host="127.0.0.1", port=8765):
+    """Démarre le service et le serveur HTTP ; retourne l'objet asyncio.Server."""
+    await service.start()
+    return await asyncio.start_server(lambda r, w: _handle_connection(service, r, w), host, port)
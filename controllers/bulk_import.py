@@ -0,0 +1,210 @@
+# bulk_import.py
+# Enrôlement en masse : parcourt un dossier ou une archive ZIP de photos,
+# détecte et encode les visages dans un pool de processus et écrit les employés
+# par lots, chacun en une seule transaction. Les photos d'une même personne
+# deviennent les échantillons d'un seul employé. Les photos importées sont
+# notées en base avec leurs employés, les photos rejetées dans un manifeste
+# (JSON lines) : un import interrompu reprend là où il s'était arrêté.
+import csv
+import io
+import json
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from models.models import get_imported_photos, import_users
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+STATUS_IMPORTED = "imported"
+STATUS_NO_FACE = "no_face"
+STATUS_MULTIPLE_FACES = "multiple_faces"
+STATUS_ERROR = "error"
+
+
+LAYOUTS = ("auto", "folders", "files")
+
+
+def _name_from_file(parts):
+    return os.path.splitext(parts[-1])[0].replace("_", " ").strip()
+
+
+def resolve_names(members, layout="auto"):
+    """Nom de l'employé de chaque photo : {member: name}.
+
+    - "folders" : un dossier par employé, le nom est le dossier parent
+      ("Informatique/Awa Diop/1.jpg" -> "Awa Diop") ;
+    - "files" : un fichier par employé ("Informatique/awa_diop.jpg" -> "awa diop") ;
+    - "auto" : retire le dossier racine commun à toutes les photos (archive
+      "export/..."), puis dossier parent s'il en reste un, sinon nom du fichier.
+      Une archive d'une seule personne ("Awa Diop/1.jpg", ...) demande "folders".
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"disposition inconnue : {layout}")
+    split = {m: m.replace("\\", "/").split("/") for m in members}
+    strip = 0
+    if layout == "auto" and split:
+        roots = {parts[0] for parts in split.values() if len(parts) >= 2}
+        if len(roots) == 1 and all(len(parts) >= 2 for parts in split.values()):
+            strip = 1
+    names = {}
+    for member, parts in split.items():
+        parts = parts[strip:]
+        if layout == "files" or len(parts) < 2:
+            names[member] = _name_from_file(parts)
+        else:
+            names[member] = parts[-2].strip()
+    return names
+
+
+def list_images(source):
+    """Liste les photos d'un dossier (récursivement) ou d'une archive ZIP : chemins relatifs triés."""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            members = [m for m in archive.namelist() if not m.endswith("/")]
+    else:
+        members = []
+        for root, _dirs, files in os.walk(source):
+            for filename in files:
+                members.append(os.path.relpath(os.path.join(root, filename), source).replace(os.sep, "/"))
+    return sorted(m for m in members if m.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def _read_bytes(source, member, archive=None):
+    if archive is not None:
+        return archive.read(member)
+    with open(os.path.join(source, member), "rb") as f:
+        return f.read()
+
+
+def _load_rgb(data, max_size):
+    from PIL import Image
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    if max_size and max(image.size) > max_size:
+        image.thumbnail((max_size, max_size))
+    return np.asarray(image)
+
+
+def process_chunk(source, members, max_size=1024, keep_photos=False):
+    """Exécuté dans un processus du pool : décode, détecte et encode un lot de photos.
+
+    Retourne [(member, status, encoding ou None, photo_bytes ou None, nb visages)].
+    """
+    import face_recognition
+    from controllers.embedding import encode_batch
+
+    archive = zipfile.ZipFile(source) if zipfile.is_zipfile(source) else None
+    try:
+        loaded, results = [], []
+        for member in members:
+            try:
+                data = _read_bytes(source, member, archive)
+                image = _load_rgb(data, max_size)
+                locations = face_recognition.face_locations(image)
+            except Exception as e:
+                results.append((member, STATUS_ERROR, None, None, str(e)))
+                continue
+            if len(locations) == 1:
+                loaded.append((member, image, locations, data if keep_photos else None))
+            else:
+                status = STATUS_NO_FACE if not locations else STATUS_MULTIPLE_FACES
+                results.append((member, status, None, None, len(locations)))
+
+        encodings = encode_batch([(image, locations) for _, image, locations, _ in loaded])
+        for (member, _image, _locations, photo), encoding in zip(loaded, encodings):
+            results.append((member, STATUS_IMPORTED, encoding[0], photo, 1))
+        return results
+    finally:
+        if archive is not None:
+            archive.close()
+
+
+def load_manifest(path):
+    """Photos déjà traitées lors d'un import précédent : {member: status}."""
+    done = {}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    done[entry["member"]] = entry["status"]
+    return done
+
+
+def bulk_import(source, manifest_path, report_path=None, workers=None, chunk_size=16,
+                batch_size=500, max_size=1024, keep_photos=False, layout="auto", progress=None):
+    """Importe toutes les photos de `source` ni déjà importées ni dans le manifeste.
+
+    Les employés sont écrits par transactions d'environ `batch_size` employés
+    (vérifié après chaque lot de photos) ; les photos rejetées ne comptent pas.
+    Retourne un dict {status: nombre} pour les photos traitées pendant cet appel,
+    plus "users" : le nombre d'employés créés ou complétés.
+    """
+    source_key = os.path.abspath(source)
+    images = list_images(source)
+    # Noms calculés sur toutes les photos : même disposition d'une reprise à l'autre
+    names = resolve_names(images, layout)
+    done = set(load_manifest(manifest_path)) | get_imported_photos(source_key)
+    members = [m for m in images if m not in done]
+    chunks = [members[i:i + chunk_size] for i in range(0, len(members), chunk_size)]
+    counts = {STATUS_IMPORTED: 0, STATUS_NO_FACE: 0, STATUS_MULTIPLE_FACES: 0, STATUS_ERROR: 0}
+
+    pending_users, pending_entries, user_ids = {}, [], set()
+
+    def flush(manifest, report):
+        # Les photos importées sont notées en base dans la transaction qui crée
+        # les employés : même si le manifeste n'est pas écrit (interruption),
+        # une reprise ne les réimporte pas. Le manifeste ne sert qu'aux rejets.
+        user_ids.update(import_users(source_key, [
+            (name, np.stack(encodings), photo, photos)
+            for name, (encodings, photo, photos) in pending_users.items()
+        ]))
+        for entry in pending_entries:
+            manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            if report is not None and entry["status"] != STATUS_IMPORTED:
+                report.writerow([entry["member"], entry["status"], entry.get("detail", "")])
+        manifest.flush()
+        pending_users.clear()
+        pending_entries.clear()
+
+    report_file = open(report_path, "a", newline="", encoding="utf-8") if report_path else None
+    try:
+        report = csv.writer(report_file) if report_file else None
+        if report_file is not None and report_file.tell() == 0:
+            report.writerow(["photo", "statut", "détail"])
+
+        with open(manifest_path, "a", encoding="utf-8") as manifest, ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futures = pool.map(process_chunk, [source] * len(chunks), chunks,
+                               [max_size] * len(chunks), [keep_photos] * len(chunks))
+            processed = 0
+            for results in futures:
+                for member, status, encoding, photo, detail in results:
+                    counts[status] += 1
+                    entry = {"member": member, "status": status}
+                    if status == STATUS_IMPORTED:
+                        # Toutes les photos d'un même nom : un seul employé, plusieurs échantillons
+                        encodings, _photo, photos = pending_users.setdefault(names[member], ([], photo, []))
+                        encodings.append(encoding)
+                        photos.append(member)
+                    else:
+                        entry["detail"] = detail
+                    pending_entries.append(entry)
+                processed += len(results)
+                # batch_size employés (distincts) par transaction, rejets non comptés
+                if len(pending_users) >= batch_size:
+                    flush(manifest, report)
+                if progress is not None:
+                    progress(processed, len(members))
+            flush(manifest, report)
+    finally:
+        if report_file is not None:
+            report_file.close()
+    counts["users"] = len(user_ids)
+    return counts
@@ -1,66 +1,97 @@
 # debut du fichier controller.py
+import contextlib
 import cv2
 import face_recognition
 import numpy as np
-from models.models import get_all_users
+from controllers.access_logger import record_access
+from controllers.embedding import encode_batch
+from controllers.match_cache import MatchCache
+from controllers.metrics import metrics
+from models.models import add_user
+from models.gallery import get_gallery
 import time
 
-recent_faces = {}
-recent_unknown = {}
+# Résultats récents réutilisés d'une image à l'autre pour un même visage
+match_cache = MatchCache()
+
+def _register_from_rgb(name, rgb_images):
+    """Enregistre un employé avec un échantillon par image où un visage est détecté.
+
+    Retourne le nombre d'échantillons retenus (0 : employé non créé).
+    """
+    items = [(image, face_recognition.face_locations(image)) for image in rgb_images]
+    samples = [encodings[0] for encodings in encode_batch(items) if len(encodings)]
+    if samples:
+        add_user(name, np.stack(samples))
+    return len(samples)
 
 def register_user_from_file(name, image_file):
-    image = face_recognition.load_image_file(image_file)
-    encodings = face_recognition.face_encodings(image)
-    if encodings:
-        from models import add_user
-        add_user(name, encodings[0])
-        return True
-    return False
+    return register_user_from_files(name, [image_file]) > 0
+
+def register_user_from_files(name, image_files):
+    images = [face_recognition.load_image_file(image_file) for image_file in image_files]
+    return _register_from_rgb(name, images)
 
 def register_user_from_frame(name, frame):
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    encodings = face_recognition.face_encodings(rgb_frame)
-    if encodings:
-        from models import add_user
-        add_user(name, encodings[0])
-        return True
-    return False
+    return register_user_from_frames(name, [frame]) > 0
+
+def register_user_from_frames(name, frames):
+    """Enrôlement depuis une rafale d'images webcam (BGR)."""
+    return _register_from_rgb(name, [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames])
 
-def recognize_faces(frame, tolerance=0.5, scale=0.5, alert_cooldown=5):
-    global recent_faces, recent_unknown
-    users = get_all_users()
-    known_encodings = [u[1] for u in users]
-    known_names = [u[0] for u in users]
+def detect_faces(frame, scale=0.5):
+    """Réduit l'image, la convertit en RGB et détecte les visages (coordonnées réduites)."""
+    with metrics.timer("preprocess"):
+        small_frame = cv2.resize(frame, (0,0), fx=scale, fy=scale)
+        rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+    with metrics.timer("face_locations"):
+        face_locations = face_recognition.face_locations(rgb_small)
+    return rgb_small, face_locations
 
-    small_frame = cv2.resize(frame, (0,0), fx=scale, fy=scale)
-    rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+def encode_faces(rgb_small, face_locations):
+    """Encodages (N, 128) float32 de tous les visages de l'image en un seul lot."""
+    # Pas de mesure sans visage : l'étape ne ferait que tirer les percentiles vers 0
+    timer = metrics.timer("face_encodings") if len(face_locations) else contextlib.nullcontext()
+    with timer:
+        return encode_batch([(rgb_small, face_locations)])[0]
 
-    face_locations = face_recognition.face_locations(rgb_small)
-    face_encodings = face_recognition.face_encodings(rgb_small, face_locations)
+def match_faces(face_encodings, tolerance=0.5):
+    """Une seule recherche vectorisée pour tous les visages : [(nom ou None, distance)]."""
+    if not len(face_encodings):
+        return []
+    gallery = get_gallery()
+    with metrics.timer("matching"):
+        matches = match_cache.match(face_encodings, tolerance, gallery.version,
+                                    lambda queries: gallery.match(queries, tolerance))
+    unknown = sum(1 for name, _ in matches if name is None)
+    metrics.inc("faces", len(matches))
+    metrics.inc("matches", len(matches) - unknown)
+    metrics.inc("unknowns", unknown)
+    return matches
+
+def scale_box(box, scale):
+    top, right, bottom, left = box
+    return (int(top/scale), int(right/scale), int(bottom/scale), int(left/scale))
+
+def recognize_faces(frame, tolerance=0.5, scale=0.5, alert_cooldown=5, camera="webcam"):
+    metrics.inc("frames")
+    rgb_small, face_locations = detect_faces(frame, scale)
+    face_encodings = encode_faces(rgb_small, face_locations)
+    matches = match_faces(face_encodings, tolerance)
 
     results = []
     alert = False
     current_time = time.time()
 
-    for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-        top = int(top/scale)
-        right = int(right/scale)
-        bottom = int(bottom/scale)
-        left = int(left/scale)
-
+    for location, (match_name, distance) in zip(face_locations, matches):
         name = "Inconnu"
-        if known_encodings:
-            distances = face_recognition.face_distance(known_encodings, face_encoding)
-            best_idx = np.argmin(distances)
-            if distances[best_idx] <= tolerance:
-                name = known_names[best_idx]
-                if name not in recent_faces or current_time - recent_faces[name] > 10:
-                    recent_faces[name] = current_time
-            else:
-                alert = True
+        if match_name is not None:
+            name = match_name
         else:
             alert = True
-        results.append(((top,right,bottom,left), name))
+        box = scale_box(location, scale)
+        record_access(name, distance, camera, frame, box, alert_cooldown, current_time)
+        results.append((box, name))
 
     return results, alert
 # fin du fichier controller.py
\ No newline at end of file
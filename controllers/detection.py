@@ -0,0 +1,177 @@
+# detection.py
+# Cascade de détection pour un flux vidéo, du moins cher au plus cher :
+#   1. porte de mouvement : différence avec la dernière image analysée, sur une
+#      vignette en niveaux de gris ; rien ne bouge -> aucune détection
+#   2. propositions Haar (OpenCV) : régions candidates très rapides à obtenir
+#   3. HOG de face_recognition uniquement sur ces régions (plus un balayage
+#      complet périodique pour rattraper ce que Haar manque)
+# L'échelle de réduction s'adapte à la taille des visages détectés.
+import logging
+import os
+
+import cv2
+import face_recognition
+import numpy as np
+
+from controllers.metrics import metrics
+
+HAAR_CASCADE = "haarcascade_frontalface_default.xml"
+
+logger = logging.getLogger(__name__)
+
+
+def _load_haar(path=None):
+    """Classifieur Haar fourni avec OpenCV ; None s'il est introuvable (balayage HOG complet)."""
+    if not hasattr(cv2, "CascadeClassifier"):
+        # OpenCV 5 a retiré les cascades Haar du module principal (requirements : opencv-python<5)
+        logger.warning("OpenCV %s sans CascadeClassifier : étape Haar désactivée, balayage HOG complet",
+                       cv2.__version__)
+        return None
+    if path is None:
+        haar_dir = getattr(getattr(cv2, "data", None), "haarcascades", "")
+        path = os.path.join(haar_dir, HAAR_CASCADE)
+    classifier = cv2.CascadeClassifier(path)
+    if classifier.empty():
+        logger.warning("cascade Haar introuvable (%s) : étape Haar désactivée, balayage HOG complet", path)
+        return None
+    return classifier
+
+
+def _merge_boxes(boxes):
+    """Fusionne les rectangles (x, y, w, h) qui se chevauchent en leur enveloppe."""
+    merged = []
+    for x, y, w, h in sorted(boxes, key=lambda b: b[0]):
+        for i, (mx, my, mw, mh) in enumerate(merged):
+            if x < mx + mw and mx < x + w and y < my + mh and my < y + h:
+                nx, ny = min(x, mx), min(y, my)
+                merged[i] = (nx, ny, max(x + w, mx + mw) - nx, max(y + h, my + mh) - ny)
+                break
+        else:
+            merged.append((x, y, w, h))
+    return merged
+
+
+class MotionGate:
+    """Indique si l'image a changé depuis la dernière image de référence."""
+
+    def __init__(self, threshold=0.01, pixel_delta=25, width=96):
+        self.threshold = threshold      # fraction de pixels modifiés
+        self.pixel_delta = pixel_delta  # écart de niveau de gris considéré comme un changement
+        self.width = width
+        self._reference = None
+
+    def _thumbnail(self, frame):
+        h, w = frame.shape[:2]
+        thumb = cv2.resize(frame, (self.width, max(1, h * self.width // w)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def changed(self, frame):
+        thumb = self._thumbnail(frame)
+        if self._reference is None or self._reference.shape != thumb.shape:
+            self._reference = thumb
+            return True
+        diff = cv2.absdiff(thumb, self._reference)
+        moving = np.count_nonzero(diff > self.pixel_delta) / diff.size
+        if moving >= self.threshold:
+            self._reference = thumb
+            return True
+        return False
+
+
+class DetectorCascade:
+    """Détection de visages à coût adaptatif, une instance par flux.
+
+    detect(frame) retourne (rgb_small, locations, scale), ou None quand la
+    porte de mouvement juge que rien n'a changé (le résultat précédent reste
+    valable). Les locations sont en coordonnées de rgb_small.
+    """
+
+    def __init__(self, scale=0.5, motion_threshold=0.01, use_motion=True, use_haar=True,
+                 full_scan_every=10, max_idle=50, roi_margin=0.5, adaptive_scale=True,
+                 target_face=96, min_scale=0.25, max_scale=1.0, haar_path=None):
+        self.scale = scale
+        self.default_scale = scale
+        self.gate = MotionGate(motion_threshold) if use_motion else None
+        self.haar = _load_haar(haar_path) if use_haar else None
+        self.full_scan_every = full_scan_every
+        self.max_idle = max_idle
+        self.roi_margin = roi_margin
+        self.adaptive_scale = adaptive_scale
+        self.target_face = target_face
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.skipped = 0
+        self.full_scans = 0
+        self.roi_scans = 0
+        self._idle = 0
+        self._runs = 0
+
+    def detect(self, frame, force=False):
+        if self.gate is not None and not force:
+            with metrics.timer("motion_gate"):
+                changed = self.gate.changed(frame)
+            if not changed and self._idle < self.max_idle:
+                self._idle += 1
+                self.skipped += 1
+                metrics.inc("frames_skipped_no_motion")
+                return None
+        self._idle = 0
+        self._runs += 1
+
+        scale = self.scale
+        with metrics.timer("preprocess"):
+            small = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+            rgb_small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+        with metrics.timer("face_locations"):
+            if self.haar is None or force or self._runs % self.full_scan_every == 0:
+                self.full_scans += 1
+                locations = face_recognition.face_locations(rgb_small)
+            else:
+                locations = self._detect_in_proposals(small, rgb_small)
+
+        self._adapt_scale(locations, scale)
+        return rgb_small, locations, scale
+
+    def _detect_in_proposals(self, small, rgb_small):
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        proposals = self.haar.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=3, minSize=(20, 20))
+        if len(proposals) == 0:
+            return []
+
+        h, w = gray.shape
+        rois = []
+        for x, y, bw, bh in proposals:
+            mx, my = int(bw * self.roi_margin), int(bh * self.roi_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            rois.append((x0, y0, min(w, x + bw + mx) - x0, min(h, y + bh + my) - y0))
+
+        locations = []
+        for x, y, bw, bh in _merge_boxes(rois):
+            self.roi_scans += 1
+            crop = np.ascontiguousarray(rgb_small[y:y + bh, x:x + bw])
+            for top, right, bottom, left in face_recognition.face_locations(crop):
+                locations.append((top + y, right + x, bottom + y, left + x))
+        return locations
+
+    def _adapt_scale(self, locations, scale):
+        if not self.adaptive_scale:
+            return
+        if locations:
+            # Hauteur médiane des visages dans l'image d'origine
+            heights = [(bottom - top) / scale for top, _, bottom, _ in locations]
+            wanted = self.target_face / float(np.median(heights))
+        else:
+            wanted = self.default_scale
+        wanted = min(self.max_scale, max(self.min_scale, wanted))
+        # Lissage pour éviter les oscillations d'une image à l'autre
+        self.scale = 0.7 * self.scale + 0.3 * wanted
+
+    def stats(self):
+        return {
+            "skipped": self.skipped,
+            "full_scans": self.full_scans,
+            "roi_scans": self.roi_scans,
+            "scale": self.scale,
+        }
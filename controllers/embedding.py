@@ -0,0 +1,59 @@
+# embedding.py
+# Calcul des encodages 128-d par lots : plusieurs images, plusieurs visages par
+# image, en un seul appel au réseau dlib. Utilisé par la reconnaissance en
+# direct, le serveur multi-caméras et l'enrôlement en masse.
+import numpy as np
+import face_recognition
+from face_recognition import api as fr_api
+
+ENCODING_DIM = 128
+
+
+def _landmarks(rgb_image, locations, model="small"):
+    """Points de repère dlib pour chaque visage (5 points, comme face_encodings par défaut)."""
+    import dlib
+    predictor = fr_api.pose_predictor_5_point if model == "small" else fr_api.pose_predictor_68_point
+    shapes = dlib.full_object_detections()
+    for location in locations:
+        shapes.append(predictor(rgb_image, fr_api._css_to_rect(location)))
+    return shapes
+
+
+def warm_up():
+    """Premier passage dans le réseau dlib (allocations internes) sur une image noire."""
+    image = np.zeros((150, 150, 3), dtype=np.uint8)
+    encode_batch([(image, [(25, 125, 125, 25)])])
+
+
+def encode_batch(items, num_jitters=1, model="small"):
+    """Encode tous les visages d'une liste de (image RGB, locations).
+
+    Retourne une liste de matrices float32 (nb visages de l'image, 128), dans
+    l'ordre des images. Les points de repère sont calculés une seule fois par
+    visage, puis toutes les images passent ensemble dans le réseau.
+    """
+    outputs = [np.empty((0, ENCODING_DIM), dtype=np.float32) for _ in items]
+    batch = [(i, image, _landmarks(image, locations, model))
+             for i, (image, locations) in enumerate(items) if len(locations)]
+    if not batch:
+        return outputs
+
+    images = [image for _, image, _ in batch]
+    shapes = [s for _, _, s in batch]
+    try:
+        descriptors = fr_api.face_encoder.compute_face_descriptor(images, shapes, num_jitters)
+    except TypeError:
+        # Ancienne version de dlib sans l'API par lots
+        descriptors = [fr_api.face_encoder.compute_face_descriptor(img, s, num_jitters)
+                       for img, s in zip(images, shapes)]
+
+    for (i, _, _), per_image in zip(batch, descriptors):
+        outputs[i] = np.array([np.array(d) for d in per_image], dtype=np.float32).reshape(-1, ENCODING_DIM)
+    return outputs
+
+
+def detect_and_encode_batch(rgb_images, model="hog"):
+    """Détection sur chaque image puis encodage de tous les visages en un lot."""
+    locations = [face_recognition.face_locations(image, model=model) for image in rgb_images]
+    encodings = encode_batch(list(zip(rgb_images, locations)))
+    return locations, encodings
@@ -0,0 +1,121 @@
+# frame_ring.py
+# Anneau d'images en mémoire partagée entre le thread de capture et les
+# processus de reconnaissance : l'image est écrite une fois dans un
+# emplacement de taille fixe, les processus la lisent sur place (vue NumPy)
+# et seule une référence (nom, emplacement, numéro de séquence) traverse le
+# pool au lieu d'un pickle de plusieurs centaines de Ko.
+#
+# Un seul écrivain par anneau. Les emplacements sont réutilisés en boucle :
+# une image non lue est simplement écrasée, et le numéro de séquence permet
+# au lecteur de détecter qu'elle l'a été pendant sa lecture.
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+HEADER_FIELDS = 4     # séquence, hauteur, largeur, canaux
+HEADER_ALIGN = 64
+WRITING = -1          # séquence pendant une écriture en cours
+
+
+class FrameRing:
+    def __init__(self, slots, max_shape, name=None, create=True):
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.slot_size = int(np.prod(self.max_shape))
+        header_size = -(-slots * HEADER_FIELDS * 8 // HEADER_ALIGN) * HEADER_ALIGN
+        size = header_size + slots * self.slot_size
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = _attach(name)
+        self.owner = create
+        self.header = np.ndarray((slots, HEADER_FIELDS), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((slots, self.slot_size), dtype=np.uint8, buffer=self.shm.buf, offset=header_size)
+        if create:
+            self.header[:] = 0
+        self._seq = 0
+        self._next = 0
+
+    @property
+    def spec(self):
+        """Description picklable pour ouvrir le même anneau dans un autre processus."""
+        return (self.shm.name, self.slots, self.max_shape)
+
+    @classmethod
+    def attach(cls, spec):
+        name, slots, max_shape = spec
+        return cls(slots, max_shape, name=name, create=False)
+
+    def fits(self, frame):
+        return frame.dtype == np.uint8 and frame.size <= self.slot_size and frame.ndim == len(self.max_shape)
+
+    def write(self, frame):
+        """Copie `frame` dans l'emplacement suivant ; retourne (emplacement, séquence)."""
+        slot = self._next
+        self._next = (slot + 1) % self.slots
+        self._seq += 1
+        header = self.header[slot]
+        header[0] = WRITING
+        self.data[slot, :frame.size] = frame.reshape(-1)
+        shape = frame.shape + (1,) * (3 - frame.ndim)
+        header[1:] = shape
+        header[0] = self._seq
+        return slot, self._seq
+
+    def is_current(self, slot, seq):
+        header = self.header
+        return header is not None and int(header[slot, 0]) == seq
+
+    def read(self, slot, seq):
+        """Vue NumPy (sans copie) de l'image, ou None si l'emplacement a été réécrit.
+
+        La vue peut être écrasée ensuite : vérifier is_current() après l'avoir utilisée.
+        """
+        header, data = self.header, self.data
+        if header is None or int(header[slot, 0]) != seq:
+            return None
+        height, width, channels = (int(v) for v in header[slot, 1:])
+        view = data[slot, :height * width * channels]
+        shape = (height, width, channels) if len(self.max_shape) == 3 else (height, width)
+        return view.reshape(shape)
+
+    def close(self):
+        self.header = self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # une vue est encore utilisée : la projection sera libérée avec elle
+        if self.owner:
+            self.shm.unlink()
+
+
+def _attach(name):
+    # Seul le créateur libère le segment. Avant 3.13, les lecteurs lancés par
+    # le créateur partagent son resource_tracker : l'enregistrement en double
+    # est sans effet.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+# Anneaux déjà ouverts dans ce processus (lecteurs du pool)
+_attached = {}
+
+
+def attached_ring(spec):
+    ring = _attached.get(spec[0])
+    if ring is None:
+        ring = _attached[spec[0]] = FrameRing.attach(spec)
+    return ring
+
+
+def release_rings(live):
+    """Ferme les anneaux ouverts dont le nom n'est plus dans `live`.
+
+    Un anneau remplacé (changement de résolution) ou d'une caméra retirée
+    est supprimé par son créateur, mais la projection resterait ouverte
+    dans chaque processus lecteur.
+    """
+    for name in [name for name in _attached if name not in live]:
+        _attached.pop(name).close()
@@ -0,0 +1,102 @@
+# match_cache.py
+# Cache court des résultats de correspondance : d'une image à l'autre, les
+# encodages d'un même visage sont quasi identiques, inutile de reparcourir la
+# galerie. Une requête à moins de `threshold` d'un encodage récent reprend son
+# résultat ; les entrées expirent après `ttl` secondes et tout le cache est
+# vidé quand la version de la galerie ou la tolérance change.
+import threading
+import time
+
+import numpy as np
+
+from controllers.metrics import metrics
+from models.models import ENCODING_DIM
+
+
+class MatchCache:
+    """Cache (encodage -> (nom ou None, distance)) partagé par les flux d'un processus.
+
+    Seuls les résultats nets sont réutilisés : si la distance mise en cache est
+    à plus de `threshold` de la tolérance, l'inégalité triangulaire garantit
+    que la décision (connu / inconnu) est la même pour la nouvelle requête.
+    """
+
+    def __init__(self, ttl=2.0, threshold=0.1, max_size=256):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._key = None
+        self._clear()
+
+    def _clear(self):
+        self._encodings = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+        self._expires = np.empty(0, dtype=np.float64)
+        self._results = []
+
+    def match(self, encodings, tolerance, version, search):
+        """Résultats pour `encodings` ; search(encodages manquants) calcule ceux absents du cache."""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if not len(queries):
+            return []
+        now = time.monotonic()
+        results = [None] * len(queries)
+        with self._lock:
+            if self._key != (version, tolerance):
+                self._key = (version, tolerance)
+                self._clear()
+            live = self._expires > now
+            if not live.all():
+                self._keep(live)
+            if len(self._results):
+                sq = (np.einsum("ij,ij->i", queries, queries)[:, None] + self._sq_norms[None, :]
+                      - 2.0 * queries @ self._encodings.T)
+                nearest = np.argmin(sq, axis=1)
+                close = sq[np.arange(len(queries)), nearest] <= self.threshold ** 2
+                for i in np.flatnonzero(close):
+                    results[i] = self._results[nearest[i]]
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            for i, result in zip(missing, search(queries[missing])):
+                results[i] = result
+        self._record(len(queries) - len(missing), len(missing))
+        if missing:
+            self._store(queries[missing], [results[i] for i in missing], tolerance, version, now)
+        return results
+
+    def _keep(self, mask):
+        self._encodings = self._encodings[mask]
+        self._sq_norms = self._sq_norms[mask]
+        self._expires = self._expires[mask]
+        self._results = [r for r, keep in zip(self._results, mask) if keep]
+
+    def _store(self, queries, results, tolerance, version, now):
+        # Résultats trop proches de la tolérance : la décision pourrait basculer
+        clear_cut = [i for i, (_, distance) in enumerate(results)
+                     if abs(distance - tolerance) > self.threshold]
+        if not clear_cut:
+            return
+        with self._lock:
+            if self._key != (version, tolerance):
+                return
+            rows = queries[clear_cut]
+            self._encodings = np.concatenate([self._encodings, rows])[-self.max_size:]
+            self._sq_norms = np.concatenate([self._sq_norms, np.einsum("ij,ij->i", rows, rows)])[-self.max_size:]
+            self._expires = np.concatenate([self._expires, np.full(len(rows), now + self.ttl)])[-self.max_size:]
+            self._results = (self._results + [results[i] for i in clear_cut])[-self.max_size:]
+
+    def _record(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            total = self.hits + self.misses
+        metrics.inc("match_cache_hits", hits)
+        metrics.inc("match_cache_misses", misses)
+        metrics.set_gauge("match_cache_hit_rate", round(self.hits / total, 4) if total else 0.0)
+
+    def __len__(self):
+        return len(self._results)
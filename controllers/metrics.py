@@ -0,0 +1,150 @@
+# metrics.py
+# Instrumentation légère de la chaîne de reconnaissance :
+#   - durées par étape dans des fenêtres glissantes (p50 / p95 / p99)
+#   - compteurs (images, visages, correspondances, inconnus...) et jauges
+#   - exposition au format texte Prometheus via un petit serveur HTTP local
+# Une mesure coûte un appel à perf_counter et un append sous verrou :
+# l'instrumentation peut rester active en production.
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+METRICS_PREFIX = "face_access"
+DEFAULT_PORT = int(os.environ.get("METRICS_PORT", "9108"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RollingHistogram:
+    """Dernières `window` durées d'une étape + cumul total pour Prometheus."""
+
+    def __init__(self, window=2048):
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+
+class Metrics:
+    def __init__(self, window=2048):
+        self.window = window
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self._histograms.get(stage)
+            if hist is None:
+                hist = self._histograms[stage] = RollingHistogram(self.window)
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, counter, value=1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def set_gauge(self, gauge, value):
+        with self._lock:
+            self._gauges[gauge] = value
+
+    def snapshot(self):
+        """État courant : {"stages": {stage: {...}}, "counters": {...}, "gauges": {...}}."""
+        with self._lock:
+            hists = {stage: (list(h.values), h.count, h.total) for stage, h in self._histograms.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        stages = {}
+        for stage, (values, count, total) in hists.items():
+            data = np.asarray(values, dtype=np.float64)
+            q = np.quantile(data, QUANTILES) if len(data) else [None] * len(QUANTILES)
+            stages[stage] = {
+                "count": count,
+                "sum_s": total,
+                "mean_ms": 1000 * total / count if count else None,
+                "p50_ms": None if q[0] is None else 1000 * q[0],
+                "p95_ms": None if q[1] is None else 1000 * q[1],
+                "p99_ms": None if q[2] is None else 1000 * q[2],
+            }
+        return {"stages": stages, "counters": counters, "gauges": gauges, "uptime_s": time.time() - self.started}
+
+    def to_prometheus(self):
+        """Format texte d'exposition Prometheus (summary par étape, counters, gauges)."""
+        snap = self.snapshot()
+        name = f"{METRICS_PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Durée des étapes de la reconnaissance (fenêtre glissante).",
+                 f"# TYPE {name} summary"]
+        for stage, stats in sorted(snap["stages"].items()):
+            for q, key in zip(QUANTILES, ("p50_ms", "p95_ms", "p99_ms")):
+                if stats[key] is not None:
+                    lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {stats[key] / 1000:.6f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {stats["sum_s"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {stats["count"]}')
+        for counter, value in sorted(snap["counters"].items()):
+            metric = f"{METRICS_PREFIX}_{counter}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for gauge, value in sorted(snap["gauges"].items()):
+            metric = f"{METRICS_PREFIX}_{gauge}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# --------------------
+# Point d'accès HTTP /metrics
+# --------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = metrics.to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=DEFAULT_PORT, host="127.0.0.1"):
+    """Démarre (une seule fois par processus) le serveur /metrics dans un thread.
+
+    Retourne le serveur, ou None si le port est déjà pris (autre processus).
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError:
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _server
@@ -0,0 +1,320 @@
+# multicam.py
+# Reconnaissance sur plusieurs caméras sans interface Streamlit.
+# Chaque caméra est lue par un thread qui ne garde que la dernière image ;
+# une boucle d'ordonnancement répartit les images fraîches de toutes les caméras
+# entre les processus du pool (détection puis encodage par lots) et compare tous
+# les visages obtenus à la galerie partagée en un seul appel.
+# Les images passent par un anneau en mémoire partagée (frame_ring.py) : seule
+# une référence est envoyée aux processus, qui lisent l'image sur place.
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+
+from controllers.access_logger import record_access
+from controllers.frame_ring import FrameRing, attached_ring, release_rings
+from controllers.match_cache import MatchCache
+from controllers.metrics import metrics
+from controllers.pipeline import LatestFrameQueue
+from controllers.worker_pool import new_pool
+
+UNKNOWN = "Inconnu"
+RING_SLOTS = 8
+
+logger = logging.getLogger(__name__)
+
+
+def open_capture(source):
+    """Ouvre une source OpenCV : index de périphérique, URL RTSP ou fichier vidéo."""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    return cv2.VideoCapture(source)
+
+
+def detect_and_encode(refs, scale, live=None):
+    """Exécuté dans un processus du pool : détection puis encodage par lot.
+
+    refs : [(spec de l'anneau, emplacement, séquence)]. L'image est lue sur
+    place puis réduite ; une image réécrite entre-temps donne None.
+    live : noms des anneaux encore utilisés ; les autres sont fermés.
+    """
+    from controllers.embedding import detect_and_encode_batch
+    if live is not None:
+        release_rings(set(live) | {spec[0] for spec, _, _ in refs})
+    rgb_frames, positions = [], []
+    for i, (spec, slot, seq) in enumerate(refs):
+        try:
+            ring = attached_ring(spec)
+        except FileNotFoundError:
+            continue  # caméra retirée
+        frame = ring.read(slot, seq)
+        if frame is None:
+            continue
+        small = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        if ring.is_current(slot, seq):
+            rgb_frames.append(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+            positions.append(i)
+    outputs = [None] * len(refs)
+    if rgb_frames:
+        locations, encodings = detect_and_encode_batch(rgb_frames)
+        for i, locs, encs in zip(positions, locations, encodings):
+            outputs[i] = (locs, encs)
+    return outputs
+
+
+class CameraStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.captured = 0
+        self.processed = 0
+        self.faces = 0
+        self.last_latency = None
+        self.avg_latency = None
+
+    def record(self, latency, faces):
+        self.processed += 1
+        self.faces += faces
+        self.last_latency = latency
+        # Moyenne glissante exponentielle
+        self.avg_latency = latency if self.avg_latency is None else 0.9 * self.avg_latency + 0.1 * latency
+
+    def as_dict(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return {
+            "capture_fps": self.captured / elapsed,
+            "processed_fps": self.processed / elapsed,
+            "faces": self.faces,
+            "last_latency_ms": None if self.last_latency is None else 1000 * self.last_latency,
+            "avg_latency_ms": None if self.avg_latency is None else 1000 * self.avg_latency,
+        }
+
+
+class CameraStream:
+    """Thread de capture : lit la source en continu et ne garde que l'image la plus récente."""
+
+    def __init__(self, camera_id, source, loop=False):
+        self.camera_id = camera_id
+        self.source = source
+        self.loop = loop
+        self.frames = LatestFrameQueue(maxsize=1)
+        self.ring = None
+        self.stats = CameraStats()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"camera-{camera_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        capture = open_capture(self.source)
+        # Fichier vidéo : on respecte sa cadence au lieu de le lire d'un trait
+        fps = capture.get(cv2.CAP_PROP_FPS) if os.path.isfile(str(self.source)) else 0
+        delay = 1.0 / fps if fps and fps > 0 else 0
+        try:
+            while not self._stop.is_set():
+                ok, frame = capture.read()
+                if not ok:
+                    if self.loop:
+                        capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    break
+                self.stats.captured += 1
+                if self.ring is None or not self.ring.fits(frame):
+                    # Premier passage ou résolution plus grande : nouvel anneau
+                    if self.ring is not None:
+                        self.ring.close()
+                    self.ring = FrameRing(RING_SLOTS, frame.shape)
+                slot, seq = self.ring.write(frame)
+                self.frames.put((time.monotonic(), self.ring, slot, seq))
+                if delay:
+                    time.sleep(delay)
+        finally:
+            capture.release()
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        self._thread.join(timeout)
+        if self.ring is not None and not self._thread.is_alive():
+            self.ring.close()
+            self.ring = None
+
+
+class MultiCameraServer:
+    """Partage une galerie et un pool de processus entre N caméras.
+
+    on_result(camera_id, results, alert) reçoit les mêmes résultats que
+    recognize_faces, en coordonnées de l'image d'origine.
+    """
+
+    def __init__(self, workers=None, tolerance=0.5, scale=0.5, on_result=None, gallery=None, alert_cooldown=5):
+        from models.gallery import get_gallery
+        self.tolerance = tolerance
+        self.alert_cooldown = alert_cooldown
+        self.scale = scale
+        self.on_result = on_result
+        self.gallery = gallery if gallery is not None else get_gallery()
+        self.match_cache = MatchCache()
+        self.workers = workers or os.cpu_count()
+        self.pool = new_pool(self.workers)
+        self.cameras = {}
+        self.started = time.monotonic()
+        self.faces_encoded = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _restart_pool(self):
+        """Remplace un pool cassé (processus tué, plus de mémoire...) par un pool neuf."""
+        logger.error("pool de reconnaissance cassé : redémarrage des processus")
+        metrics.inc("pool_restarts")
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = new_pool(self.workers)
+
+    # --------------------
+    # Gestion des caméras (utilisable pendant l'exécution)
+    # --------------------
+    def add_camera(self, camera_id, source, loop=False):
+        with self._lock:
+            if camera_id in self.cameras:
+                raise ValueError(f"Caméra déjà présente : {camera_id}")
+            self.cameras[camera_id] = CameraStream(camera_id, source, loop).start()
+
+    def remove_camera(self, camera_id):
+        with self._lock:
+            stream = self.cameras.pop(camera_id, None)
+        if stream is not None:
+            stream.stop()
+
+    def stats(self):
+        with self._lock:
+            return {cid: stream.stats.as_dict() for cid, stream in self.cameras.items()}
+
+    def faces_per_second(self):
+        """Débit global en visages encodés par seconde (toutes caméras confondues)."""
+        return self.faces_encoded / max(time.monotonic() - self.started, 1e-6)
+
+    # --------------------
+    # Boucle principale
+    # --------------------
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="multicam-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                streams = list(self.cameras.values())
+            batch = []
+            for stream in streams:
+                item = stream.frames.get(timeout=0)
+                if item is not None:
+                    batch.append((stream, item))
+            if not batch:
+                if streams and not any(s.alive for s in streams):
+                    time.sleep(0.1)
+                else:
+                    time.sleep(0.005)
+                continue
+            self._process_batch(batch)
+
+    def _process_batch(self, batch):
+        refs = [(ring.spec, slot, seq) for _, (_, ring, slot, seq) in batch]
+        with self._lock:
+            rings = [stream.ring for stream in self.cameras.values()]
+        live = [ring.spec[0] for ring in rings if ring is not None]
+
+        # Une tranche d'images par processus : chaque processus encode sa tranche en un lot
+        n_chunks = min(self.workers, len(refs))
+        chunks = [list(range(i, len(refs), n_chunks)) for i in range(n_chunks)]
+        try:
+            futures = [self.pool.submit(detect_and_encode, [refs[i] for i in chunk], self.scale, live)
+                       for chunk in chunks]
+        except BrokenProcessPool:
+            # Le lot est perdu, mais pas le thread d'ordonnancement
+            metrics.inc("frames_error", len(batch))
+            self._restart_pool()
+            return
+        with metrics.timer("detect_and_encode"):
+            wait(futures)
+
+        # None : image réécrite avant lecture (caméra plus rapide que le traitement)
+        outputs = [None] * len(batch)
+        errors, broken = 0, False
+        for chunk, future in zip(chunks, futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                # Plantage du processus : compté à part, pas comme une image périmée
+                logger.error("échec de la détection sur %d images : %r", len(chunk), e)
+                errors += len(chunk)
+                broken = broken or isinstance(e, BrokenProcessPool)
+                continue
+            for i, output in zip(chunk, results):
+                outputs[i] = output
+        if errors:
+            metrics.inc("frames_error", errors)
+        if broken:
+            self._restart_pool()
+        stale = sum(1 for output in outputs if output is None) - errors
+        if stale:
+            metrics.inc("frames_stale", stale)
+        batch = [item for item, output in zip(batch, outputs) if output is not None]
+        outputs = [output for output in outputs if output is not None]
+
+        # Tous les visages de toutes les caméras comparés en un seul appel
+        all_encodings = np.concatenate([enc for _, enc in outputs]) if outputs else []
+        with metrics.timer("matching"):
+            matches = self.match_cache.match(all_encodings, self.tolerance, self.gallery.version,
+                                             lambda queries: self.gallery.match(queries, self.tolerance))
+        self.faces_encoded += len(matches)
+        unknown = sum(1 for name, _ in matches if name is None)
+        metrics.inc("frames", len(batch))
+        metrics.inc("faces", len(matches))
+        metrics.inc("matches", len(matches) - unknown)
+        metrics.inc("unknowns", unknown)
+
+        offset = 0
+        now = time.monotonic()
+        current_time = time.time()
+        for (stream, (captured_at, ring, slot, seq)), (locations, encodings) in zip(batch, outputs):
+            # Image encore dans l'anneau : sert aux vignettes du journal. Vue sans
+            # copie : record_access copie le visage puis vérifie la séquence.
+            frame = ring.read(slot, seq)
+            frame_valid = functools.partial(ring.is_current, slot, seq)
+            results = []
+            alert = False
+            for (top, right, bottom, left), (name, distance) in zip(locations, matches[offset:offset + len(encodings)]):
+                box = (int(top / self.scale), int(right / self.scale), int(bottom / self.scale), int(left / self.scale))
+                if name is None:
+                    name = UNKNOWN
+                    alert = True
+                record_access(name, distance, stream.camera_id, frame, box, self.alert_cooldown, current_time,
+                              frame_valid)
+                results.append((box, name))
+            offset += len(encodings)
+            stream.stats.record(now - captured_at, len(results))
+            if self.on_result is not None:
+                self.on_result(stream.camera_id, results, alert)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+        with self._lock:
+            streams = list(self.cameras.values())
+            self.cameras.clear()
+        for stream in streams:
+            stream.stop()
+        self.pool.shutdown(wait=True, cancel_futures=True)
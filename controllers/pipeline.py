@@ -0,0 +1,124 @@
+# pipeline.py
+# Découple la capture de la reconnaissance : le callback WebRTC dépose la
+# dernière image dans une file bornée (les plus anciennes sont écartées) et
+# des threads de travail publient le résultat le plus récent. dlib relâche le
+# GIL pendant la détection et l'encodage, les threads suffisent.
+import threading
+import time
+from collections import deque
+
+from controllers.metrics import metrics
+
+
+class LatestFrameQueue:
+    """File bornée avec abandon du plus ancien élément quand elle est pleine."""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Ajoute un élément ; retourne True si un élément plus ancien a été écarté."""
+        with self._cond:
+            dropped = False
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                dropped = True
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+            return dropped
+
+    def get(self, timeout=None):
+        """Retire l'élément le plus ancien ; None si la file reste vide pendant timeout."""
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class RecognitionPipeline:
+    """Pool de threads qui applique `processor(frame) -> (results, alert)` aux images récentes.
+
+    Avec un processeur à état (FaceTracker) il faut garder workers=1 pour que les
+    images d'un même flux soient traitées dans l'ordre ; recognize_faces, sans
+    état, peut être réparti sur plusieurs threads.
+    """
+
+    def __init__(self, processor, workers=1, maxsize=1):
+        self.processor = processor
+        self.queue = LatestFrameQueue(maxsize)
+        self.processed = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._result = ([], False)
+        self._result_seq = 0
+        self._result_time = None
+        self.last_latency = None
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"recognition-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, frame):
+        """Publie une image (non bloquant) ; l'image non traitée précédente est écartée."""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        if self.queue.put((seq, time.monotonic(), frame)):
+            metrics.inc("frames_dropped")
+        metrics.set_gauge("queue_depth", len(self.queue))
+
+    def latest(self):
+        """Dernier résultat connu : (results, alert)."""
+        return self._result
+
+    def stats(self):
+        return {
+            "submitted": self.queue.put_count,
+            "dropped": self.queue.dropped,
+            "processed": self.processed,
+            "errors": self.errors,
+            "queued": len(self.queue),
+            "last_latency": self.last_latency,
+            "result_age": None if self._result_time is None else time.monotonic() - self._result_time,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            item = self.queue.get(timeout=0.2)
+            if item is None:
+                continue
+            seq, submitted_at, frame = item
+            try:
+                result = self.processor(frame)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                continue
+            metrics.inc("frames_processed")
+            with self._lock:
+                self.processed += 1
+                # Un thread plus rapide a pu publier une image plus récente
+                if seq > self._result_seq:
+                    self._result_seq = seq
+                    self._result = result
+                    self._result_time = time.monotonic()
+                    self.last_latency = self._result_time - submitted_at
+                    metrics.observe("pipeline_latency", self.last_latency)
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
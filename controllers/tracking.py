@@ -0,0 +1,141 @@
+# tracking.py
+# Suivi des visages entre les images : la détection ne tourne que toutes les
+# `detect_every` images (ou quand une piste est perdue) et l'encodage 128-d
+# seulement pour les nouvelles pistes ou lors d'une re-vérification périodique.
+# La détection elle-même passe par la cascade de detection.py (porte de
+# mouvement, propositions Haar, HOG sur les régions candidates).
+import time
+from collections import Counter, deque
+from itertools import count
+
+from controllers.access_logger import record_access
+from controllers.controller import encode_faces, match_faces, scale_box
+from controllers.detection import DetectorCascade
+from controllers.metrics import metrics
+
+UNKNOWN = "Inconnu"
+
+
+def iou(a, b):
+    """Intersection sur union de deux boîtes (top, right, bottom, left)."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+def _to_small(box, scale):
+    top, right, bottom, left = box
+    return (int(top * scale), int(right * scale), int(bottom * scale), int(left * scale))
+
+
+class Track:
+    def __init__(self, track_id, box, vote_window):
+        self.id = track_id
+        self.box = box              # coordonnées dans l'image d'origine
+        self.votes = deque(maxlen=vote_window)
+        self.last_verified = None   # numéro d'image du dernier encodage
+        self.distance = None        # distance de la dernière correspondance
+        self.misses = 0
+
+    @property
+    def name(self):
+        """Identité lissée : vote majoritaire sur les K dernières correspondances."""
+        if not self.votes:
+            return UNKNOWN
+        name, _ = Counter(self.votes).most_common(1)[0]
+        return name if name is not None else UNKNOWN
+
+
+class FaceTracker:
+    """Remplace recognize_faces pour un flux vidéo : même format de résultat."""
+
+    def __init__(self, tolerance=0.5, scale=0.5, detect_every=5, reverify_every=30,
+                 vote_window=7, iou_threshold=0.3, max_misses=2, detector=None,
+                 camera="webcam", alert_cooldown=5):
+        self.tolerance = tolerance
+        self.camera = camera
+        self.alert_cooldown = alert_cooldown
+        self.detector = detector if detector is not None else DetectorCascade(scale=scale)
+        self.detect_every = detect_every
+        self.reverify_every = reverify_every
+        self.vote_window = vote_window
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+        self.frame_index = 0
+        self._ids = count(1)
+        self._force_detect = True
+
+    def process(self, frame):
+        self.frame_index += 1
+        metrics.inc("frames")
+        if self._force_detect or self.frame_index % self.detect_every == 0:
+            self._update(frame)
+        return self._results(frame)
+
+    def _update(self, frame):
+        detected = self.detector.detect(frame, force=self._force_detect)
+        if detected is None:
+            # Rien n'a bougé : les pistes actuelles restent valables
+            return
+        rgb_small, locations, scale = detected
+        self._associate([scale_box(location, scale) for location in locations])
+
+        # Encodage uniquement pour les pistes nouvelles ou à re-vérifier
+        due = [t for t in self.tracks if t.misses == 0 and (
+            t.last_verified is None or self.frame_index - t.last_verified >= self.reverify_every)]
+        if due:
+            encodings = encode_faces(rgb_small, [_to_small(t.box, scale) for t in due])
+            for track, (name, distance) in zip(due, match_faces(encodings, self.tolerance)):
+                track.votes.append(name)
+                track.distance = distance
+                track.last_verified = self.frame_index
+
+        # Piste perdue : on redétecte dès l'image suivante
+        self._force_detect = any(t.misses for t in self.tracks)
+
+    def _associate(self, detections):
+        """Association gloutonne piste / détection par IoU décroissant."""
+        pairs = sorted(
+            ((iou(t.box, d), ti, di) for ti, t in enumerate(self.tracks) for di, d in enumerate(detections)),
+            reverse=True
+        )
+        matched_tracks, matched_dets = set(), set()
+        for score, ti, di in pairs:
+            if score < self.iou_threshold:
+                break
+            if ti in matched_tracks or di in matched_dets:
+                continue
+            self.tracks[ti].box = detections[di]
+            self.tracks[ti].misses = 0
+            matched_tracks.add(ti)
+            matched_dets.add(di)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for di, box in enumerate(detections):
+            if di not in matched_dets:
+                self.tracks.append(Track(next(self._ids), box, self.vote_window))
+
+    def _results(self, frame):
+        results = []
+        alert = False
+        current_time = time.time()
+        for track in self.tracks:
+            if track.misses:
+                continue
+            name = track.name
+            if name == UNKNOWN:
+                alert = True
+            record_access(name, track.distance, self.camera, frame, track.box,
+                          self.alert_cooldown, current_time)
+            results.append((track.box, name))
+        return results, alert
@@ -0,0 +1,243 @@
+# video_search.py
+# Recherche hors ligne dans des enregistrements vidéo (incidents, contrôles a
+# posteriori). Chaque fichier est découpé en tranches de `chunk_seconds`
+# décodées en parallèle par un pool de processus : une tranche = une ouverture
+# du fichier et un positionnement. Dans une tranche, seule une image sur
+# `stride` est décodée (les autres sont seulement lues avec grab()), ou
+# seulement les images clés (PyAV, facultatif) ; la porte de mouvement écarte
+# les plans fixes. Les visages passent par la même détection / encodage par
+# lot que le serveur multi-caméras, puis sont comparés à la galerie ou à
+# l'employé recherché. Les détections proches d'une même personne sont
+# fusionnées en apparitions, émises dans l'ordre chronologique au fil des
+# tranches terminées.
+import importlib.util
+import os
+import time
+
+import cv2
+import numpy as np
+
+from controllers.worker_pool import new_pool
+from models.models import ENCODING_DIM
+
+UNKNOWN = "Inconnu"
+
+
+def keyframes_available():
+    return importlib.util.find_spec("av") is not None
+
+
+def video_info(path):
+    """(images par seconde, nombre d'images ; 0 si inconnu) d'un fichier vidéo."""
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise ValueError(f"Vidéo illisible : {path}")
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        capture.release()
+    if not fps or fps != fps or fps > 1000:
+        fps = 25.0
+    return fps, max(frames, 0)
+
+
+def plan_chunks(frames, fps, chunk_seconds):
+    """Tranches [début, fin) en numéros d'image ; une seule tranche si la durée est inconnue."""
+    if not frames:
+        return [(0, None)]
+    step = max(1, int(round(chunk_seconds * fps)))
+    return [(start, min(frames, start + step)) for start in range(0, frames, step)]
+
+
+def _read_stride(path, start, end, stride):
+    """(numéro, image BGR) pour les images de [start, end) multiples de `stride`."""
+    capture = cv2.VideoCapture(path)
+    try:
+        if start:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        index = start
+        while end is None or index < end:
+            if index % stride == 0:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield index, frame
+            elif not capture.grab():
+                break
+            index += 1
+    finally:
+        capture.release()
+
+
+def _read_keyframes(path, start_s, end_s):
+    """(secondes, image BGR) des seules images clés entre start_s et end_s (PyAV)."""
+    import av
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        stream.codec_context.skip_frame = "NONKEY"
+        if start_s:
+            # Positionne sur l'image clé qui précède start_s (appartient à la tranche précédente)
+            container.seek(int(start_s / stream.time_base), stream=stream)
+        for frame in container.decode(stream):
+            t = float(frame.pts * stream.time_base) if frame.pts is not None else frame.time
+            if t < start_s:
+                continue
+            if end_s is not None and t >= end_s:
+                break
+            yield t, frame.to_ndarray(format="bgr24")
+
+
+def scan_chunk(path, start, end, fps, stride=1, keyframes=False, scale=0.5, motion=True, batch=8):
+    """Exécuté dans un processus du pool : décode une tranche, détecte et encode par lots.
+
+    Retourne (détections, images décodées, images analysées), détections :
+    [(secondes, boîtes en coordonnées d'origine, encodages (N, 128))] pour
+    les seules images où un visage a été trouvé.
+    """
+    from controllers.detection import MotionGate
+    from controllers.embedding import detect_and_encode_batch
+
+    if keyframes:
+        frames = _read_keyframes(path, start / fps, None if end is None else end / fps)
+    else:
+        frames = ((index / fps, frame) for index, frame in _read_stride(path, start, end, stride))
+    gate = MotionGate() if motion else None
+    detections, pending = [], []
+    decoded = analysed = 0
+
+    def flush():
+        locations, encodings = detect_and_encode_batch([rgb for _, rgb in pending])
+        for (t, _), locs, encs in zip(pending, locations, encodings):
+            if len(locs):
+                detections.append((t, [tuple(int(v / scale) for v in loc) for loc in locs], encs))
+        pending.clear()
+
+    for t, frame in frames:
+        decoded += 1
+        if gate is not None and not gate.changed(frame):
+            continue
+        analysed += 1
+        small = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        pending.append((t, cv2.cvtColor(small, cv2.COLOR_BGR2RGB)))
+        if len(pending) >= batch:
+            flush()
+    if pending:
+        flush()
+    return detections, decoded, analysed
+
+
+class TargetMatcher:
+    """Compare les visages à un seul employé : distance minimale à ses échantillons.
+
+    Même interface que Gallery.match : [(nom ou None, distance)].
+    """
+
+    def __init__(self, name, samples):
+        self.name = name
+        self.samples = np.asarray(samples, dtype=np.float32).reshape(-1, ENCODING_DIM)
+
+    def match(self, encodings, tolerance):
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        dists = np.linalg.norm(queries[:, None, :] - self.samples[None, :, :], axis=2).min(axis=1)
+        return [(self.name if d <= tolerance else None, float(d)) for d in dists]
+
+
+class Timeline:
+    """Fusionne les détections d'une même personne espacées de moins de `gap` secondes.
+
+    Une apparition : {"video", "name", "start", "end", "distance" (la meilleure), "detections"}.
+    """
+
+    def __init__(self, video, gap=2.0):
+        self.video = video
+        self.gap = gap
+        self._open = {}
+
+    def add(self, t, name, distance):
+        """Ajoute une détection ; retourne les apparitions terminées avant `t`."""
+        closed = self.close(before=t - self.gap)
+        current = self._open.get(name)
+        if current is None:
+            self._open[name] = {"video": self.video, "name": name, "start": t, "end": t,
+                                "distance": distance, "detections": 1}
+        else:
+            current["end"] = max(current["end"], t)
+            current["distance"] = min(current["distance"], distance)
+            current["detections"] += 1
+        return closed
+
+    def close(self, before=None):
+        """Apparitions terminées avant `before` (toutes si None), triées par début."""
+        done = [a for a in self._open.values() if before is None or a["end"] < before]
+        for appearance in done:
+            del self._open[appearance["name"]]
+        return sorted(done, key=lambda a: a["start"])
+
+
+class VideoSearch:
+    """Recherche d'apparitions dans une liste de fichiers vidéo.
+
+    `matcher` : la galerie (tous les employés) ou un TargetMatcher. run() est
+    un générateur d'apparitions, fichier par fichier et dans l'ordre
+    chronologique ; toutes les tranches de tous les fichiers sont soumises au
+    pool dès le départ pour garder tous les cœurs occupés.
+    """
+
+    def __init__(self, matcher, tolerance=0.5, workers=None, chunk_seconds=60.0, stride=5,
+                 keyframes=False, scale=0.5, motion=True, include_unknown=False, gap=2.0):
+        if keyframes and not keyframes_available():
+            raise ValueError("Le décodage des seules images clés nécessite PyAV (pip install av)")
+        self.matcher = matcher
+        self.tolerance = tolerance
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_seconds = chunk_seconds
+        self.stride = max(1, stride)
+        self.keyframes = keyframes
+        self.scale = scale
+        self.motion = motion
+        self.include_unknown = include_unknown
+        self.gap = gap
+        self.video_seconds = 0.0
+        self.decoded = 0
+        self.analysed = 0
+        self.faces = 0
+        self.elapsed = 0.0
+
+    def run(self, paths, progress=None):
+        started = time.perf_counter()
+        with new_pool(self.workers) as pool:
+            jobs = []
+            for path in paths:
+                fps, frames = video_info(path)
+                self.video_seconds += frames / fps
+                chunks = [
+                    pool.submit(scan_chunk, path, start, end, fps, self.stride,
+                                self.keyframes, self.scale, self.motion)
+                    for start, end in plan_chunks(frames, fps, self.chunk_seconds)
+                ]
+                jobs.append((path, chunks))
+
+            total = sum(len(chunks) for _, chunks in jobs)
+            done = 0
+            for path, chunks in jobs:
+                timeline = Timeline(path, self.gap)
+                for future in chunks:
+                    detections, decoded, analysed = future.result()
+                    self.decoded += decoded
+                    self.analysed += analysed
+                    for t, _boxes, encodings in detections:
+                        self.faces += len(encodings)
+                        for name, distance in self.matcher.match(encodings, self.tolerance):
+                            if name is None and not self.include_unknown:
+                                continue
+                            yield from timeline.add(t, name or UNKNOWN, distance)
+                    done += 1
+                    if progress:
+                        progress(done, total)
+                yield from timeline.close()
+        self.elapsed = time.perf_counter() - started
+
+    def speedup(self):
+        """Durée de vidéo traitée par seconde de calcul."""
+        return self.video_seconds / self.elapsed if self.elapsed else None
@@ -0,0 +1,20 @@
+# worker_pool.py
+# Pool de processus de reconnaissance partagé par le serveur multicaméra, le
+# service d'accès et la recherche vidéo. Module léger : le processus parent
+# ne charge pas dlib, seuls les processus du pool le font, une seule fois.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def init_worker():
+    # Charge les modèles dlib une seule fois par processus
+    import controllers.embedding  # noqa: F401
+
+
+def new_pool(workers):
+    """Pool "spawn" : pas de fork d'un processus qui a déjà des threads (capture, asyncio)."""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker
+    )
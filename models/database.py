@@ -0,0 +1,104 @@
+# database.py
+# Gestion des connexions SQLite partagée par la couche models :
+#   - une connexion par thread (et par fichier), réutilisée d'un appel à l'autre,
+#     ce qui garde le cache de requêtes préparées de sqlite3
+#   - mode WAL + synchronous=NORMAL : les lecteurs ne bloquent plus l'écrivain
+#   - transaction() pour regrouper plusieurs requêtes en une seule écriture
+#   - after_commit() pour n'agir (caches, notifications) qu'une fois l'écriture validée
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BUSY_TIMEOUT = 30.0
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+
+
+def _connect(db_file):
+    conn = sqlite3.connect(
+        db_file,
+        timeout=BUSY_TIMEOUT,
+        isolation_level=None,          # autocommit ; les transactions passent par transaction()
+        cached_statements=CACHED_STATEMENTS,
+        check_same_thread=False,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
+    return conn
+
+
+def get_connection(db_file):
+    """Connexion du thread courant pour `db_file` (recréée après un fork)."""
+    connections = getattr(_local, "connections", None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+        _local.depth = {}
+        _local.pending = {}
+    conn = connections.get(db_file)
+    if conn is None:
+        conn = connections[db_file] = _connect(db_file)
+    return conn
+
+
+@contextmanager
+def connection(db_file):
+    """Connexion du thread en autocommit, pour les lectures simples."""
+    yield get_connection(db_file)
+
+
+@contextmanager
+def transaction(db_file, immediate=True):
+    """Transaction (BEGIN IMMEDIATE pour écrire, BEGIN pour une lecture cohérente).
+
+    Les appels imbriqués rejoignent la transaction englobante.
+    """
+    conn = get_connection(db_file)
+    depth = _local.depth.get(db_file, 0)
+    if depth:
+        _local.depth[db_file] = depth + 1
+        try:
+            yield conn
+        finally:
+            _local.depth[db_file] = depth
+        return
+
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    _local.depth[db_file] = 1
+    _local.pending[db_file] = []
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        # Erreur dans le bloc ou au COMMIT : la transaction ne doit pas rester ouverte
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        _local.pending.pop(db_file, None)
+        raise
+    finally:
+        _local.depth[db_file] = 0
+    for callback in _local.pending.pop(db_file, []):
+        callback()
+
+
+def after_commit(db_file, callback):
+    """Appelle callback() après le COMMIT de la transaction en cours (tout de suite hors
+    transaction) ; rien n'est appelé si elle est annulée."""
+    get_connection(db_file)
+    if _local.depth.get(db_file, 0):
+        _local.pending[db_file].append(callback)
+    else:
+        callback()
+
+
+def close_connections():
+    """Ferme les connexions du thread courant."""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+    _local.pid = os.getpid()
+    _local.depth = {}
+    _local.pending = {}
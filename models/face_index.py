@@ -0,0 +1,486 @@
+# face_index.py
+# Index de recherche du plus proche voisin pour les encodages de visages.
+# Backends interchangeables (variable d'environnement FACE_INDEX) :
+#   - ExactIndex     : parcours vectorisé de toute la galerie (résultat exact)
+#   - IVFIndex       : index approximatif IVF (k-means grossier + listes inversées),
+#                      `nprobe` règle le compromis rappel / latence
+#   - QuantizedIndex : galerie stockée en float16 ou int8 (boîtiers à peu de
+#                      mémoire), premier passage approché puis distance exacte
+#                      float32 sur les meilleurs candidats
+import os
+import threading
+
+import numpy as np
+
+from models.models import ENCODING_DIM
+
+DEFAULT_BACKEND = os.environ.get("FACE_INDEX", "exact")
+
+
+class FaceIndex:
+    """Interface commune : build / add / remove / search sur des identifiants utilisateur."""
+
+    def build(self, ids, encodings):
+        raise NotImplementedError
+
+    def add(self, user_id, encoding):
+        raise NotImplementedError
+
+    def remove(self, user_id):
+        raise NotImplementedError
+
+    def search(self, queries, k=1):
+        """Retourne (ids, distances) de forme (Q, k), triés par distance croissante.
+
+        Les cases sans résultat (galerie plus petite que k) valent -1 / inf.
+        """
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+def _as_matrix(encodings):
+    return np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM))
+
+
+def _top_k(sq_dists, k):
+    """Indices des k plus petites valeurs par ligne, triés (sq_dists : (Q, N))."""
+    n = sq_dists.shape[1]
+    k_eff = min(k, n)
+    if k_eff == 1:
+        idx = np.argmin(sq_dists, axis=1)[:, None]
+    else:
+        idx = np.argpartition(sq_dists, k_eff - 1, axis=1)[:, :k_eff]
+        order = np.argsort(np.take_along_axis(sq_dists, idx, axis=1), axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+    return idx, np.take_along_axis(sq_dists, idx, axis=1)
+
+
+def _pad(ids, dists, k):
+    if ids.shape[1] == k:
+        return ids, dists
+    q = ids.shape[0]
+    out_ids = np.full((q, k), -1, dtype=np.int64)
+    out_dists = np.full((q, k), np.inf, dtype=np.float32)
+    out_ids[:, :ids.shape[1]] = ids
+    out_dists[:, :dists.shape[1]] = dists
+    return out_ids, out_dists
+
+
+class _Bucket:
+    """Tableau extensible (ids + matrice) avec suppression par permutation avec le dernier."""
+
+    def __init__(self, capacity=16):
+        self.size = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.vectors = np.empty((capacity, ENCODING_DIM), dtype=np.float32)
+        self.sq_norms = np.empty(capacity, dtype=np.float32)
+
+    @classmethod
+    def wrap(cls, ids, vectors):
+        """Bucket sur une matrice existante sans la copier (ex. instantané projeté en mémoire).
+
+        Une matrice en lecture seule n'est copiée qu'à la première modification.
+        """
+        bucket = cls.__new__(cls)
+        bucket.size = len(ids)
+        bucket.ids = np.array(ids, dtype=np.int64)
+        bucket.vectors = vectors
+        bucket.sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+        return bucket
+
+    def _own_vectors(self):
+        if not self.vectors.flags.writeable:
+            self.vectors = np.array(self.vectors)
+
+    def append(self, user_id, vector):
+        if self.size == len(self.ids) or not self.vectors.flags.writeable:
+            capacity = max(16, 2 * len(self.ids))
+            self.ids = np.resize(self.ids, capacity)
+            vectors = np.empty((capacity, ENCODING_DIM), dtype=np.float32)
+            vectors[:self.size] = self.vectors[:self.size]
+            self.vectors = vectors
+            self.sq_norms = np.resize(self.sq_norms, capacity)
+        pos = self.size
+        self.ids[pos] = user_id
+        self.vectors[pos] = vector
+        self.sq_norms[pos] = float(vector @ vector)
+        self.size += 1
+        return pos
+
+    def pop(self, pos):
+        """Supprime la ligne pos ; retourne l'id déplacé à sa place (ou None)."""
+        last = self.size - 1
+        moved = None
+        if pos != last:
+            self._own_vectors()
+            self.ids[pos] = self.ids[last]
+            self.vectors[pos] = self.vectors[last]
+            self.sq_norms[pos] = self.sq_norms[last]
+            moved = int(self.ids[pos])
+        self.size = last
+        return moved
+
+    def sq_distances(self, queries, q_sq_norms):
+        n = self.size
+        d = q_sq_norms[:, None] - 2.0 * (queries @ self.vectors[:n].T) + self.sq_norms[:n][None, :]
+        return np.maximum(d, 0.0, out=d)
+
+
+# --------------------
+# Backend exact
+# --------------------
+class ExactIndex(FaceIndex):
+    """Distance euclidienne sur toute la galerie en un seul produit matriciel."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._bucket = _Bucket()
+        self._pos = {}
+
+    def build(self, ids, encodings):
+        encodings = _as_matrix(encodings)
+        with self._lock:
+            self._bucket = _Bucket.wrap(ids, encodings)
+            self._pos = {user_id: pos for pos, user_id in enumerate(self._bucket.ids.tolist())}
+
+    def add(self, user_id, encoding):
+        vector = _as_matrix(encoding)[0]
+        with self._lock:
+            if int(user_id) in self._pos:
+                self.remove(user_id)
+            self._pos[int(user_id)] = self._bucket.append(int(user_id), vector)
+
+    def remove(self, user_id):
+        with self._lock:
+            pos = self._pos.pop(int(user_id), None)
+            if pos is None:
+                return
+            moved = self._bucket.pop(pos)
+            if moved is not None:
+                self._pos[moved] = pos
+
+    def search(self, queries, k=1):
+        queries = _as_matrix(queries)
+        q_sq = np.einsum("ij,ij->i", queries, queries)
+        with self._lock:
+            if self._bucket.size == 0:
+                return _pad(np.empty((len(queries), 0), np.int64), np.empty((len(queries), 0), np.float32), k)
+            sq = self._bucket.sq_distances(queries, q_sq)
+            idx, best = _top_k(sq, k)
+            ids = self._bucket.ids[idx]
+        return _pad(ids, np.sqrt(best), k)
+
+    def __len__(self):
+        return len(self._pos)
+
+
+# --------------------
+# Backend approximatif IVF
+# --------------------
+def kmeans(data, n_clusters, n_iter=10, seed=0):
+    """k-means de Lloyd en NumPy pur, initialisé sur des points tirés au hasard."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].astype(np.float32)
+
+    data_sq = np.einsum("ij,ij->i", data, data)
+    for _ in range(n_iter):
+        c_sq = np.einsum("ij,ij->i", centroids, centroids)
+        assign = np.argmin(data_sq[:, None] - 2.0 * (data @ centroids.T) + c_sq[None, :], axis=1)
+        counts = np.bincount(assign, minlength=n_clusters)
+        non_empty = counts > 0
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.add.reduceat(data[order], starts[non_empty], axis=0)
+        centroids[non_empty] = sums / counts[non_empty, None]
+    return centroids
+
+
+class IVFIndex(FaceIndex):
+    """Index inversé : chaque encodage est rangé dans la liste de son centroïde le plus proche.
+
+    Une recherche ne parcourt que les `nprobe` listes les plus proches de la
+    requête : nprobe=nlist donne le résultat exact, un petit nprobe va plus vite
+    au prix du rappel. Tant que la galerie est trop petite pour entraîner
+    `nlist` centroïdes, l'index se comporte comme une recherche exacte.
+    L'index est réentraîné quand la galerie a doublé depuis le dernier entraînement.
+    """
+
+    def __init__(self, nlist=None, nprobe=8, train_sample=20000, kmeans_iter=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_sample = train_sample
+        self.kmeans_iter = kmeans_iter
+        self.seed = seed
+        self._lock = threading.RLock()
+        self._centroids = None
+        self._c_sq_norms = None
+        self._buckets = [_Bucket()]
+        self._pos = {}
+        self._trained_size = 0
+
+    def _target_nlist(self, n):
+        if self.nlist:
+            return self.nlist
+        return max(1, int(np.sqrt(n)))
+
+    def _all_vectors(self):
+        ids, vectors = [], []
+        for bucket in self._buckets:
+            ids.append(bucket.ids[:bucket.size])
+            vectors.append(bucket.vectors[:bucket.size])
+        if not ids:
+            return np.empty(0, np.int64), np.empty((0, ENCODING_DIM), np.float32)
+        return np.concatenate(ids), np.concatenate(vectors)
+
+    def build(self, ids, encodings):
+        encodings = _as_matrix(encodings)
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            nlist = self._target_nlist(len(ids))
+            if len(ids) < 8 * nlist or nlist == 1:
+                self._centroids = None
+                self._c_sq_norms = None
+                assign = np.zeros(len(ids), dtype=np.int64)
+                n_buckets = 1
+            else:
+                rng = np.random.default_rng(self.seed)
+                sample = encodings
+                if len(encodings) > self.train_sample:
+                    sample = encodings[rng.choice(len(encodings), self.train_sample, replace=False)]
+                self._centroids = kmeans(sample, nlist, self.kmeans_iter, self.seed)
+                self._c_sq_norms = np.einsum("ij,ij->i", self._centroids, self._centroids)
+                assign = self._assign(encodings)
+                n_buckets = nlist
+
+            counts = np.bincount(assign, minlength=n_buckets)
+            self._buckets = [_Bucket(capacity=max(16, int(c))) for c in counts]
+            self._pos = {}
+            for user_id, vector, b in zip(ids, encodings, assign):
+                self._pos[int(user_id)] = (int(b), self._buckets[b].append(int(user_id), vector))
+            self._trained_size = len(ids)
+
+    def _assign(self, vectors):
+        sq = np.einsum("ij,ij->i", vectors, vectors)
+        d = sq[:, None] - 2.0 * (vectors @ self._centroids.T) + self._c_sq_norms[None, :]
+        return np.argmin(d, axis=1)
+
+    def add(self, user_id, encoding):
+        vector = _as_matrix(encoding)
+        with self._lock:
+            if int(user_id) in self._pos:
+                self.remove(user_id)
+            b = 0 if self._centroids is None else int(self._assign(vector)[0])
+            self._pos[int(user_id)] = (b, self._buckets[b].append(int(user_id), vector[0]))
+            if len(self._pos) >= max(2 * self._trained_size, 8 * self._target_nlist(len(self._pos))) \
+                    and len(self._pos) >= 64:
+                self.build(*self._all_vectors())
+
+    def remove(self, user_id):
+        with self._lock:
+            entry = self._pos.pop(int(user_id), None)
+            if entry is None:
+                return
+            b, pos = entry
+            moved = self._buckets[b].pop(pos)
+            if moved is not None:
+                self._pos[moved] = (b, pos)
+
+    def search(self, queries, k=1):
+        queries = _as_matrix(queries)
+        q_sq = np.einsum("ij,ij->i", queries, queries)
+        out_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        out_dists = np.full((len(queries), k), np.inf, dtype=np.float32)
+        with self._lock:
+            if self._centroids is None:
+                probes = np.zeros((len(queries), 1), dtype=np.int64)
+            else:
+                d = q_sq[:, None] - 2.0 * (queries @ self._centroids.T) + self._c_sq_norms[None, :]
+                nprobe = min(self.nprobe, len(self._centroids))
+                probes = np.argpartition(d, nprobe - 1, axis=1)[:, :nprobe]
+
+            for qi in range(len(queries)):
+                buckets = [self._buckets[b] for b in probes[qi] if self._buckets[b].size]
+                if not buckets:
+                    continue
+                q = queries[qi:qi + 1]
+                sq = np.concatenate([b.sq_distances(q, q_sq[qi:qi + 1]) for b in buckets], axis=1)
+                cand_ids = np.concatenate([b.ids[:b.size] for b in buckets])
+                idx, best = _top_k(sq, k)
+                n = idx.shape[1]
+                out_ids[qi, :n] = cand_ids[idx[0]]
+                out_dists[qi, :n] = np.sqrt(best[0])
+        return out_ids, out_dists
+
+    def __len__(self):
+        return len(self._pos)
+
+
+# --------------------
+# Backend quantifié
+# --------------------
+QUANTIZED_DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+class QuantizedIndex(FaceIndex):
+    """Galerie quantifiée en float16 ou en int8 (une échelle par dimension).
+
+    La recherche parcourt la matrice quantifiée par blocs de `chunk_rows`
+    lignes pour garder les `candidates` plus proches de chaque requête, puis
+    recalcule leur distance exacte en float32 : seul ce second passage décide
+    face à la tolérance. Les vecteurs float32 passés à build() sont gardés par
+    référence, sans copie : avec l'instantané projeté en mémoire, seules les
+    pages des candidats sont lues, et la mémoire résidente se limite aux codes
+    (128 octets par employé en int8, 256 en float16, contre 512 en float32).
+    Les échelles int8 suivent le maximum absolu de chaque dimension : un
+    encodage ajouté qui le dépasse (le premier, sur un index construit vide)
+    élargit l'échelle avec une marge et requantifie les codes existants.
+    """
+
+    ADD_HEADROOM = 1.25
+
+    def __init__(self, dtype="int8", candidates=16, chunk_rows=32768):
+        if dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Quantification inconnue : {dtype!r} ({', '.join(QUANTIZED_DTYPES)})")
+        self.dtype = dtype
+        self.candidates = candidates
+        self.chunk_rows = chunk_rows
+        self._lock = threading.RLock()
+        self._peak = np.zeros(ENCODING_DIM, dtype=np.float32)
+        self._scale = np.ones(ENCODING_DIM, dtype=np.float32)
+        self._reset(np.empty(0, np.int64), np.empty((0, ENCODING_DIM), np.float32))
+
+    def _reset(self, ids, base):
+        n = len(ids)
+        self._size = n
+        self._ids = np.array(ids, dtype=np.int64)
+        self._codes = np.empty((n, ENCODING_DIM), dtype=QUANTIZED_DTYPES[self.dtype])
+        self._code_sq = np.empty(n, dtype=np.float32)
+        # Ligne float32 de chaque position : >= 0 dans _base, < 0 dans _extra (-1 - ligne)
+        self._src = np.arange(n, dtype=np.int64)
+        self._base = base
+        self._extra = _Bucket()
+        self._pos = {user_id: pos for pos, user_id in enumerate(self._ids.tolist())}
+
+    def _encode(self, vectors, out, out_sq):
+        """Quantifie `vectors` dans `out` et y associe la norme² des vecteurs reconstruits."""
+        for start in range(0, len(vectors), self.chunk_rows):
+            chunk = np.asarray(vectors[start:start + self.chunk_rows], dtype=np.float32)
+            if self.dtype == "int8":
+                codes = np.clip(np.rint(chunk / self._scale), -127, 127)
+                out[start:start + len(chunk)] = codes
+                approx = codes.astype(np.float32) * self._scale
+            else:
+                out[start:start + len(chunk)] = chunk
+                approx = out[start:start + len(chunk)].astype(np.float32)
+            out_sq[start:start + len(chunk)] = np.einsum("ij,ij->i", approx, approx)
+
+    def build(self, ids, encodings):
+        encodings = _as_matrix(encodings)
+        with self._lock:
+            if self.dtype == "int8":
+                peak = np.zeros(ENCODING_DIM, dtype=np.float32)
+                for start in range(0, len(encodings), self.chunk_rows):
+                    np.maximum(peak, np.abs(encodings[start:start + self.chunk_rows]).max(axis=0), out=peak)
+                self._set_peak(peak)
+            self._reset(ids, encodings)
+            self._encode(encodings, self._codes, self._code_sq)
+
+    def _set_peak(self, peak):
+        self._peak = peak
+        self._scale = np.maximum(peak, 1e-6) / 127.0
+
+    def _requantize(self, peak):
+        """Nouvelle échelle int8 : recode toutes les lignes depuis leurs vecteurs float32."""
+        self._set_peak(peak)
+        for start in range(0, self._size, self.chunk_rows):
+            stop = min(self._size, start + self.chunk_rows)
+            self._encode(self._vectors(np.arange(start, stop)), self._codes[start:stop], self._code_sq[start:stop])
+
+    def add(self, user_id, encoding):
+        vector = _as_matrix(encoding)
+        with self._lock:
+            if int(user_id) in self._pos:
+                self.remove(user_id)
+            magnitude = np.abs(vector[0])
+            if self.dtype == "int8" and (magnitude > self._peak).any():
+                self._requantize(np.maximum(self._peak, magnitude * self.ADD_HEADROOM))
+            if self._size == len(self._ids):
+                capacity = max(16, 2 * len(self._ids))
+                self._ids = np.resize(self._ids, capacity)
+                self._codes = np.resize(self._codes, (capacity, ENCODING_DIM))
+                self._code_sq = np.resize(self._code_sq, capacity)
+                self._src = np.resize(self._src, capacity)
+            pos = self._size
+            self._ids[pos] = int(user_id)
+            self._encode(vector, self._codes[pos:pos + 1], self._code_sq[pos:pos + 1])
+            self._src[pos] = -1 - self._extra.append(int(user_id), vector[0])
+            self._pos[int(user_id)] = pos
+            self._size += 1
+
+    def remove(self, user_id):
+        with self._lock:
+            pos = self._pos.pop(int(user_id), None)
+            if pos is None:
+                return
+            # La ligne float32 reste en place (inaccessible) jusqu'au prochain build()
+            last = self._size - 1
+            if pos != last:
+                for arr in (self._ids, self._codes, self._code_sq, self._src):
+                    arr[pos] = arr[last]
+                self._pos[int(self._ids[pos])] = pos
+            self._size = last
+
+    def _vectors(self, positions):
+        src = self._src[positions]
+        out = np.empty((len(src), ENCODING_DIM), dtype=np.float32)
+        in_base = src >= 0
+        out[in_base] = self._base[src[in_base]]
+        out[~in_base] = self._extra.vectors[-1 - src[~in_base]]
+        return out
+
+    def search(self, queries, k=1):
+        queries = _as_matrix(queries)
+        q_sq = np.einsum("ij,ij->i", queries, queries)
+        # En int8, q · (codes * échelle) = (q * échelle) · codes
+        scaled = queries * self._scale if self.dtype == "int8" else queries
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return _pad(np.empty((len(queries), 0), np.int64), np.empty((len(queries), 0), np.float32), k)
+            n_cand = min(n, max(k, self.candidates))
+            cand = np.empty((len(queries), 0), dtype=np.int64)
+            cand_sq = np.empty((len(queries), 0), dtype=np.float32)
+            for start in range(0, n, self.chunk_rows):
+                stop = min(n, start + self.chunk_rows)
+                sq = (q_sq[:, None] + self._code_sq[None, start:stop]
+                      - 2.0 * (scaled @ self._codes[start:stop].astype(np.float32).T))
+                idx, best = _top_k(sq, n_cand)
+                cand = np.concatenate([cand, idx + start], axis=1)
+                cand_sq = np.concatenate([cand_sq, best], axis=1)
+                if cand.shape[1] > n_cand:
+                    keep, cand_sq = _top_k(cand_sq, n_cand)
+                    cand = np.take_along_axis(cand, keep, axis=1)
+
+            # Second passage exact sur les candidats
+            rows = self._vectors(cand.ravel()).reshape(len(queries), n_cand, ENCODING_DIM)
+            diff = rows - queries[:, None, :]
+            exact = np.einsum("qcd,qcd->qc", diff, diff)
+            idx, best = _top_k(exact, k)
+            ids = self._ids[np.take_along_axis(cand, idx, axis=1)]
+        return _pad(ids, np.sqrt(best), k)
+
+    def __len__(self):
+        return self._size
+
+
+def make_index(backend=None, **kwargs):
+    backend = backend or DEFAULT_BACKEND
+    if backend == "exact":
+        return ExactIndex(**kwargs)
+    if backend == "ivf":
+        return IVFIndex(**kwargs)
+    if backend in QUANTIZED_DTYPES:
+        return QuantizedIndex(dtype=backend, **kwargs)
+    raise ValueError(f"Backend d'index inconnu : {backend}")
@@ -0,0 +1,247 @@
+# gallery.py
+# Galerie des visages connus partagée par tout le processus :
+# encodages dans une matrice float32 contiguë + tableau des noms en parallèle.
+# Deux modes de correspondance (variable d'environnement FACE_MATCH) :
+#   - "prototype" : un vecteur par employé (moyenne/médoïde de ses échantillons),
+#     coût O(employés), recherche via le FaceIndex
+#   - "samples"   : tous les échantillons, distance minimale par employé
+#     (réduction par segments), coût O(échantillons)
+# Au démarrage, la galerie est lue depuis l'instantané projeté en mémoire
+# (snapshot.py) quand il est à jour, sinon depuis SQLite puis réexportée.
+import os
+import threading
+import time
+
+import numpy as np
+
+from controllers.metrics import metrics
+from models import models, snapshot
+from models.face_index import make_index
+from models.models import ENCODING_DIM
+
+MATCH_MODES = ("prototype", "samples")
+
+
+class GallerySnapshot:
+    """Vue figée (non modifiable) de la galerie à une version donnée."""
+
+    def __init__(self, version, ids, names, encodings, samples=None, sample_starts=None):
+        self.version = version
+        self.ids = ids
+        self.names = names
+        self.encodings = encodings          # prototypes, un par employé
+        self.samples = samples              # mode "samples" : échantillons groupés par employé
+        self.sample_starts = sample_starts  # début du segment de chaque employé dans samples
+        self.sample_sq_norms = None if samples is None else np.einsum("ij,ij->i", samples, samples)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class Gallery:
+    """Cache en mémoire des employés, chargé une fois puis mis à jour par incrément.
+
+    Les écritures faites dans ce processus (add_user, update_user_encoding,
+    update_user_name, delete_user) sont appliquées directement via les
+    listeners du module models. Les écritures faites par un autre processus
+    sont détectées grâce au compteur meta.gallery_version, vérifié au plus
+    toutes les `check_interval` secondes.
+
+    La recherche du plus proche voisin passe par un FaceIndex (exact, IVF ou
+    quantifié float16 / int8) maintenu en phase avec la galerie, ou, en mode "samples", par un
+    parcours de tous les échantillons.
+
+    Chaque version publiée est exportée sur disque (GALLERY_SNAPSHOT=0 pour
+    désactiver) : les autres processus la projettent en mémoire au lieu de
+    relire SQLite.
+    """
+
+    def __init__(self, check_interval=2.0, index=None, mode=None, use_snapshot=None):
+        self.mode = mode or os.environ.get("FACE_MATCH", "prototype")
+        if self.mode not in MATCH_MODES:
+            raise ValueError(f"Mode de correspondance inconnu : {self.mode!r} ({', '.join(MATCH_MODES)})")
+        self.check_interval = check_interval
+        self.index = index if index is not None else make_index()
+        if use_snapshot is None:
+            use_snapshot = os.environ.get("GALLERY_SNAPSHOT", "1") != "0"
+        self._writer = snapshot.SnapshotWriter() if use_snapshot else None
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._database_id = None
+        self._last_check = 0.0
+        self.last_load_seconds = None
+        models.add_user_listener(self._on_user_event)
+
+    # --------------------
+    # Lecture
+    # --------------------
+    def snapshot(self):
+        """Retourne la galerie courante, rechargée seulement si la table a changé."""
+        now = time.monotonic()
+        snap = self._snapshot
+        if snap is not None and now - self._last_check < self.check_interval:
+            return snap
+        with self._lock:
+            if self._snapshot is None:
+                self._reload()
+            elif now - self._last_check >= self.check_interval:
+                if models.get_gallery_version() != self._snapshot.version:
+                    self._reload()
+            self._last_check = now
+            return self._snapshot
+
+    @property
+    def version(self):
+        return self.snapshot().version
+
+    def reload(self):
+        with self._lock:
+            self._reload()
+            self._last_check = time.monotonic()
+            return self._snapshot
+
+    def match(self, encodings, tolerance):
+        """Plus proche employé pour chaque encodage : liste de (nom ou None, distance)."""
+        self.snapshot()
+        with self._lock:
+            snap = self._snapshot
+            if not len(encodings) or not len(snap):
+                return [(None, float("inf"))] * len(encodings)
+            if self.mode == "samples":
+                return self._match_samples(snap, encodings, tolerance)
+            ids, dists = self.index.search(encodings, k=1)
+            positions = np.searchsorted(snap.ids, ids[:, 0])
+            positions = np.minimum(positions, len(snap) - 1)
+        results = []
+        for user_id, pos, dist in zip(ids[:, 0], positions, dists[:, 0]):
+            if user_id >= 0 and snap.ids[pos] == user_id and dist <= tolerance:
+                results.append((snap.names[pos], float(dist)))
+            else:
+                results.append((None, float(dist)))
+        return results
+
+    @staticmethod
+    def _match_samples(snap, encodings, tolerance):
+        """Distance à chaque échantillon puis minimum par segment (un segment par employé)."""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        sq = (np.einsum("ij,ij->i", queries, queries)[:, None]
+              + snap.sample_sq_norms[None, :]
+              - 2.0 * queries @ snap.samples.T)
+        per_user = np.minimum.reduceat(sq, snap.sample_starts, axis=1)
+        best = np.argmin(per_user, axis=1)
+        dists = np.sqrt(np.maximum(per_user[np.arange(len(queries)), best], 0.0))
+        return [(snap.names[pos] if dist <= tolerance else None, float(dist))
+                for pos, dist in zip(best, dists)]
+
+    def _load_samples(self, ids, encodings):
+        """Échantillons alignés sur `ids` ; le prototype remplace ceux d'un employé sans échantillon."""
+        _, owners, samples = models.get_gallery_samples()
+        keep = np.isin(owners, ids)
+        owners, samples = owners[keep], samples[keep]
+        missing = ~np.isin(ids, owners)
+        if missing.any():
+            owners = np.concatenate([owners, ids[missing]])
+            samples = np.concatenate([samples, encodings[missing]])
+            order = np.argsort(owners, kind="stable")
+            owners, samples = owners[order], samples[order]
+        return np.ascontiguousarray(samples), np.searchsorted(owners, ids)
+
+    def _reload(self):
+        start = time.perf_counter()
+        loaded = None
+        # Un instantané n'est valable que pour la base qui l'a produit
+        self._database_id = models.get_database_id()
+        if self._writer is not None and self._database_id is not None:
+            loaded = snapshot.load_snapshot(models.get_gallery_version(), self._database_id)
+        if loaded is not None:
+            version, ids, names, encodings = loaded
+        else:
+            version, ids, names, encodings = models.get_gallery_rows()
+            self._export(version, ids, names, encodings)
+        if self.mode == "samples":
+            samples, starts = self._load_samples(ids, encodings)
+            self._publish(version, ids, names, encodings, samples, starts)
+        else:
+            self.index.build(ids, encodings)
+            self._publish(version, ids, names, encodings)
+        self.last_load_seconds = time.perf_counter() - start
+        metrics.observe("gallery_load", self.last_load_seconds)
+        metrics.set_gauge("gallery_size", len(ids))
+
+    def _publish(self, version, ids, names, encodings, samples=None, sample_starts=None):
+        # Les tableaux publiés ne sont plus jamais modifiés : les lecteurs
+        # (threads WebRTC, sessions Streamlit) peuvent les utiliser sans verrou.
+        snapshot = GallerySnapshot(version, ids, names, encodings, samples, sample_starts)
+        for arr in (ids, names, encodings, samples, sample_starts, snapshot.sample_sq_norms):
+            if arr is not None:
+                arr.flags.writeable = False
+        self._snapshot = snapshot
+
+    # --------------------
+    # Mises à jour incrémentales
+    # --------------------
+    def _on_user_event(self, event, version, **kwargs):
+        with self._lock:
+            snap = self._snapshot
+            if snap is None:
+                return
+            if version != snap.version + 1 or self.mode == "samples":
+                # Écriture d'un autre processus manquée, ou mode "samples" (les
+                # enrôlements sont rares) : rechargement complet
+                self._reload()
+                return
+
+            ids, names, encodings = snap.ids, snap.names, snap.encodings
+            if event == "add":
+                ids = np.append(ids, np.int64(kwargs["user_id"]))
+                names = np.append(names, np.array([kwargs["name"]], dtype=object))
+                row = np.asarray(kwargs["encoding"], dtype=np.float32).reshape(1, ENCODING_DIM)
+                encodings = np.concatenate([encodings, row])
+                self.index.add(kwargs["user_id"], row)
+            elif event == "add_many":
+                new_ids = np.asarray(kwargs["user_ids"], dtype=np.int64)
+                rows = np.asarray(kwargs["encodings"], dtype=np.float32).reshape(-1, ENCODING_DIM)
+                ids = np.concatenate([ids, new_ids])
+                names = np.concatenate([names, np.array(kwargs["names"], dtype=object)])
+                encodings = np.concatenate([encodings, rows])
+                for user_id, row in zip(new_ids, rows):
+                    self.index.add(user_id, row)
+            elif event == "rename":
+                names = names.copy()
+                names[names == kwargs["old_name"]] = kwargs["new_name"]
+            elif event == "update_encoding":
+                mask = names == kwargs["name"]
+                encodings = encodings.copy()
+                encodings[mask] = np.asarray(kwargs["encoding"], dtype=np.float32)
+                for user_id in ids[mask]:
+                    self.index.add(user_id, encodings[mask][0])
+            elif event == "delete":
+                keep = names != kwargs["name"]
+                for user_id in ids[~keep]:
+                    self.index.remove(user_id)
+                ids, names, encodings = ids[keep], names[keep], encodings[keep]
+            else:
+                self._reload()
+                return
+
+            encodings = np.ascontiguousarray(encodings)
+            self._publish(version, ids, names, encodings)
+            self._export(version, ids, names, encodings)
+
+    def _export(self, version, ids, names, encodings):
+        if self._writer is not None and self._database_id is not None:
+            self._writer.schedule(version, ids, names, encodings, self._database_id)
+
+
+_gallery = None
+_gallery_lock = threading.Lock()
+
+
+def get_gallery():
+    """Instance unique de la galerie pour tout le processus."""
+    global _gallery
+    if _gallery is None:
+        with _gallery_lock:
+            if _gallery is None:
+                _gallery = Gallery()
+    return _gallery
@@ -1,12 +1,51 @@
 # models.py
-import sqlite3
 import pickle
 import hashlib
+import secrets
+import io
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
 
-DB_FILE = "users.db"
+import numpy as np
+
+from models import database
+
+# Base SQLite ; FACE_DB permet d'en utiliser une autre (tests, benchmarks)
+DB_FILE = os.environ.get("FACE_DB", "users.db")
+
+# Format de stockage des encodages (colonne users.encoding_format)
+ENCODING_FORMAT_PICKLE = 0   # ancien format : pickle.dumps(ndarray)
+ENCODING_FORMAT_F32 = 1      # float32 little-endian brut, 128 x 4 = 512 octets
+ENCODING_DIM = 128
+ENCODING_DTYPE = np.dtype("<f4")
+
+# users.encoding contient le prototype de l'employé, calculé à partir de ses
+# échantillons (table user_encodings) : moyenne ou médoïde
+PROTOTYPE_METHOD = os.environ.get("FACE_PROTOTYPE", "mean")
+
+
+def _connection():
+    return database.connection(DB_FILE)
+
+
+def transaction(immediate=True):
+    """Regroupe plusieurs appels de ce module dans une seule transaction SQLite."""
+    return database.transaction(DB_FILE, immediate)
+
+# Vignettes des photos : cache LRU {(user_id, size): bytes JPEG}
+THUMBNAIL_CACHE_SIZE = 512
+PHOTO_CHUNK_SIZE = 64 * 1024
+_thumbnails = OrderedDict()
+_thumbnails_lock = threading.Lock()
+
+# Fonctions appelées après chaque écriture sur la table users
+# (utilisées par la galerie en mémoire pour se mettre à jour)
+_user_listeners = []
 
 def init_db():
-    with sqlite3.connect(DB_FILE) as conn:
+    with transaction() as conn:
         c = conn.cursor()
 
         # --------------------
@@ -16,9 +55,95 @@ def init_db():
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
+                encoding BLOB NOT NULL,
+                photo BLOB,
+                encoding_format INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        _migrate_users_table(c)
+
+        # --------------------
+        # Échantillons d'encodage (plusieurs prises de vue par employé)
+        # --------------------
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS user_encodings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
                 encoding BLOB NOT NULL
             )
         ''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_user_encodings_user ON user_encodings (user_id)")
+        # Employés enregistrés avant cette table : leur encodage devient leur premier échantillon
+        c.execute('''
+            INSERT INTO user_encodings (user_id, encoding)
+            SELECT id, encoding FROM users
+            WHERE NOT EXISTS (SELECT 1 FROM user_encodings e WHERE e.user_id = users.id)
+        ''')
+
+        # --------------------
+        # Photos déjà importées par l'enrôlement en masse (reprise sans doublon)
+        # --------------------
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS imported_photos (
+                source TEXT NOT NULL,
+                member TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                PRIMARY KEY (source, member)
+            )
+        ''')
+
+        # --------------------
+        # Métadonnées (version de la galerie)
+        # --------------------
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        c.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('gallery_version', 0)")
+        # Identifiant aléatoire de cette base : une base recréée ou restaurée
+        # repart à la même version, mais pas avec le même identifiant
+        c.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('database_id', ?)",
+                  (secrets.randbelow(2 ** 62) + 1,))
+
+        # --------------------
+        # Journal des accès (décisions autorisé / refusé)
+        # --------------------
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS access_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp REAL NOT NULL,
+                camera TEXT NOT NULL,
+                user_name TEXT,
+                decision TEXT NOT NULL CHECK(decision IN ('granted', 'denied')),
+                distance REAL,
+                thumbnail BLOB
+            )
+        ''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_access_events_time ON access_events (timestamp)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_access_events_user ON access_events (user_name, timestamp)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_access_events_camera ON access_events (camera, timestamp)")
+
+        # --------------------
+        # Agrégats horaires et journaliers du journal (tenus à jour à chaque insertion)
+        # --------------------
+        c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'access_rollups_daily'")
+        backfill = c.fetchone() is None
+        for table, bucket_type in (("access_rollups_hourly", "INTEGER"), ("access_rollups_daily", "TEXT")):
+            c.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    bucket {bucket_type} NOT NULL,
+                    camera TEXT NOT NULL,
+                    user_name TEXT NOT NULL,
+                    granted INTEGER NOT NULL DEFAULT 0,
+                    denied INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (bucket, camera, user_name)
+                ) WITHOUT ROWID
+            ''')
+            c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table} (user_name, bucket)")
+        if backfill:
+            _rebuild_access_rollups(c)
 
         # --------------------
         # Table des comptes
@@ -33,16 +158,23 @@ def init_db():
         ''')
 
         # --------------------
-        # Table des sessions
+        # Table des sessions (une ligne par jeton de connexion)
         # --------------------
+        c.execute("PRAGMA table_info(sessions)")
+        if {row[1] for row in c.fetchall()} - {"token", "username", "role", "login_time", "expires_at"}:
+            # Ancienne table à session unique : les connexions en cours sont perdues une fois
+            c.execute("DROP TABLE sessions")
         c.execute('''
             CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                token TEXT PRIMARY KEY,
                 username TEXT NOT NULL,
                 role TEXT NOT NULL,
-                login_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                login_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at REAL NOT NULL
             )
         ''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_username ON sessions (username)")
 
         # --------------------
         # Créer un compte admin par défaut si inexistant
@@ -54,54 +186,419 @@ def init_db():
                 ("admin", hash_password("admin101855"), "admin")
             )
 
-        conn.commit()
+# --------------------
+# Encodages binaires
+# --------------------
+def encode_embedding(encoding):
+    """Sérialise un encodage en 512 octets float32 little-endian."""
+    data = np.ascontiguousarray(encoding, dtype=ENCODING_DTYPE)
+    if data.shape != (ENCODING_DIM,):
+        raise ValueError(f"Encodage de dimension {data.shape} au lieu de ({ENCODING_DIM},)")
+    return data.tobytes()
+
+
+def decode_embedding(blob, encoding_format=ENCODING_FORMAT_F32):
+    if encoding_format == ENCODING_FORMAT_PICKLE:
+        return np.asarray(pickle.loads(blob), dtype=np.float32)
+    return np.frombuffer(blob, dtype=ENCODING_DTYPE).astype(np.float32)
+
+
+def decode_embeddings(blobs):
+    """Décode une liste de blobs float32 dans une matrice (N, 128) préallouée."""
+    matrix = np.empty((len(blobs), ENCODING_DIM), dtype=np.float32)
+    for i, blob in enumerate(blobs):
+        matrix[i] = np.frombuffer(blob, dtype=ENCODING_DTYPE)
+    return matrix
+
+
+def as_samples(encodings):
+    """Un encodage (128,) ou plusieurs (N, 128) -> matrice float32 (N, 128)."""
+    samples = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+    if not len(samples):
+        raise ValueError("Au moins un encodage est nécessaire")
+    return samples
+
+
+def compute_prototype(samples, method=None):
+    """Prototype d'un employé : moyenne des échantillons ou médoïde (échantillon le plus central)."""
+    samples = as_samples(samples)
+    method = method or PROTOTYPE_METHOD
+    if len(samples) == 1:
+        return samples[0].copy()
+    if method == "medoid":
+        dists = np.linalg.norm(samples[:, None, :] - samples[None, :, :], axis=2)
+        return samples[np.argmin(dists.sum(axis=1))].copy()
+    if method != "mean":
+        raise ValueError(f"Prototype inconnu : {method!r} (mean ou medoid)")
+    return samples.mean(axis=0)
+
+
+def _insert_samples(c, user_id, samples):
+    c.executemany(
+        "INSERT INTO user_encodings (user_id, encoding) VALUES (?, ?)",
+        [(user_id, encode_embedding(sample)) for sample in samples]
+    )
+
+
+def _migrate_users_table(c):
+    """Migration unique : ajoute les colonnes manquantes et convertit les encodages pickle."""
+    c.execute("PRAGMA table_info(users)")
+    columns = {row[1] for row in c.fetchall()}
+    if "photo" not in columns:
+        c.execute("ALTER TABLE users ADD COLUMN photo BLOB")
+    if "encoding_format" not in columns:
+        c.execute("ALTER TABLE users ADD COLUMN encoding_format INTEGER NOT NULL DEFAULT 0")
+
+    c.execute("SELECT id, encoding FROM users WHERE encoding_format = ?", (ENCODING_FORMAT_PICKLE,))
+    legacy = c.fetchall()
+    if legacy:
+        c.executemany(
+            "UPDATE users SET encoding = ?, encoding_format = ? WHERE id = ?",
+            [(encode_embedding(pickle.loads(blob)), ENCODING_FORMAT_F32, user_id)
+             for user_id, blob in legacy]
+        )
 
 # --------------------
 # Gestion employés
 # --------------------
+def add_user_listener(callback):
+    """Enregistre callback(event, version, **kwargs) appelé après chaque écriture sur users."""
+    if callback not in _user_listeners:
+        _user_listeners.append(callback)
+
+
+def remove_user_listener(callback):
+    if callback in _user_listeners:
+        _user_listeners.remove(callback)
+
+
+def _notify_user_listeners(event, version, **kwargs):
+    """Prévient les listeners, après le COMMIT de la transaction englobante s'il y en a une."""
+    def notify():
+        for callback in list(_user_listeners):
+            callback(event, version, **kwargs)
+    database.after_commit(DB_FILE, notify)
+
+
+def _bump_gallery_version(c):
+    """Incrémente la version de la galerie dans la même transaction que l'écriture."""
+    c.execute("UPDATE meta SET value = value + 1 WHERE key = 'gallery_version'")
+    c.execute("SELECT value FROM meta WHERE key = 'gallery_version'")
+    row = c.fetchone()
+    return row[0] if row else 0
+
+
+def get_gallery_version():
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT value FROM meta WHERE key = 'gallery_version'")
+        row = c.fetchone()
+        return row[0] if row else 0
+
+
+def get_database_id():
+    """Identifiant tiré par init_db pour cette base (None avant init_db)."""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT value FROM meta WHERE key = 'database_id'")
+        row = c.fetchone()
+        return row[0] if row else None
+
+
 def add_user(name, encoding, photo_bytes=None):
-    with sqlite3.connect(DB_FILE) as conn:
+    """Ajoute un employé ; `encoding` peut contenir plusieurs échantillons (N, 128)."""
+    samples = as_samples(encoding)
+    prototype = compute_prototype(samples)
+    with transaction() as conn:
         c = conn.cursor()
         c.execute(
-            "INSERT INTO users (name, encoding, photo) VALUES (?, ?, ?)",
-            (name, pickle.dumps(encoding), photo_bytes)
+            "INSERT INTO users (name, encoding, photo, encoding_format) VALUES (?, ?, ?, ?)",
+            (name, encode_embedding(prototype), photo_bytes, ENCODING_FORMAT_F32)
+        )
+        user_id = c.lastrowid
+        _insert_samples(c, user_id, samples)
+        version = _bump_gallery_version(c)
+    _notify_user_listeners("add", version, user_id=user_id, name=name, encoding=prototype, samples=samples)
+    return user_id
+
+
+def add_users_bulk(users):
+    """Insère [(name, encoding(s), photo_bytes)] en une seule transaction ; retourne les ids."""
+    users = list(users)
+    if not users:
+        return []
+    samples = [as_samples(encoding) for _, encoding, _ in users]
+    prototypes = [compute_prototype(s) for s in samples]
+    with transaction() as conn:
+        c = conn.cursor()
+        user_ids = []
+        for (name, _, photo_bytes), user_samples, prototype in zip(users, samples, prototypes):
+            c.execute(
+                "INSERT INTO users (name, encoding, photo, encoding_format) VALUES (?, ?, ?, ?)",
+                (name, encode_embedding(prototype), photo_bytes, ENCODING_FORMAT_F32)
+            )
+            user_ids.append(c.lastrowid)
+            _insert_samples(c, c.lastrowid, user_samples)
+        version = _bump_gallery_version(c)
+    _notify_user_listeners(
+        "add_many", version,
+        user_ids=user_ids, names=[u[0] for u in users], encodings=prototypes, samples=samples
+    )
+    return user_ids
+
+
+def import_users(source, users):
+    """Enrôlement en masse idempotent : [(name, encodings (N, 128), photo_bytes, photos)].
+
+    Les `photos` (chemins relatifs dans `source`) sont notées dans imported_photos
+    dans la même transaction que les employés : une reprise ne les réimporte pas.
+    Un nom déjà importé depuis `source` reçoit les nouveaux échantillons au lieu
+    d'être créé une seconde fois. Retourne les ids des employés, dans l'ordre.
+    """
+    users = list(users)
+    if not users:
+        return []
+    user_ids, created, merged = [], [], False
+    with transaction() as conn:
+        c = conn.cursor()
+        for name, encodings, photo_bytes, photos in users:
+            samples = as_samples(encodings)
+            c.execute(
+                "SELECT p.user_id FROM imported_photos p JOIN users u ON u.id = p.user_id "
+                "WHERE p.source = ? AND u.name = ? LIMIT 1",
+                (source, name)
+            )
+            row = c.fetchone()
+            if row is None:
+                prototype = compute_prototype(samples)
+                c.execute(
+                    "INSERT INTO users (name, encoding, photo, encoding_format) VALUES (?, ?, ?, ?)",
+                    (name, encode_embedding(prototype), photo_bytes, ENCODING_FORMAT_F32)
+                )
+                user_id = c.lastrowid
+                _insert_samples(c, user_id, samples)
+                created.append((user_id, name, prototype, samples))
+            else:
+                user_id = row[0]
+                _insert_samples(c, user_id, samples)
+                c.execute("SELECT encoding FROM user_encodings WHERE user_id = ? ORDER BY id", (user_id,))
+                prototype = compute_prototype(decode_embeddings([r[0] for r in c.fetchall()]))
+                c.execute(
+                    "UPDATE users SET encoding = ?, encoding_format = ? WHERE id = ?",
+                    (encode_embedding(prototype), ENCODING_FORMAT_F32, user_id)
+                )
+                merged = True
+            c.executemany(
+                "INSERT OR REPLACE INTO imported_photos (source, member, user_id) VALUES (?, ?, ?)",
+                [(source, photo, user_id) for photo in photos]
+            )
+            user_ids.append(user_id)
+        version = _bump_gallery_version(c)
+    if merged:
+        # Prototypes d'employés existants modifiés : la galerie se recharge
+        _notify_user_listeners("import", version)
+    else:
+        _notify_user_listeners(
+            "add_many", version,
+            user_ids=[u[0] for u in created], names=[u[1] for u in created],
+            encodings=[u[2] for u in created], samples=[u[3] for u in created]
         )
-        conn.commit()
+    return user_ids
+
+
+def get_imported_photos(source):
+    """Photos de `source` déjà importées (enregistrées avec leur employé)."""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT member FROM imported_photos WHERE source = ?", (source,))
+        return {row[0] for row in c.fetchall()}
 
 
 def update_user_name(old_name, new_name):
-    with sqlite3.connect(DB_FILE) as conn:
+    with transaction() as conn:
         c = conn.cursor()
         c.execute("UPDATE users SET name = ? WHERE name = ?", (new_name, old_name))
-        conn.commit()
+        version = _bump_gallery_version(c)
+    _notify_user_listeners("rename", version, old_name=old_name, new_name=new_name)
 
 
 def update_user_encoding(name, new_encoding):
-    with sqlite3.connect(DB_FILE) as conn:
+    """Remplace les échantillons de l'employé (un encodage ou une matrice (N, 128))."""
+    samples = as_samples(new_encoding)
+    prototype = compute_prototype(samples)
+    with transaction() as conn:
         c = conn.cursor()
-        c.execute("UPDATE users SET encoding = ? WHERE name = ?", (pickle.dumps(new_encoding), name))
-        conn.commit()
+        c.execute(
+            "UPDATE users SET encoding = ?, encoding_format = ? WHERE name = ?",
+            (encode_embedding(prototype), ENCODING_FORMAT_F32, name)
+        )
+        c.execute("SELECT id FROM users WHERE name = ?", (name,))
+        for (user_id,) in c.fetchall():
+            c.execute("DELETE FROM user_encodings WHERE user_id = ?", (user_id,))
+            _insert_samples(c, user_id, samples)
+        version = _bump_gallery_version(c)
+    _notify_user_listeners("update_encoding", version, name=name, encoding=prototype, samples=samples)
 
 
 def update_user_photo(name, photo_bytes):
-    with sqlite3.connect(DB_FILE) as conn:
+    with transaction() as conn:
         c = conn.cursor()
         c.execute("UPDATE users SET photo = ? WHERE name = ?", (photo_bytes, name))
-        conn.commit()
+    _clear_thumbnails()
 
 
 def delete_user(name):
-    with sqlite3.connect(DB_FILE) as conn:
+    with transaction() as conn:
         c = conn.cursor()
+        c.execute(
+            "DELETE FROM user_encodings WHERE user_id IN (SELECT id FROM users WHERE name = ?)", (name,)
+        )
         c.execute("DELETE FROM users WHERE name = ?", (name,))
-        conn.commit()
+        version = _bump_gallery_version(c)
+    _clear_thumbnails()
+    _notify_user_listeners("delete", version, name=name)
 
 
 def get_all_users():
-    with sqlite3.connect(DB_FILE) as conn:
+    """Tous les employés avec leur photo ; préférer get_gallery_rows / list_users_page."""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT name, encoding, photo, encoding_format FROM users")
+        return [(row[0], decode_embedding(row[1], row[3]), row[2]) for row in c.fetchall()]
+
+
+def get_gallery_rows():
+    """Retourne (version, ids, names, encodings) lus dans une même transaction."""
+    with transaction(immediate=False) as conn:
         c = conn.cursor()
-        c.execute("SELECT name, encoding, photo FROM users")
-        return [(row[0], pickle.loads(row[1]), row[2]) for row in c.fetchall()]
+        c.execute("SELECT value FROM meta WHERE key = 'gallery_version'")
+        row = c.fetchone()
+        version = row[0] if row else 0
+        c.execute("SELECT id, name, encoding FROM users ORDER BY id")
+        rows = c.fetchall()
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        names = np.array([row[1] for row in rows], dtype=object)
+        encodings = decode_embeddings([row[2] for row in rows])
+        return version, ids, names, encodings
+
+
+def get_gallery_samples():
+    """Tous les échantillons triés par employé : (version, owner_ids, encodings)."""
+    with transaction(immediate=False) as conn:
+        c = conn.cursor()
+        c.execute("SELECT value FROM meta WHERE key = 'gallery_version'")
+        row = c.fetchone()
+        version = row[0] if row else 0
+        c.execute("SELECT user_id, encoding FROM user_encodings ORDER BY user_id, id")
+        rows = c.fetchall()
+        owners = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        return version, owners, decode_embeddings([row[1] for row in rows])
+
+
+def get_user_samples(name):
+    """Échantillons (N, 128) de l'employé `name` (son prototype s'il n'en a pas), ou None."""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, encoding, encoding_format FROM users WHERE name = ?", (name,))
+        rows = c.fetchall()
+        if not rows:
+            return None
+        ids = [row[0] for row in rows]
+        c.execute(
+            f"SELECT encoding FROM user_encodings WHERE user_id IN ({', '.join('?' * len(ids))}) "
+            "ORDER BY user_id, id",
+            ids
+        )
+        samples = [row[0] for row in c.fetchall()]
+    if samples:
+        return decode_embeddings(samples)
+    return np.stack([decode_embedding(row[1], row[2]) for row in rows])
+
+
+def list_users_page(after_id=0, limit=50):
+    """Page d'employés par curseur sur l'id : ([(id, name, taille photo)], curseur suivant ou None).
+
+    La taille de la photo est lue sans charger le BLOB ; le curseur est l'id
+    du dernier employé de la page, à repasser en after_id, et vaut None sur
+    la dernière page.
+    """
+    with _connection() as conn:
+        c = conn.cursor()
+        # Une ligne de plus que la page : elle dit s'il existe une page suivante
+        c.execute(
+            "SELECT id, name, length(photo) FROM users WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit + 1)
+        )
+        rows = c.fetchall()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1][0]
+    return rows, None
+
+
+# --------------------
+# Photos des employés (chargées à la demande)
+# --------------------
+def iter_user_photo(user_id, chunk_size=PHOTO_CHUNK_SIZE):
+    """Lit la photo par morceaux via les E/S incrémentales de SQLite (aucune copie complète)."""
+    conn = database.get_connection(DB_FILE)
+    row = conn.execute("SELECT length(photo) FROM users WHERE id = ?", (user_id,)).fetchone()
+    if not row or not row[0]:
+        return
+    if hasattr(conn, "blobopen"):
+        with conn.blobopen("users", "photo", user_id, readonly=True) as blob:
+            while True:
+                chunk = blob.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    else:
+        # Python < 3.11 : lecture par tranches avec substr()
+        for offset in range(1, row[0] + 1, chunk_size):
+            chunk = conn.execute(
+                "SELECT substr(photo, ?, ?) FROM users WHERE id = ?", (offset, chunk_size, user_id)
+            ).fetchone()
+            if not chunk or not chunk[0]:
+                break
+            yield chunk[0]
+
+
+def get_user_photo(user_id):
+    """Photo complète de l'employé (bytes) ou None."""
+    data = b"".join(iter_user_photo(user_id))
+    return data or None
+
+
+def get_user_thumbnail(user_id, size=128):
+    """Vignette JPEG de la photo (côté max `size`), gardée dans un cache LRU."""
+    key = (user_id, size)
+    with _thumbnails_lock:
+        if key in _thumbnails:
+            _thumbnails.move_to_end(key)
+            return _thumbnails[key]
+
+    photo = get_user_photo(user_id)
+    if photo is None:
+        return None
+    from PIL import Image
+    image = Image.open(io.BytesIO(photo))
+    image.draft("RGB", (size, size))  # décodage JPEG directement à taille réduite
+    image = image.convert("RGB")
+    image.thumbnail((size, size))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=85)
+    thumbnail = out.getvalue()
+
+    with _thumbnails_lock:
+        _thumbnails[key] = thumbnail
+        while len(_thumbnails) > THUMBNAIL_CACHE_SIZE:
+            _thumbnails.popitem(last=False)
+    return thumbnail
+
+
+def _clear_thumbnails():
+    with _thumbnails_lock:
+        _thumbnails.clear()
 
 # --------------------
 # Gestion comptes
@@ -111,15 +608,14 @@ def hash_password(password):
 
 
 def add_account(username, password, role):
-    with sqlite3.connect(DB_FILE) as conn:
+    with transaction() as conn:
         c = conn.cursor()
         c.execute("INSERT INTO accounts (username, password, role) VALUES (?, ?, ?)",
                   (username, hash_password(password), role))
-        conn.commit()
 
 
 def authenticate(username, password):
-    with sqlite3.connect(DB_FILE) as conn:
+    with _connection() as conn:
         c = conn.cursor()
         c.execute("SELECT password, role FROM accounts WHERE username = ?", (username,))
         row = c.fetchone()
@@ -129,14 +625,14 @@ def authenticate(username, password):
 
 
 def get_all_accounts():
-    with sqlite3.connect(DB_FILE) as conn:
+    with _connection() as conn:
         c = conn.cursor()
         c.execute("SELECT username, role FROM accounts")
         return c.fetchall()
 
 
 def get_account_by_username(username):
-    with sqlite3.connect(DB_FILE) as conn:
+    with _connection() as conn:
         c = conn.cursor()
         c.execute("SELECT username FROM accounts WHERE username = ?", (username,))
         row = c.fetchone()
@@ -144,7 +640,7 @@ def get_account_by_username(username):
 
 
 def update_account(username, new_password=None, new_role=None):
-    with sqlite3.connect(DB_FILE) as conn:
+    with transaction() as conn:
         c = conn.cursor()
         if new_password and new_role:
             c.execute(
@@ -161,7 +657,9 @@ def update_account(username, new_password=None, new_role=None):
                 "UPDATE accounts SET role = ? WHERE username = ?",
                 (new_role, username)
             )
-        conn.commit()
+        if new_role:
+            # Le rôle est figé dans les sessions : on force une reconnexion
+            delete_user_sessions(username)
 
 
 def update_account_password(username, new_password):
@@ -169,33 +667,275 @@ def update_account_password(username, new_password):
 
 
 def delete_account(username):
-    with sqlite3.connect(DB_FILE) as conn:
+    with transaction() as conn:
         c = conn.cursor()
         c.execute("DELETE FROM accounts WHERE username = ?", (username,))
-        conn.commit()
+        delete_user_sessions(username)
 
 
 # --------------------
 # Gestion des sessions
 # --------------------
-def create_session(username, role):
-    with sqlite3.connect(DB_FILE) as conn:
+# Une session par poste connecté, identifiée par un jeton aléatoire. Les
+# sessions sont gardées en mémoire {jeton: (username, role, expires_at, checked_at)}
+# et écrites en base (write-through) pour survivre à un redémarrage : une
+# lecture ne touche SQLite qu'au premier accès au jeton dans le processus,
+# puis toutes les SESSION_RECHECK secondes pour voir les déconnexions faites
+# par un autre processus.
+SESSION_TTL = float(os.environ.get("SESSION_TTL_HOURS", "12")) * 3600
+SESSION_RECHECK = 60.0
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def create_session(username, role, ttl=None):
+    """Ouvre une session et retourne son jeton."""
+    token = secrets.token_urlsafe(32)
+    now = time.time()
+    expires_at = now + (SESSION_TTL if ttl is None else ttl)
+    with transaction() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+        c.execute(
+            "INSERT INTO sessions (token, username, role, expires_at) VALUES (?, ?, ?, ?)",
+            (token, username, role, expires_at)
+        )
+    with _sessions_lock:
+        _sessions[token] = (username, role, expires_at, time.monotonic())
+    return token
+
+
+def get_session(token):
+    """(username, role) de la session `token`, ou (None, None) si inconnue ou expirée."""
+    if not token:
+        return None, None
+    now = time.time()
+    with _sessions_lock:
+        cached = _sessions.get(token)
+    if cached is None or time.monotonic() - cached[3] > SESSION_RECHECK:
+        with _connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT username, role, expires_at FROM sessions WHERE token = ?", (token,))
+            row = c.fetchone()
+        with _sessions_lock:
+            if row is None:
+                _sessions.pop(token, None)
+                return None, None
+            cached = _sessions[token] = (row[0], row[1], row[2], time.monotonic())
+    username, role, expires_at, _ = cached
+    if expires_at < now:
+        delete_session(token)
+        return None, None
+    return username, role
+
+
+def delete_session(token):
+    if not token:
+        return
+    with _sessions_lock:
+        _sessions.pop(token, None)
+    with transaction() as conn:
         c = conn.cursor()
-        c.execute("DELETE FROM sessions")  # Supprime session précédente
-        c.execute("INSERT INTO sessions (username, role) VALUES (?, ?)", (username, role))
-        conn.commit()
+        c.execute("DELETE FROM sessions WHERE token = ?", (token,))
 
 
-def get_session():
-    with sqlite3.connect(DB_FILE) as conn:
+def delete_user_sessions(username):
+    """Ferme toutes les sessions d'un compte (suppression, changement de rôle)."""
+    with _sessions_lock:
+        for token in [t for t, s in _sessions.items() if s[0] == username]:
+            del _sessions[token]
+    with transaction() as conn:
         c = conn.cursor()
-        c.execute("SELECT username, role FROM sessions LIMIT 1")
-        row = c.fetchone()
-        return (row[0], row[1]) if row else (None, None)
+        c.execute("DELETE FROM sessions WHERE username = ?", (username,))
 
 
-def delete_session():
-    with sqlite3.connect(DB_FILE) as conn:
+# --------------------
+# Journal des accès
+# --------------------
+# Les agrégats utilisent '' pour les inconnus (user_name NULL dans access_events)
+# ; les heures sont des débuts d'heure en secondes epoch, les jours des dates
+# locales 'AAAA-MM-JJ'.
+ACCESS_RETENTION_DAYS = float(os.environ.get("ACCESS_RETENTION_DAYS", "365"))
+ACCESS_THUMBNAIL_DAYS = float(os.environ.get("ACCESS_THUMBNAIL_DAYS", "30"))
+COMPACTION_BATCH = 5000
+
+
+def hour_bucket(timestamp):
+    return int(timestamp // 3600) * 3600
+
+
+def day_bucket(timestamp):
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+def _rebuild_access_rollups(c):
+    """Recalcule les agrégats depuis les événements bruts (création des tables)."""
+    c.execute("DELETE FROM access_rollups_hourly")
+    c.execute("DELETE FROM access_rollups_daily")
+    for table, bucket in (("access_rollups_hourly", "CAST(timestamp / 3600 AS INTEGER) * 3600"),
+                          ("access_rollups_daily", "date(timestamp, 'unixepoch', 'localtime')")):
+        c.execute(f'''
+            INSERT INTO {table} (bucket, camera, user_name, granted, denied)
+            SELECT {bucket}, camera, COALESCE(user_name, ''),
+                   SUM(decision = 'granted'), SUM(decision = 'denied')
+            FROM access_events GROUP BY 1, 2, 3
+        ''')
+
+
+def _update_access_rollups(c, events):
+    hourly, daily = Counter(), Counter()
+    for timestamp, camera, user_name, decision, *_ in events:
+        granted = decision == "granted"
+        hourly[(hour_bucket(timestamp), camera, user_name or "", granted)] += 1
+        daily[(day_bucket(timestamp), camera, user_name or "", granted)] += 1
+    for table, counts in (("access_rollups_hourly", hourly), ("access_rollups_daily", daily)):
+        c.executemany(
+            f"INSERT INTO {table} (bucket, camera, user_name, granted, denied) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (bucket, camera, user_name) DO UPDATE SET "
+            "granted = granted + excluded.granted, denied = denied + excluded.denied",
+            [(bucket, camera, user, n if granted else 0, 0 if granted else n)
+             for (bucket, camera, user, granted), n in counts.items()]
+        )
+
+
+def add_access_events(events):
+    """Insère [(timestamp, camera, user_name, decision, distance, thumbnail)] en une transaction."""
+    with transaction() as conn:
+        c = conn.cursor()
+        c.executemany(
+            "INSERT INTO access_events (timestamp, camera, user_name, decision, distance, thumbnail) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            events
+        )
+        _update_access_rollups(c, events)
+
+
+def query_access_events(start=None, end=None, user_name=None, camera=None, decision=None,
+                        cursor=None, limit=100):
+    """Événements du plus récent au plus ancien, par pages : (rows, curseur suivant ou None).
+
+    rows : [(id, timestamp, camera, user_name, decision, distance)]. Le curseur
+    (timestamp, id) de la dernière ligne est à repasser tel quel ; user_name=""
+    sélectionne les inconnus. Chaque filtre s'appuie sur un index (timestamp),
+    (user_name, timestamp) ou (camera, timestamp) : pas de parcours complet.
+    """
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(end)
+    if user_name == "":
+        clauses.append("user_name IS NULL")
+    elif user_name is not None:
+        clauses.append("user_name = ?")
+        params.append(user_name)
+    if camera is not None:
+        clauses.append("camera = ?")
+        params.append(camera)
+    if decision is not None:
+        clauses.append("decision = ?")
+        params.append(decision)
+    if cursor is not None:
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend(cursor)
+    where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT id, timestamp, camera, user_name, decision, distance FROM access_events "
+            f"{where}ORDER BY timestamp DESC, id DESC LIMIT ?",
+            params + [limit]
+        )
+        rows = c.fetchall()
+    next_cursor = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+    return rows, next_cursor
+
+
+def get_access_rollups(period="day", start=None, end=None, user_name=None, camera=None):
+    """Comptes agrégés [(bucket, camera, user_name, granted, denied)] triés par période.
+
+    period : "hour" (bucket = début d'heure epoch) ou "day" (bucket = 'AAAA-MM-JJ') ;
+    start / end sont des valeurs de bucket (end exclu).
+    """
+    if period not in ("hour", "day"):
+        raise ValueError(f"Période inconnue : {period!r} (hour ou day)")
+    table = "access_rollups_hourly" if period == "hour" else "access_rollups_daily"
+    clauses, params = [], []
+    for clause, value in (("bucket >= ?", start), ("bucket < ?", end),
+                          ("user_name = ?", user_name), ("camera = ?", camera)):
+        if value is not None:
+            clauses.append(clause)
+            params.append(value)
+    where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+    with _connection() as conn:
         c = conn.cursor()
-        c.execute("DELETE FROM sessions")
-        conn.commit()
\ No newline at end of file
+        c.execute(
+            f"SELECT bucket, camera, user_name, granted, denied FROM {table} {where}"
+            "ORDER BY bucket, camera, user_name",
+            params
+        )
+        return c.fetchall()
+
+
+def get_daily_entries(start_day, end_day, user_name=None):
+    """Entrées autorisées par jour et par employé, toutes caméras : [(jour, nom, entrées)]."""
+    clauses, params = ["bucket >= ?", "bucket < ?", "user_name != ''"], [start_day, end_day]
+    if user_name is not None:
+        clauses.append("user_name = ?")
+        params.append(user_name)
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT bucket, user_name, SUM(granted) FROM access_rollups_daily "
+            f"WHERE {' AND '.join(clauses)} GROUP BY bucket, user_name ORDER BY bucket, user_name",
+            params
+        )
+        return c.fetchall()
+
+
+def compact_access_events(retention_days=None, thumbnail_days=None, now=None, batch=COMPACTION_BATCH):
+    """Rétention du journal brut : vignettes effacées après `thumbnail_days`, événements
+    supprimés après `retention_days` (les agrégats sont conservés).
+
+    Travaille par lots de `batch` lignes, chacun dans sa propre transaction
+    courte, pour ne pas bloquer le journal d'accès. Retourne (supprimés, vignettes effacées).
+    """
+    now = now if now is not None else time.time()
+    retention_days = ACCESS_RETENTION_DAYS if retention_days is None else retention_days
+    thumbnail_days = ACCESS_THUMBNAIL_DAYS if thumbnail_days is None else thumbnail_days
+
+    deleted = 0
+    cutoff = now - retention_days * 86400
+    while True:
+        with transaction() as conn:
+            c = conn.cursor()
+            c.execute(
+                "DELETE FROM access_events WHERE id IN "
+                "(SELECT id FROM access_events WHERE timestamp < ? ORDER BY timestamp LIMIT ?)",
+                (cutoff, batch)
+            )
+            deleted += c.rowcount
+        if c.rowcount < batch:
+            break
+
+    cleared = 0
+    cutoff = now - thumbnail_days * 86400
+    position = (float("-inf"), 0)
+    while True:
+        with transaction() as conn:
+            c = conn.cursor()
+            c.execute(
+                "SELECT timestamp, id FROM access_events WHERE timestamp < ? AND (timestamp, id) > (?, ?) "
+                "AND thumbnail IS NOT NULL ORDER BY timestamp, id LIMIT ?",
+                (cutoff, *position, batch)
+            )
+            rows = c.fetchall()
+            if rows:
+                c.executemany("UPDATE access_events SET thumbnail = NULL WHERE id = ?", [(row[1],) for row in rows])
+                cleared += len(rows)
+                position = rows[-1]
+        if len(rows) < batch:
+            break
+    return deleted, cleared
@@ -0,0 +1,150 @@
+# snapshot.py
+# Instantané de la galerie sur disque, lisible par projection mémoire :
+#   <dossier>/v<version>-<base>/encodings.npy   float32 (N, 128)
+#   <dossier>/v<version>-<base>/ids.npy         int64 (N,)
+#   <dossier>/v<version>-<base>/names.npy       unicode (N,)
+#   <dossier>/CURRENT                           "<version> <base>" de la dernière version écrite
+# <base> est l'identifiant aléatoire de la base (meta.database_id) : le dossier
+# vit à côté de la base, et une base recréée ou restaurée repart à des numéros
+# de version déjà utilisés. Un instantané d'une autre base n'est jamais chargé.
+# Une version est écrite dans un dossier temporaire puis renommée, et CURRENT
+# est remplacé par os.replace : un lecteur ne voit jamais d'instantané partiel.
+# Les lecteurs ouvrent encodings.npy avec np.load(mmap_mode="r") : démarrage
+# quasi immédiat, et tous les processus partagent les mêmes pages physiques.
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from models import models
+
+KEEP_VERSIONS = 2
+VERSION_DIR = re.compile(r"v(\d+)-(\d+)$")
+
+
+def snapshot_dir():
+    """Dossier des instantanés : GALLERY_SNAPSHOT_DIR ou <base>.gallery à côté de la base."""
+    return os.environ.get("GALLERY_SNAPSHOT_DIR") or models.DB_FILE + ".gallery"
+
+
+def current_version(directory=None):
+    """(version, identifiant de la base) de CURRENT, ou None."""
+    directory = directory or snapshot_dir()
+    try:
+        with open(os.path.join(directory, "CURRENT"), encoding="ascii") as f:
+            version, database_id = f.read().split()
+            return int(version), int(database_id)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(version, ids, names, encodings, database_id, directory=None):
+    """Écrit la version `version` de la base `database_id` de façon atomique ; retourne son dossier."""
+    directory = directory or snapshot_dir()
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, f"v{version}-{database_id}")
+    if not os.path.isdir(target):
+        tmp = os.path.join(directory, f".v{version}.tmp-{os.getpid()}-{id(ids)}")
+        os.makedirs(tmp)
+        try:
+            np.save(os.path.join(tmp, "encodings.npy"), np.ascontiguousarray(encodings, dtype=np.float32))
+            np.save(os.path.join(tmp, "ids.npy"), np.asarray(ids, dtype=np.int64))
+            np.save(os.path.join(tmp, "names.npy"), np.asarray(names, dtype=str))
+            os.rename(tmp, target)
+        except OSError:
+            # Un autre processus a publié la même version entre-temps
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+
+    # CURRENT ne recule jamais pour une même base : un écrivain en retard ne
+    # masque pas une version plus récente. Celui d'une autre base est remplacé.
+    current = current_version(directory)
+    if current is None or current[1] != database_id or current[0] < version:
+        pointer = os.path.join(directory, f".CURRENT.tmp-{os.getpid()}-{id(ids)}")
+        with open(pointer, "w", encoding="ascii") as f:
+            f.write(f"{version} {database_id}")
+        os.replace(pointer, os.path.join(directory, "CURRENT"))
+    _prune(directory, database_id)
+    return target
+
+
+def load_snapshot(version=None, database_id=None, directory=None):
+    """(version, ids, names, encodings) projetés en mémoire, ou None si indisponible.
+
+    Retourne None si l'instantané courant n'est pas la version `version` de
+    la base `database_id` (quand ils sont donnés).
+    """
+    directory = directory or snapshot_dir()
+    current = current_version(directory)
+    if (current is None or (version is not None and current[0] != version)
+            or (database_id is not None and current[1] != database_id)):
+        return None
+    path = os.path.join(directory, f"v{current[0]}-{current[1]}")
+    try:
+        encodings = np.load(os.path.join(path, "encodings.npy"), mmap_mode="r")
+        ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        names = np.load(os.path.join(path, "names.npy")).astype(object)
+    except (OSError, ValueError):
+        return None
+    if encodings.shape != (len(ids), models.ENCODING_DIM) or len(names) != len(ids):
+        return None
+    return current[0], ids, names, encodings
+
+
+def _prune(directory, database_id):
+    """Supprime les anciennes versions et celles d'une autre base.
+
+    Un lecteur qui les projette encore garde ses pages.
+    """
+    versions, stale = [], []
+    for entry in os.listdir(directory):
+        match = VERSION_DIR.match(entry)
+        if match and int(match.group(2)) == database_id:
+            versions.append((int(match.group(1)), entry))
+        elif match or (entry.startswith("v") and entry[1:].isdigit()):
+            stale.append(entry)   # autre base, ou ancien format sans identifiant
+    stale += [entry for _, entry in sorted(versions)[:-KEEP_VERSIONS]]
+    for entry in stale:
+        shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+class SnapshotWriter:
+    """Écrit en arrière-plan la dernière version publiée, au plus une fois par `delay` secondes."""
+
+    def __init__(self, delay=1.0, directory=None):
+        self.delay = delay
+        self.directory = directory
+        self.written = 0
+        self.failed = 0
+        self._pending = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="gallery-snapshot", daemon=True)
+        self._thread.start()
+
+    def schedule(self, version, ids, names, encodings, database_id):
+        directory = self.directory or snapshot_dir()
+        with self._cond:
+            pending = self._pending
+            if pending is None or pending[4] != database_id or pending[0] < version:
+                self._pending = (version, ids, names, encodings, database_id, directory)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+            # Regroupe les écritures rapprochées (enrôlement en rafale)
+            time.sleep(self.delay)
+            with self._cond:
+                pending, self._pending = self._pending, None
+            try:
+                write_snapshot(*pending)
+                self.written += 1
+            except OSError:
+                # Dossier en lecture seule, disque plein... : la base reste la référence
+                self.failed += 1
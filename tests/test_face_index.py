@@ -0,0 +1,56 @@
+# test_face_index.py
+# Backends quantifiés : même plus proche voisin que la recherche exacte,
+# y compris sur un index construit vide puis rempli par add() (base neuve).
+import numpy as np
+import pytest
+
+from models.face_index import ExactIndex, QuantizedIndex
+
+
+def gallery(n, seed=0, spread=0.06):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, spread, size=(n, 128)).astype(np.float32)
+
+
+def queries_for(encodings, seed=1):
+    rng = np.random.default_rng(seed)
+    return encodings + rng.normal(0.0, 0.01, size=encodings.shape).astype(np.float32)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_build_empty_then_add(dtype):
+    encodings = gallery(200)
+    index = QuantizedIndex(dtype, candidates=4)
+    index.build([], np.empty((0, 128), dtype=np.float32))
+    for user_id, row in enumerate(encodings):
+        index.add(user_id, row)
+
+    ids, dists = index.search(queries_for(encodings), k=1)
+    assert (ids[:, 0] == np.arange(len(encodings))).all()
+    assert np.abs(index._codes[:len(index)]).max() > 0
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_matches_exact_after_add_and_remove(dtype):
+    encodings = gallery(500)
+    exact, index = ExactIndex(), QuantizedIndex(dtype, chunk_rows=128)
+    exact.build(np.arange(500), encodings)
+    index.build(np.arange(500), encodings)
+    # Encodages plus étendus que la galerie initiale : l'échelle int8 doit s'élargir
+    for user_id, row in enumerate(gallery(50, seed=2, spread=0.12), start=1000):
+        exact.add(user_id, row)
+        index.add(user_id, row)
+    for user_id in range(0, 500, 7):
+        exact.remove(user_id)
+        index.remove(user_id)
+
+    queries = queries_for(np.concatenate([encodings[1::7], gallery(50, seed=2, spread=0.12)]))
+    expected_ids, expected_dists = exact.search(queries, k=3)
+    ids, dists = index.search(queries, k=3)
+    assert (ids == expected_ids).all()
+    np.testing.assert_allclose(dists, expected_dists, atol=1e-5)
+
+
+def test_empty_index_pads_results():
+    ids, dists = QuantizedIndex("int8").search(gallery(2), k=2)
+    assert (ids == -1).all() and np.isinf(dists).all()
@@ -0,0 +1,27 @@
+# test_models.py
+# Pagination par curseur de la liste des employés.
+import numpy as np
+import pytest
+
+from models import database, models
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "users.db")
+    monkeypatch.setattr(models, "DB_FILE", path)
+    models.init_db()
+    yield path
+    database.close_connections()
+
+
+@pytest.mark.parametrize("users", [0, 3, 4, 5])
+def test_list_users_page_stops_on_last_page(db_file, users):
+    models.add_users_bulk((f"employe {i}", np.zeros(128), None) for i in range(users))
+    pages, cursor = [], 0
+    while cursor is not None:
+        rows, cursor = models.list_users_page(after_id=cursor, limit=2)
+        pages.append([row[1] for row in rows])
+    # Pas de page vide à la fin, même quand le nombre d'employés est un multiple de la page
+    assert sum(pages, []) == [f"employe {i}" for i in range(users)]
+    assert len(pages) == max(1, -(-users // 2))
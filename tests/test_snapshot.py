@@ -0,0 +1,70 @@
+# test_snapshot.py
+# Instantanés de la galerie : celui d'une base supprimée puis recréée (mêmes
+# numéros de version) ne doit jamais être chargé.
+import os
+
+import numpy as np
+import pytest
+
+from models import database, models, snapshot
+from models.gallery import Gallery
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "users.db")
+    monkeypatch.setattr(models, "DB_FILE", path)
+    monkeypatch.delenv("GALLERY_SNAPSHOT_DIR", raising=False)
+    models.init_db()
+    yield path
+    database.close_connections()
+
+
+def recreate(path):
+    database.close_connections()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    models.init_db()
+
+
+def enroll(prefix, count=3, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        models.add_user(f"{prefix}_{i}", rng.normal(0.0, 0.1, 128))
+
+
+def gallery_names():
+    gallery = Gallery(use_snapshot=True)
+    try:
+        return sorted(gallery.reload().names)
+    finally:
+        models.remove_user_listener(gallery._on_user_event)
+
+
+def test_recreated_database_ignores_stale_snapshot(db_file):
+    enroll("old")
+    version, ids, names, encodings = models.get_gallery_rows()
+    snapshot.write_snapshot(version, ids, names, encodings, models.get_database_id())
+
+    recreate(db_file)
+    enroll("new", seed=1)
+    assert models.get_gallery_version() == version
+    assert snapshot.load_snapshot(version, models.get_database_id()) is None
+    assert gallery_names() == ["new_0", "new_1", "new_2"]
+
+    # L'instantané de la nouvelle base remplace l'ancien, même à version égale
+    version, ids, names, encodings = models.get_gallery_rows()
+    snapshot.write_snapshot(version, ids, names, encodings, models.get_database_id())
+    assert snapshot.current_version() == (version, models.get_database_id())
+    assert sorted(snapshot.load_snapshot(version, models.get_database_id())[2]) == ["new_0", "new_1", "new_2"]
+    assert len(os.listdir(snapshot.snapshot_dir())) == 2   # CURRENT + une seule version
+
+
+def test_snapshot_of_same_database_is_used(db_file):
+    enroll("emp")
+    version, ids, names, encodings = models.get_gallery_rows()
+    snapshot.write_snapshot(version, ids, names, encodings, models.get_database_id())
+    loaded = snapshot.load_snapshot(version, models.get_database_id())
+    assert loaded is not None and isinstance(loaded[3], np.memmap)
+    assert gallery_names() == ["emp_0", "emp_1", "emp_2"]
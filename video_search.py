@@ -0,0 +1,120 @@
+# video_search.py
+# Recherche d'un employé (ou de tous) dans des enregistrements vidéo.
+#
+#   python video_search.py enregistrements/porte1_*.mp4 --name "Awa Diop"
+#   python video_search.py porte1.mp4 --photo suspect.jpg --stride 10 --format jsonl > timeline.jsonl
+#   python video_search.py porte1.mp4 --unknown           # tous les passages, inconnus compris
+#
+# La chronologie des apparitions est écrite au fil de l'eau sur la sortie
+# standard ; la progression et le bilan vont sur la sortie d'erreur.
+import argparse
+import csv
+import json
+import sys
+
+import numpy as np
+
+from controllers.video_search import TargetMatcher, VideoSearch, keyframes_available
+from models.models import get_user_samples, init_db
+
+FIELDS = ("video", "name", "start", "end", "distance", "detections")
+
+
+def format_time(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}"
+
+
+def target_from_photo(path):
+    """Encodage du plus grand visage de la photo."""
+    import face_recognition
+    from controllers.embedding import encode_batch
+
+    image = face_recognition.load_image_file(path)
+    locations = face_recognition.face_locations(image)
+    if not locations:
+        return None
+    largest = max(locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
+    return encode_batch([(image, [largest])])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recherche d'apparitions dans des vidéos enregistrées")
+    parser.add_argument("videos", nargs="+", help="fichiers vidéo")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--name", help="employé recherché (échantillons de la base)")
+    target.add_argument("--photo", help="photo de la personne recherchée")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=None, help="processus de décodage (défaut : nb de cœurs)")
+    parser.add_argument("--chunk-seconds", type=float, default=60.0, help="durée d'une tranche décodée par un processus")
+    parser.add_argument("--stride", type=int, default=5, help="analyse une image sur N")
+    parser.add_argument("--keyframes", action="store_true", help="ne décode que les images clés (nécessite PyAV)")
+    parser.add_argument("--scale", type=float, default=0.5, help="réduction avant détection")
+    parser.add_argument("--no-motion", action="store_true", help="analyse aussi les plans fixes")
+    parser.add_argument("--gap", type=float, default=2.0, help="secondes sans détection qui terminent une apparition")
+    parser.add_argument("--unknown", action="store_true", help="inclut les visages inconnus (sans --name / --photo)")
+    parser.add_argument("--format", choices=("text", "jsonl", "csv"), default="text")
+    args = parser.parse_args()
+
+    if args.keyframes and not keyframes_available():
+        parser.error("--keyframes nécessite PyAV (pip install av)")
+
+    init_db()
+    if args.name:
+        samples = get_user_samples(args.name)
+        if samples is None:
+            parser.error(f"employé inconnu : {args.name}")
+        matcher = TargetMatcher(args.name, samples)
+    elif args.photo:
+        samples = target_from_photo(args.photo)
+        if samples is None or not len(samples):
+            parser.error(f"aucun visage trouvé dans {args.photo}")
+        matcher = TargetMatcher("Cible", np.asarray(samples))
+    else:
+        from models.gallery import get_gallery
+        matcher = get_gallery()
+
+    search = VideoSearch(
+        matcher, tolerance=args.tolerance, workers=args.workers, chunk_seconds=args.chunk_seconds,
+        stride=args.stride, keyframes=args.keyframes, scale=args.scale, motion=not args.no_motion,
+        include_unknown=args.unknown and not (args.name or args.photo), gap=args.gap
+    )
+
+    def progress(done, total):
+        sys.stderr.write(f"\r{done}/{total} tranches analysées")
+        sys.stderr.flush()
+
+    writer = None
+    if args.format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=FIELDS)
+        writer.writeheader()
+    count = 0
+    for appearance in search.run(args.videos, progress=progress):
+        count += 1
+        if args.format != "text" and not np.isfinite(appearance["distance"]):
+            appearance["distance"] = None   # galerie vide
+        if args.format == "jsonl":
+            print(json.dumps(appearance, ensure_ascii=False), flush=True)
+        elif writer is not None:
+            writer.writerow(appearance)
+            sys.stdout.flush()
+        else:
+            print(
+                f"{appearance['video']} {format_time(appearance['start'])} -> {format_time(appearance['end'])} "
+                f"{appearance['name']} (distance {appearance['distance']:.3f}, "
+                f"{appearance['detections']} détections)",
+                flush=True
+            )
+
+    speedup = search.speedup()
+    sys.stderr.write("\n")
+    sys.stderr.write(
+        f"{count} apparitions, {format_time(search.video_seconds)} de vidéo en {search.elapsed:.1f} s"
+        f"{f' ({speedup:.0f}x temps réel)' if speedup else ''} ; "
+        f"{search.decoded} images décodées, {search.analysed} analysées, {search.faces} visages\n"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,31 @@
 # debut du fichier add_user_view.py
+import time
 import streamlit as st
 from streamlit_webrtc import webrtc_streamer, VideoTransformerBase
-from controllers.controller import register_user_from_file, register_user_from_frame
+from controllers.controller import register_user_from_files, register_user_from_frames
+
+# Rafale webcam : plusieurs prises de vue espacées pour varier pose et éclairage
+BURST_SIZE = 5
+BURST_INTERVAL = 0.4
+
+
+def capture_burst(transformer, size=BURST_SIZE, interval=BURST_INTERVAL):
+    """Récupère `size` images distinctes du flux, espacées d'au moins `interval` secondes."""
+    frames = []
+    deadline = time.time() + size * interval * 3
+    while len(frames) < size and time.time() < deadline:
+        frame = transformer.last_frame
+        if frame is not None and (not frames or frame is not frames[-1]):
+            frames.append(frame)
+            time.sleep(interval)
+        else:
+            time.sleep(0.05)
+    return frames
 
 def add_user_tab():
     st.markdown(
         '<p style="text-align:center; font-size:0.9em; background-color:#d1ecf1; color:#0c5460; padding:10px; border-radius:5px;">'
-        '💡 Pour ajouter un employé : entrez son nom, puis importez une photo ou activez la webcam.'
+        '💡 Pour ajouter un employé : entrez son nom, puis importez une ou plusieurs photos ou activez la webcam.'
         '</p>',
         unsafe_allow_html=True
     )
@@ -17,13 +36,14 @@ def add_user_tab():
 
     # --- Colonne gauche : Importer depuis fichier ---
     with col1:
-        st.markdown('<h3 style="font-size:1.2em;">📂 Importer une photo</h3>', unsafe_allow_html=True)
-        photo_file = st.file_uploader("", type=["jpg", "png"], key="photo_file", accept_multiple_files=False, help="💡 Importez une photo claire de l'employé (jpg ou png)")
+        st.markdown('<h3 style="font-size:1.2em;">📂 Importer des photos</h3>', unsafe_allow_html=True)
+        photo_files = st.file_uploader("", type=["jpg", "png"], key="photo_file", accept_multiple_files=True, help="💡 Importez une ou plusieurs photos claires de l'employé (jpg ou png) : plusieurs prises de vue améliorent la reconnaissance")
 
         if st.button("📥 Enregistrer photo", use_container_width=True):
-            if name and photo_file:
-                if register_user_from_file(name, photo_file):
-                    st.success(f"✅ Employé **{name}** ajouté avec succès.")
+            if name and photo_files:
+                samples = register_user_from_files(name, photo_files)
+                if samples:
+                    st.success(f"✅ Employé **{name}** ajouté avec succès ({samples}/{len(photo_files)} photo(s) retenue(s)).")
                 else:
                     st.error("❌ Aucun visage détecté sur la photo.")
             else:
@@ -34,7 +54,7 @@ def add_user_tab():
         st.markdown('<h3 style="font-size:1.2em;">📸 Capture via webcam</h3>', unsafe_allow_html=True)
         st.markdown(
             '<p style="text-align:center; font-size:0.85em; background-color:#d1ecf1; color:#0c5460; padding:8px; border-radius:5px;">'
-            '💡 Démarrez la webcam et placez le visage au centre avant de cliquer sur "📷 Capturer".'
+            f'💡 Démarrez la webcam et placez le visage au centre avant de cliquer sur "📷 Capturer" : {BURST_SIZE} images sont prises, bougez légèrement la tête.'
             '</p>',
             unsafe_allow_html=True
         )
@@ -57,9 +77,11 @@ def add_user_tab():
 
         if st.button("📷 Capturer et enregistrer", use_container_width=True):
             if name and webrtc_ctx.video_transformer and webrtc_ctx.video_transformer.last_frame is not None:
-                frame = webrtc_ctx.video_transformer.last_frame
-                if register_user_from_frame(name, frame):
-                    st.success(f"✅ Employé **{name}** ajouté avec succès.")
+                with st.spinner("📸 Capture en cours..."):
+                    frames = capture_burst(webrtc_ctx.video_transformer)
+                samples = register_user_from_frames(name, frames)
+                if samples:
+                    st.success(f"✅ Employé **{name}** ajouté avec succès ({samples} prise(s) de vue).")
                 else:
                     st.error("❌ Aucun visage détecté.")
             else:
@@ -0,0 +1,43 @@
+# debut du fichier diagnostics_view.py
+import streamlit as st
+import pandas as pd
+from controllers.metrics import metrics, DEFAULT_PORT
+
+
+def diagnostics_tab():
+    st.markdown("""
+        <div style="text-align:center; margin-bottom:1.5vw;">
+            <p style="font-size:1.2vw; background-color:#d1ecf1; color:#0c5460; padding:8px; border-radius:5px">
+                💡 Temps passé par étape de la reconnaissance (fenêtre glissante) et compteurs depuis le démarrage.
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    snap = metrics.snapshot()
+
+    if snap["stages"]:
+        rows = [
+            {
+                "Étape": stage,
+                "Mesures": stats["count"],
+                "Moyenne (ms)": stats["mean_ms"],
+                "p50 (ms)": stats["p50_ms"],
+                "p95 (ms)": stats["p95_ms"],
+                "p99 (ms)": stats["p99_ms"],
+            }
+            for stage, stats in sorted(snap["stages"].items())
+        ]
+        st.dataframe(pd.DataFrame(rows).round(2), use_container_width=True, hide_index=True)
+    else:
+        st.info("ℹ️ Aucune mesure pour l'instant : démarrez la caméra dans l'onglet Reconnaissance.")
+
+    values = {**snap["counters"], **snap["gauges"]}
+    if values:
+        cols = st.columns(min(4, len(values)))
+        for i, (name, value) in enumerate(sorted(values.items())):
+            cols[i % len(cols)].metric(name, f"{value:g}" if isinstance(value, float) else value)
+
+    st.caption(f"Format Prometheus : http://127.0.0.1:{DEFAULT_PORT}/metrics")
+    if st.button("🔄 Actualiser", key="diagnostics_refresh"):
+        st.rerun()
+# fin du fichier diagnostics_view.py
@@ -0,0 +1,55 @@
+# debut du fichier employees_view.py
+import streamlit as st
+from models.models import list_users_page, get_user_thumbnail
+
+PAGE_SIZE = 20
+GRID_COLUMNS = 5
+THUMBNAIL_SIZE = 128
+
+
+def employees_tab():
+    st.markdown("""
+        <div style="text-align:center; margin-bottom:1.5vw;">
+            <p style="font-size:1.2vw; background-color:#d1ecf1; color:#0c5460; padding:8px; border-radius:5px">
+                💡 Employés enregistrés, page par page : seules les vignettes de la page affichée sont chargées.
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    # Pile des curseurs (id du dernier employé de la page précédente) : retour arrière sans OFFSET
+    if "employees_cursors" not in st.session_state:
+        st.session_state.employees_cursors = [0]
+    cursors = st.session_state.employees_cursors
+
+    rows, next_cursor = list_users_page(after_id=cursors[-1], limit=PAGE_SIZE)
+    while not rows and len(cursors) > 1:
+        # Employés de cette page supprimés depuis : retour à la page précédente
+        cursors.pop()
+        rows, next_cursor = list_users_page(after_id=cursors[-1], limit=PAGE_SIZE)
+
+    if not rows:
+        st.info("ℹ️ Aucun employé enregistré : ajoutez-en depuis l'onglet Nouveau visage.")
+        return
+
+    cols = st.columns(GRID_COLUMNS)
+    for i, (user_id, name, photo_size) in enumerate(rows):
+        with cols[i % GRID_COLUMNS]:
+            thumbnail = get_user_thumbnail(user_id, THUMBNAIL_SIZE) if photo_size else None
+            if thumbnail is not None:
+                st.image(thumbnail, width=THUMBNAIL_SIZE)
+            else:
+                st.markdown("<div style='font-size:4em; text-align:center;'>👤</div>", unsafe_allow_html=True)
+            st.caption(name)
+
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("⬅️ Précédent", key="employees_prev", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.markdown(f"<p style='text-align:center;'>Page {len(cursors)}</p>", unsafe_allow_html=True)
+    with col_next:
+        if st.button("Suivant ➡️", key="employees_next", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+# fin du fichier employees_view.py
@@ -0,0 +1,78 @@
+# debut du fichier hud.py
+# Rendu du bandeau (HUD) de la vue reconnaissance sans reconstruire l'image :
+# polices en cache par taille, chaque texte pré-rendu une fois en sprite RGBA
+# (cache LRU), assombrissement et fusion limités à la zone du bandeau.
+from collections import OrderedDict
+from functools import lru_cache
+
+import cv2
+import numpy as np
+from PIL import ImageFont, ImageDraw, Image
+
+
+@lru_cache(maxsize=None)
+def get_font(font_size: int):
+    """Retourne une police dispo (Arial si présent, sinon DejaVuSans), une fois par taille."""
+    try:
+        return ImageFont.truetype("arial.ttf", font_size)
+    except OSError:
+        return ImageFont.truetype("DejaVuSans.ttf", font_size)
+
+
+class TextSprite:
+    """Texte pré-rendu : couleur prémultipliée et alpha en uint16 pour la fusion."""
+
+    def __init__(self, text, font_size, color):
+        font = get_font(font_size)
+        self.width, self.height = font.getbbox(text)[2:]
+        canvas = Image.new("L", (max(1, self.width), max(1, self.height)), 0)
+        ImageDraw.Draw(canvas).text((0, 0), text, font=font, fill=255)
+        alpha = np.asarray(canvas, dtype=np.uint16)[:, :, None]
+        self.inv_alpha = 255 - alpha
+        self.premultiplied = alpha * np.array(color, dtype=np.uint16)[None, None, :]
+
+
+class HudRenderer:
+    def __init__(self, banner_alpha=0.5, cache_size=64):
+        self.banner_alpha = banner_alpha
+        self.cache_size = cache_size
+        self._sprites = OrderedDict()
+
+    def sprite(self, text, font_size, color):
+        key = (text, font_size, tuple(color))
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = self._sprites[key] = TextSprite(text, font_size, color)
+            while len(self._sprites) > self.cache_size:
+                self._sprites.popitem(last=False)
+        else:
+            self._sprites.move_to_end(key)
+        return sprite
+
+    def draw_banner(self, img, text, color, font_size):
+        """Bandeau semi-transparent centré en haut + texte, dessiné en place dans img (RGB)."""
+        height, width = img.shape[:2]
+        sprite = self.sprite(text, font_size, color)
+        hud_x = (width - sprite.width) // 2
+        hud_y = 20  # un petit décalage sous le bord
+
+        # Assombrissement limité au rectangle du bandeau
+        x0, y0 = max(0, hud_x - 10), max(0, hud_y - 5)
+        x1, y1 = min(width, hud_x + sprite.width + 101), min(height, hud_y + sprite.height + 11)
+        if x1 > x0 and y1 > y0:
+            roi = img[y0:y1, x0:x1]
+            cv2.convertScaleAbs(roi, roi, 1.0 - self.banner_alpha)
+
+        # Fusion alpha du texte, uniquement sur la partie visible du sprite
+        tx0, ty0 = max(0, hud_x), max(0, hud_y)
+        tx1, ty1 = min(width, hud_x + sprite.width), min(height, hud_y + sprite.height)
+        if tx1 <= tx0 or ty1 <= ty0:
+            return img
+        sx, sy = tx0 - hud_x, ty0 - hud_y
+        sw, sh = tx1 - tx0, ty1 - ty0
+        roi = img[ty0:ty1, tx0:tx1]
+        alpha = sprite.inv_alpha[sy:sy + sh, sx:sx + sw]
+        blended = (roi * alpha + sprite.premultiplied[sy:sy + sh, sx:sx + sw] + 127) // 255
+        roi[:] = blended
+        return img
+# fin du fichier hud.py
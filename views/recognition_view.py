@@ -1,45 +1,52 @@
 import streamlit as st
 from streamlit_webrtc import webrtc_streamer, WebRtcMode, VideoTransformerBase
 import cv2
-import numpy as np
-from PIL import ImageFont, ImageDraw, Image
-from controllers.controller import recognize_faces
 import os
+import time
+from controllers.tracking import FaceTracker
+from controllers.pipeline import RecognitionPipeline
+from controllers.metrics import metrics
+from views.hud import HudRenderer
+
+# Identifiant de la borne dans le journal d'accès : ?camera=... dans l'URL du
+# poste, sinon la variable d'environnement KIOSK_CAMERA
+DEFAULT_CAMERA = os.environ.get("KIOSK_CAMERA", "webcam")
 
-# ---------------------
-# Helpers
-# ---------------------
-def get_font(font_size: int):
-    """Retourne une police dispo (Arial si présent, sinon DejaVuSans)."""
-    try:
-        return ImageFont.truetype("arial.ttf", font_size)
-    except OSError:
-        return ImageFont.truetype("DejaVuSans.ttf", font_size)
-
-def put_text_pil(img, text, pos, font_size=20, color=(0,255,0)):
-    """Ajoute du texte avec Pillow pour un rendu net."""
-    img_pil = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-    draw = ImageDraw.Draw(img_pil)
-    font = get_font(font_size)
-    draw.text(pos, text, font=font, fill=color)
-    return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
 
 # ---------------------
 # Vue principale
 # ---------------------
 def recognition_tab():
+    camera = st.text_input(
+        "Identifiant de la caméra",
+        value=st.query_params.get("camera", DEFAULT_CAMERA),
+        key="kiosk_camera",
+        help="Nom de cette borne dans le journal d'accès (pris en compte au prochain Start)"
+    ).strip() or DEFAULT_CAMERA
+    st.query_params["camera"] = camera
+
     # ---------------------
     # Transformer WebRTC
     # ---------------------
     class FaceRecognitionTransformer(VideoTransformerBase):
         def __init__(self):
             self.last_name = None
+            # Détection toutes les N images, encodage seulement pour les nouvelles pistes
+            self.tracker = FaceTracker(camera=camera)
+            # La reconnaissance tourne dans un thread : transform() ne bloque jamais
+            self.pipeline = RecognitionPipeline(self.tracker.process)
+            self.hud = HudRenderer()
+
+        def on_ended(self):
+            self.pipeline.stop()
 
         def transform(self, frame):
             img = frame.to_ndarray(format="bgr24")
             height, width = img.shape[:2]
 
-            results, alert = recognize_faces(img)
+            # Publie l'image courante et dessine le dernier résultat disponible
+            self.pipeline.submit(img.copy())
+            results, alert = self.pipeline.latest()
 
             # Détection principale
             if results:
@@ -49,9 +56,13 @@ def recognition_tab():
 
             self.last_name = main_name
 
-            # Dessin rectangles
+            # Sortie directement en RGB : une seule conversion par image
+            draw_start = time.perf_counter()
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+            # Dessin rectangles (vert : connu, rouge : inconnu)
             for ((top, right, bottom, left), detected_name) in results:
-                color = (0, 255, 0) if detected_name != "Inconnu" else (0, 0, 255)
+                color = (0, 255, 0) if detected_name != "Inconnu" else (255, 0, 0)
                 thickness = max(2, width // 200)
                 cv2.rectangle(img, (left, top), (right, bottom), color, thickness)
 
@@ -68,25 +79,12 @@ def recognition_tab():
 
             # Taille texte adaptative
             font_size = max(14, min(width // 25, 32))
-            font = get_font(font_size)
-            text_w, text_h = font.getbbox(hud_text)[2:]
-
-            hud_x = (width - text_w) // 2
-            hud_y = 20  # un petit décalage sous le bord
-
-            # Bandeau semi-transparent noir
-            overlay = img.copy()
-            cv2.rectangle(overlay,
-                        (hud_x - 10, hud_y - 5),
-                        (hud_x + text_w + 100, hud_y + text_h + 10),
-                        (0, 0, 0), -1)
-            img = cv2.addWeighted(overlay, 0.5, img, 0.5, 0)
 
-            # Ajout texte
-            img = put_text_pil(img, hud_text, (hud_x, hud_y), font_size=font_size, color=hud_color)
+            # Bandeau semi-transparent noir + texte pré-rendu
+            img = self.hud.draw_banner(img, hud_text, hud_color, font_size)
+            metrics.observe("hud", time.perf_counter() - draw_start)
+            return img
 
-            return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
     # Message juste au-dessus de la vidéo
     st.markdown("""
         <div style="text-align:center; margin-bottom:0.5vw;">